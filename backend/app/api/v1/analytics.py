@@ -1,22 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy import case, func
 from typing import List, Optional
 from datetime import datetime, timedelta
+from app.core.config import settings
 from app.core.deps import get_db, get_current_user, require_role
 from app.models.models import (
-    User, Quiz, QuizAttempt, Question, QuestionBank, Subject, Answer
-)
-from app.schemas.schemas import (
-    DashboardStats, TeacherStats, StudentStats, UserActivityResponse
+    ActivityEvent, User, Quiz, QuizAttempt, QuestionBank, Subject, RoleEnum
 )
+from app.schemas.schemas import ActivityItem, UserActivityResponse
+from app.services.activity_log import activity_item, activity_log
+from app.services.ttl_cache import TTLCache
 
 router = APIRouter()
 
-@router.get("/dashboard", response_model=DashboardStats)
+# Aggregates over all attempts are served from a short-lived cache
+analytics_cache = TTLCache(ttl=settings.ANALYTICS_CACHE_SECONDS)
+
+_completed_percentage = case((QuizAttempt.is_completed == True, QuizAttempt.percentage))
+
+@router.get("/dashboard")
 def get_dashboard_stats(
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_role(["admin"]))
+    current_user: User = Depends(require_role([RoleEnum.ADMIN]))
 ):
     """
     Comprehensive dashboard statistics for admin
@@ -26,16 +32,16 @@ def get_dashboard_stats(
     active_quizzes = db.query(Quiz).filter(Quiz.is_active == True).count()
     
     # Students stats
-    total_students = db.query(User).filter(User.role == "student").count()
+    total_students = db.query(User).filter(User.role == RoleEnum.STUDENT).count()
     active_students = db.query(User).filter(
-        User.role == "student",
+        User.role == RoleEnum.STUDENT,
         User.is_active == True
     ).count()
     
     # Teachers stats
-    total_teachers = db.query(User).filter(User.role == "teacher").count()
+    total_teachers = db.query(User).filter(User.role == RoleEnum.TEACHER).count()
     active_teachers = db.query(User).filter(
-        User.role == "teacher",
+        User.role == RoleEnum.TEACHER,
         User.is_active == True
     ).count()
     
@@ -73,7 +79,7 @@ def get_dashboard_stats(
     }
 
 
-@router.get("/teacher/{teacher_id}/stats", response_model=TeacherStats)
+@router.get("/teacher/{teacher_id}/stats")
 def get_teacher_statistics(
     teacher_id: int,
     db: Session = Depends(get_db),
@@ -83,13 +89,13 @@ def get_teacher_statistics(
     Get detailed statistics for a teacher
     """
     # Check permissions
-    if current_user.role not in ["admin", "teacher"]:
+    if current_user.role not in [RoleEnum.ADMIN, RoleEnum.TEACHER]:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized"
         )
     
-    if current_user.role == "teacher" and current_user.id != teacher_id:
+    if current_user.role == RoleEnum.TEACHER and current_user.id != teacher_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to view other teacher's stats"
@@ -97,7 +103,7 @@ def get_teacher_statistics(
     
     teacher = db.query(User).filter(
         User.id == teacher_id,
-        User.role == "teacher"
+        User.role == RoleEnum.TEACHER
     ).first()
     
     if not teacher:
@@ -153,7 +159,7 @@ def get_teacher_statistics(
     }
 
 
-@router.get("/student/{student_id}/stats", response_model=StudentStats)
+@router.get("/student/{student_id}/stats")
 def get_student_statistics(
     student_id: int,
     db: Session = Depends(get_db),
@@ -163,7 +169,7 @@ def get_student_statistics(
     Get detailed statistics for a student
     """
     # Check permissions
-    if current_user.role == "student" and current_user.id != student_id:
+    if current_user.role == RoleEnum.STUDENT and current_user.id != student_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to view other student's stats"
@@ -171,7 +177,7 @@ def get_student_statistics(
     
     student = db.query(User).filter(
         User.id == student_id,
-        User.role == "student"
+        User.role == RoleEnum.STUDENT
     ).first()
     
     if not student:
@@ -221,7 +227,7 @@ def get_student_statistics(
     # Pending quizzes (active quizzes not attempted)
     attempted_quiz_ids = db.query(QuizAttempt.quiz_id).filter(
         QuizAttempt.student_id == student_id
-    ).subquery()
+    ).scalar_subquery()
     
     pending_quizzes = db.query(Quiz).filter(
         Quiz.is_active == True,
@@ -240,51 +246,49 @@ def get_student_statistics(
     }
 
 
-@router.get("/activity/recent")
+@router.get("/activity/recent", response_model=List[ActivityItem])
 def get_recent_activity(
-    limit: int = 20,
+    response: Response,
+    cursor: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=500),
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_role(["admin"]))
+    current_user: User = Depends(require_role([RoleEnum.ADMIN]))
 ):
     """
-    Get recent activity across the system
+    Get recent activity across the system, newest first
+    
+    The newest events are served from the in-memory activity log; older ones are read
+    from activity_events. Pass the X-Next-Cursor response header back as `cursor` to
+    page further back.
     """
-    activities = []
+    activities = activity_log.recent(limit) if cursor is None else []
     
-    # Recent quiz attempts
-    recent_attempts = db.query(QuizAttempt).order_by(
-        QuizAttempt.started_at.desc()
-    ).limit(limit).all()
+    if len(activities) < limit:
+        older_than = activities[-1]["id"] if activities else cursor
+        query = db.query(ActivityEvent)
+        if older_than is not None:
+            query = query.filter(ActivityEvent.id < older_than)
+        events = query.order_by(ActivityEvent.id.desc()).limit(limit - len(activities)).all()
+        activities.extend(activity_item(event) for event in events)
     
-    for attempt in recent_attempts:
-        student = db.query(User).filter(User.id == attempt.student_id).first()
-        quiz = db.query(Quiz).filter(Quiz.id == attempt.quiz_id).first()
-        
-        if student and quiz:
-            activities.append({
-                "id": attempt.id,
-                "user_name": f"{student.first_name} {student.last_name}",
-                "user_role": "student",
-                "action": f"Attempted quiz: {quiz.title}",
-                "timestamp": attempt.started_at,
-                "details": f"Score: {attempt.score}/{attempt.total_marks}" if attempt.is_completed else "In progress"
-            })
+    if len(activities) == limit:
+        response.headers["X-Next-Cursor"] = str(activities[-1]["id"])
     
     return activities
 
 
 @router.get("/activity/users", response_model=List[UserActivityResponse])
 def get_user_activity(
-    role: Optional[str] = None,
+    role: Optional[RoleEnum] = None,
     department: Optional[str] = None,
     limit: int = 50,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_role(["admin"]))
+    current_user: User = Depends(require_role([RoleEnum.ADMIN]))
 ):
     """
     Get user activity list with filters
     """
-    query = db.query(User).filter(User.role != "admin")
+    query = db.query(User).filter(User.role != RoleEnum.ADMIN)
     
     if role:
         query = query.filter(User.role == role)
@@ -299,7 +303,7 @@ def get_user_activity(
             "id": user.id,
             "name": f"{user.first_name} {user.last_name}",
             "email": user.email,
-            "role": user.role,
+            "role": user.role.value,
             "department": user.department,
             "class_year": user.class_year,
             "student_id": user.student_id,
@@ -310,6 +314,45 @@ def get_user_activity(
     ]
 
 
+def _subject_performance_query(db: Session):
+    """Quizzes and attempts per subject, in one grouped join."""
+    return db.query(
+        Subject.id,
+        Subject.name,
+        Subject.code,
+        func.count(func.distinct(Quiz.id)),
+        func.count(QuizAttempt.id),
+        func.avg(_completed_percentage)
+    ).outerjoin(
+        Quiz, Quiz.subject_id == Subject.id
+    ).outerjoin(
+        QuizAttempt, QuizAttempt.quiz_id == Quiz.id
+    ).group_by(Subject.id, Subject.name, Subject.code)
+
+def _subject_performance(row) -> dict:
+    subject_id, name, code, total_quizzes, total_attempts, avg_performance = row
+    return {
+        "subject_id": subject_id,
+        "subject_name": name,
+        "subject_code": code,
+        "total_quizzes": total_quizzes,
+        "total_attempts": total_attempts,
+        "average_performance": round(avg_performance or 0, 2)
+    }
+
+@router.get("/performance/subjects")
+def get_subjects_performance(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get performance analytics for every subject
+    """
+    return analytics_cache.get_or_compute(
+        ("subjects",),
+        lambda: [_subject_performance(row) for row in _subject_performance_query(db).order_by(Subject.name).all()]
+    )
+
 @router.get("/performance/subject/{subject_id}")
 def get_subject_performance(
     subject_id: int,
@@ -319,91 +362,117 @@ def get_subject_performance(
     """
     Get performance analytics for a subject
     """
-    subject = db.query(Subject).filter(Subject.id == subject_id).first()
-    if not subject:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Subject not found"
-        )
-    
-    # Quizzes in this subject
-    quizzes = db.query(Quiz).filter(Quiz.subject_id == subject_id).all()
-    quiz_ids = [q.id for q in quizzes]
-    
-    if not quiz_ids:
-        return {
-            "subject_id": subject_id,
-            "subject_name": subject.name,
-            "total_quizzes": 0,
-            "total_attempts": 0,
-            "average_performance": 0
-        }
-    
-    # Total attempts
-    total_attempts = db.query(QuizAttempt).filter(
-        QuizAttempt.quiz_id.in_(quiz_ids)
-    ).count()
-    
-    # Average performance
-    avg_performance = db.query(func.avg(QuizAttempt.percentage)).filter(
-        QuizAttempt.quiz_id.in_(quiz_ids),
-        QuizAttempt.is_completed == True
-    ).scalar() or 0
-    
+    def compute():
+        row = _subject_performance_query(db).filter(Subject.id == subject_id).first()
+        # Raised here rather than cached, so a subject created afterwards is found at once
+        if not row:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Subject not found"
+            )
+        return _subject_performance(row)
+    
+    return analytics_cache.get_or_compute(("subject", subject_id), compute)
+
+def _department_performance_query(db: Session):
+    """Students and their attempts per department, in one grouped join."""
+    return db.query(
+        User.department,
+        func.count(func.distinct(User.id)),
+        func.count(QuizAttempt.id),
+        func.count(case((QuizAttempt.is_completed == True, 1))),
+        func.avg(_completed_percentage)
+    ).outerjoin(
+        QuizAttempt, QuizAttempt.student_id == User.id
+    ).filter(User.role == RoleEnum.STUDENT).group_by(User.department)
+
+def _department_performance(row) -> dict:
+    department, total_students, total_attempts, completed_attempts, avg_performance = row
     return {
-        "subject_id": subject_id,
-        "subject_name": subject.name,
-        "subject_code": subject.code,
-        "total_quizzes": len(quizzes),
+        "department": department,
+        "total_students": total_students,
         "total_attempts": total_attempts,
-        "average_performance": round(avg_performance, 2)
+        "completed_attempts": completed_attempts,
+        "average_performance": round(avg_performance or 0, 2)
     }
 
+@router.get("/performance/departments")
+def get_departments_performance(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role([RoleEnum.ADMIN, RoleEnum.TEACHER]))
+):
+    """
+    Get performance analytics for every department
+    """
+    return analytics_cache.get_or_compute(
+        ("departments",),
+        lambda: [
+            _department_performance(row)
+            for row in _department_performance_query(db).order_by(User.department).all()
+        ]
+    )
 
 @router.get("/performance/department/{department}")
 def get_department_performance(
     department: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_role(["admin", "teacher"]))
+    current_user: User = Depends(require_role([RoleEnum.ADMIN, RoleEnum.TEACHER]))
 ):
     """
     Get performance analytics for a department
     """
-    # Students in department
-    students = db.query(User).filter(
-        User.role == "student",
-        User.department == department
-    ).all()
-    
-    student_ids = [s.id for s in students]
-    
-    if not student_ids:
-        return {
-            "department": department,
-            "total_students": 0,
-            "total_attempts": 0,
-            "average_performance": 0
-        }
-    
-    # Attempts by students in this department
-    total_attempts = db.query(QuizAttempt).filter(
-        QuizAttempt.student_id.in_(student_ids)
-    ).count()
-    
-    completed_attempts = db.query(QuizAttempt).filter(
-        QuizAttempt.student_id.in_(student_ids),
-        QuizAttempt.is_completed == True
-    ).count()
+    def compute():
+        row = _department_performance_query(db).filter(User.department == department).first()
+        return _department_performance(row if row else (department, 0, 0, 0, 0))
     
-    avg_performance = db.query(func.avg(QuizAttempt.percentage)).filter(
-        QuizAttempt.student_id.in_(student_ids),
-        QuizAttempt.is_completed == True
-    ).scalar() or 0
-    
-    return {
-        "department": department,
-        "total_students": len(students),
-        "total_attempts": total_attempts,
-        "completed_attempts": completed_attempts,
-        "average_performance": round(avg_performance, 2)
-    }
+    return analytics_cache.get_or_compute(("department", department), compute)
+
+@router.get("/performance/cross-tab")
+def get_performance_cross_tab(
+    department: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role([RoleEnum.ADMIN, RoleEnum.TEACHER]))
+):
+    """
+    Attempt counts and average performance per department x class year x subject,
+    computed in one grouped query
+    """
+    def compute():
+        query = db.query(
+            User.department,
+            User.class_year,
+            Subject.id,
+            Subject.name,
+            func.count(func.distinct(User.id)),
+            func.count(QuizAttempt.id),
+            func.count(case((QuizAttempt.is_completed == True, 1))),
+            func.avg(_completed_percentage)
+        ).select_from(QuizAttempt).join(
+            User, User.id == QuizAttempt.student_id
+        ).join(
+            Quiz, Quiz.id == QuizAttempt.quiz_id
+        ).outerjoin(
+            Subject, Subject.id == Quiz.subject_id
+        )
+        if department:
+            query = query.filter(User.department == department)
+        rows = query.group_by(
+            User.department, User.class_year, Subject.id, Subject.name
+        ).order_by(User.department, User.class_year, Subject.name).all()
+        
+        return [
+            {
+                "department": row_department,
+                "class_year": class_year,
+                "subject_id": subject_id,
+                "subject_name": subject_name,
+                "students": students,
+                "total_attempts": total_attempts,
+                "completed_attempts": completed_attempts,
+                "average_performance": round(avg_performance or 0, 2)
+            }
+            for (row_department, class_year, subject_id, subject_name, students,
+                 total_attempts, completed_attempts, avg_performance) in rows
+        ]
+    
+    return analytics_cache.get_or_compute(("cross-tab", department), compute)
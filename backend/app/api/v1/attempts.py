@@ -1,28 +1,61 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from datetime import datetime, timedelta
-from typing import List
+from typing import Dict, List, Optional
 from app.db.database import get_db
 from app.models.models import User, Quiz, QuizAttempt, Answer, Question, RoleEnum
 from app.schemas.schemas import (
     QuizAttemptStart, QuizAttemptSubmit, QuizAttemptResponse,
-    QuizAttemptDetailResponse
+    QuizAttemptDetailResponse, SubmissionReceipt, SubmissionStatus,
+    AnswerAutosave, AutosaveResponse, AttemptStartQueued, AttemptRankResponse
 )
 from app.core.deps import get_current_active_user, require_role
-from app.services.quiz_service import check_quiz_availability, calculate_quiz_score
+from app.services.quiz_service import check_quiz_availability
+from app.services.answer_keys import get_answer_key
+from app.services.attempt_service import finalize_attempts, insert_attempt_if_absent
+from app.services.autosave import autosave_buffer
+from app.services.admission import attempt_start_admission
+from app.services.grading import submission_from_answers
+from app.services.submission_queue import submission_queue
+from app.services.attempt_sweeper import attempt_sweeper, schedule_attempt
+from app.services.dashboard_counters import dashboard_counters
+from app.services.leaderboard import leaderboards
+from app.services.activity_log import activity_log
+from app.services.shuffle import attempt_seed, shuffle_answers, unshuffle_answers
 
 router = APIRouter()
 
-@router.post("/start", response_model=QuizAttemptResponse)
+@router.post(
+    "/start",
+    response_model=QuizAttemptResponse,
+    responses={202: {"model": AttemptStartQueued, "description": "Queued by admission control"}}
+)
 async def start_quiz_attempt(
     attempt_data: QuizAttemptStart,
+    x_queue_ticket: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     Start a quiz attempt. Validates timing constraints and student eligibility.
+    Under load, requests beyond the admission rate get 202 with a queue ticket;
+    retry after Retry-After seconds with the ticket in the X-Queue-Ticket header.
     """
+    decision = attempt_start_admission.admit(x_queue_ticket)
+    if not decision.admitted:
+        queued = AttemptStartQueued(
+            ticket=decision.ticket,
+            position=decision.position,
+            retry_after_seconds=decision.retry_after
+        )
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=queued.model_dump(),
+            headers={"Retry-After": str(decision.retry_after)}
+        )
+    
     # Verify quiz exists
     quiz = db.query(Quiz).filter(Quiz.id == attempt_data.quiz_id).first()
     if not quiz:
@@ -37,56 +70,45 @@ async def start_quiz_attempt(
             detail="Quiz is not active"
         )
     
-    # Check for existing attempt
+    # Common case: no attempt yet and the quiz is open, so insert straight away.
+    # The unique (quiz_id, student_id) index makes concurrent double-clicks safe.
+    availability = check_quiz_availability(quiz, current_user.id)
+    if availability.can_start:
+        db_attempt = insert_attempt_if_absent(db, quiz, current_user.id)
+        if db_attempt is not None:
+            # Auto-submit when the time runs out
+            schedule_attempt(db_attempt, quiz)
+            dashboard_counters.record_attempt_started(db_attempt.started_at)
+            activity_log.record(
+                "attempt_started", current_user, f"Started quiz: {quiz.title}",
+                quiz_id=quiz.id, attempt_id=db_attempt.id
+            )
+            return db_attempt
+    
+    # The student already has an attempt (or the quiz is not open for new ones)
     existing_attempt = db.query(QuizAttempt).filter(
         QuizAttempt.quiz_id == quiz.id,
         QuizAttempt.student_id == current_user.id
     ).first()
-    
-    # Check quiz availability based on timing rules
-    availability = check_quiz_availability(quiz, current_user.id, existing_attempt)
-    
-    if not availability.can_start:
+    if not existing_attempt:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=availability.message
         )
     
-    # If student has incomplete attempt, return it
-    if existing_attempt and not existing_attempt.is_completed:
-        return existing_attempt
-    
-    # If student already completed the quiz
-    if existing_attempt and existing_attempt.is_completed:
+    # Incomplete attempts can be resumed until their deadline; completed ones cannot
+    availability = check_quiz_availability(quiz, current_user.id, existing_attempt)
+    if not availability.can_start:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="You have already completed this quiz"
+            detail=availability.message
         )
     
-    # Create new attempt
-    db_attempt = QuizAttempt(
-        quiz_id=quiz.id,
-        student_id=current_user.id,
-        total_marks=quiz.total_marks,
-        is_completed=False,
-        is_graded=False
-    )
-    
-    db.add(db_attempt)
-    db.commit()
-    db.refresh(db_attempt)
-    
-    return db_attempt
+    return existing_attempt
 
-@router.post("/submit", response_model=QuizAttemptResponse)
-async def submit_quiz_attempt(
-    attempt_id: int,
-    submission: QuizAttemptSubmit,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
-):
+def _get_submittable_attempt(db: Session, attempt_id: int, current_user: User):
     """
-    Submit quiz answers and calculate score based on custom marking scheme.
+    Load an attempt and its quiz, checking ownership, completion and deadline.
     """
     # Get attempt
     attempt = db.query(QuizAttempt).filter(QuizAttempt.id == attempt_id).first()
@@ -121,43 +143,148 @@ async def submit_quiz_attempt(
             detail="Quiz time expired. Cannot submit."
         )
     
-    # Process and save answers
-    answers_list = []
-    for answer_data in submission.answers:
-        question = db.query(Question).filter(Question.id == answer_data.question_id).first()
-        if question:
-            # Check answer correctness
-            is_correct = answer_data.answer_text.strip().lower() == question.correct_answer.strip().lower()
-            
-            # Create answer object
-            db_answer = Answer(
-                attempt_id=attempt.id,
-                question_id=question.id,
-                answer_text=answer_data.answer_text,
-                is_correct=is_correct,
-                marks_awarded=0  # Will be calculated by service
-            )
-            answers_list.append(db_answer)
-            db.add(db_answer)
-    
-    # Calculate score using custom marking scheme
-    total_score, percentage = calculate_quiz_score(answers_list, quiz)
-    
-    # Calculate time taken
-    time_taken = int((datetime.utcnow() - attempt.started_at).total_seconds() / 60)
+    return attempt, quiz
+
+def _canonical_answers(db: Session, quiz: Quiz, attempt: QuizAttempt, answers: Dict[int, str]) -> Dict[int, str]:
+    """
+    Map option letters as displayed in the attempt's shuffled view back to the quiz's
+    own letters, so stored answers and grading never depend on the shuffle.
+    """
+    if quiz.shuffle_options is not True:
+        return answers
+    return unshuffle_answers(attempt_seed(quiz.id, attempt.id), get_answer_key(db, quiz.id).choices, answers)
+
+@router.post("/submit", response_model=QuizAttemptResponse)
+async def submit_quiz_attempt(
+    attempt_id: int,
+    submission: QuizAttemptSubmit,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Submit quiz answers and calculate score based on custom marking scheme.
+    """
+    attempt, quiz = _get_submittable_attempt(db, attempt_id, current_user)
     
-    # Update attempt
-    attempt.score = total_score
-    attempt.percentage = percentage
-    attempt.submitted_at = datetime.utcnow()
-    attempt.is_completed = True
-    attempt.time_taken_minutes = time_taken
+    # Grade the whole submission in one pass against the cached answer key
+    answers = _canonical_answers(db, quiz, attempt, submission_from_answers(submission.answers))
+    finalize_attempts(db, quiz, [attempt], [answers])
     
     db.commit()
     db.refresh(attempt)
+    attempt_sweeper.cancel(attempt.id)
+    leaderboards.record(quiz.id, [(attempt.id, attempt.score)])
+    activity_log.record(
+        "attempt_submitted", current_user,
+        f"Submitted quiz: {quiz.title} (score {attempt.score}/{attempt.total_marks})",
+        quiz_id=quiz.id, attempt_id=attempt.id
+    )
     
     return attempt
 
+@router.post("/submit-async", response_model=SubmissionReceipt, status_code=status.HTTP_202_ACCEPTED)
+async def submit_quiz_attempt_async(
+    attempt_id: int,
+    submission: QuizAttemptSubmit,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Queue quiz answers for grading and return a receipt immediately.
+    The submission is stored durably; poll /attempts/{attempt_id}/status for the outcome.
+    """
+    attempt, quiz = _get_submittable_attempt(db, attempt_id, current_user)
+    
+    receipt = submission_queue.enqueue(
+        attempt_id=attempt.id,
+        quiz_id=quiz.id,
+        student_id=current_user.id,
+        answers=_canonical_answers(db, quiz, attempt, submission_from_answers(submission.answers)),
+        received_at=datetime.utcnow()
+    )
+    activity_log.record(
+        "attempt_submitted", current_user, f"Submitted quiz: {quiz.title} (queued for grading)",
+        quiz_id=quiz.id, attempt_id=attempt.id
+    )
+    return receipt
+
+@router.patch("/{attempt_id}/answers", response_model=AutosaveResponse)
+async def autosave_answers(
+    attempt_id: int,
+    autosave: AnswerAutosave,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Autosave answer deltas for an in-progress attempt.
+    Answers are buffered and written in batches; the final submit only needs to send
+    answers that were never autosaved.
+    """
+    attempt, quiz = _get_submittable_attempt(db, attempt_id, current_user)
+    
+    # Ignore answers to questions that are not part of this quiz
+    answer_key = get_answer_key(db, quiz.id)
+    answers = {
+        question_id: answer_text
+        for question_id, answer_text in submission_from_answers(autosave.answers).items()
+        if question_id in answer_key.index
+    }
+    answers = _canonical_answers(db, quiz, attempt, answers)
+    
+    pending = autosave_buffer.add(attempt.id, answers)
+    return AutosaveResponse(attempt_id=attempt.id, accepted=len(answers), pending=pending)
+
+@router.get("/{attempt_id}/status", response_model=SubmissionStatus)
+async def get_attempt_status(
+    attempt_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Get the grading status of an attempt submitted synchronously or through the queue.
+    """
+    attempt = db.query(QuizAttempt).filter(QuizAttempt.id == attempt_id).first()
+    if not attempt:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Attempt not found"
+        )
+    
+    if current_user.role == RoleEnum.STUDENT and attempt.student_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only view your own attempts"
+        )
+    
+    receipt = submission_queue.get_receipt(attempt_id)
+    if attempt.is_completed:
+        return SubmissionStatus(
+            attempt_id=attempt.id,
+            status="completed",
+            receipt_id=receipt["receipt_id"] if receipt else None,
+            score=attempt.score,
+            total_marks=attempt.total_marks,
+            percentage=attempt.percentage,
+            submitted_at=attempt.submitted_at
+        )
+    
+    if receipt:
+        return SubmissionStatus(
+            attempt_id=attempt.id,
+            status=receipt["status"],
+            receipt_id=receipt["receipt_id"],
+            error=receipt["error"]
+        )
+    
+    return SubmissionStatus(attempt_id=attempt.id, status="in_progress")
+
+@router.get("/admission/metrics", dependencies=[Depends(require_role([RoleEnum.ADMIN]))])
+async def get_admission_metrics():
+    """
+    Queue depth, admission counters and wait times of attempt-start admission control.
+    """
+    return attempt_start_admission.metrics()
+
 @router.get("/my-attempts", response_model=List[QuizAttemptResponse])
 async def get_my_attempts(
     db: Session = Depends(get_db),
@@ -222,6 +349,52 @@ async def get_student_attempts(
     ).order_by(QuizAttempt.started_at.desc()).all()
     return attempts
 
+@router.get("/{attempt_id}/rank", response_model=AttemptRankResponse)
+async def get_attempt_rank(
+    attempt_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Get the rank and percentile of a submitted attempt among all attempts of its quiz.
+    """
+    row = db.query(QuizAttempt.student_id, QuizAttempt.quiz_id, QuizAttempt.is_completed, Quiz.creator_id).join(
+        Quiz, Quiz.id == QuizAttempt.quiz_id
+    ).filter(QuizAttempt.id == attempt_id).first()
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Attempt not found"
+        )
+    
+    if current_user.role == RoleEnum.STUDENT and row.student_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only view your own attempts"
+        )
+    
+    if current_user.role == RoleEnum.TEACHER and row.creator_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only view attempts for your own quizzes"
+        )
+    
+    ranking = leaderboards.rank(row.quiz_id, attempt_id) if row.is_completed else None
+    if ranking is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Attempt has not been graded yet"
+        )
+    
+    return AttemptRankResponse(
+        attempt_id=attempt_id,
+        quiz_id=row.quiz_id,
+        score=ranking.score,
+        rank=ranking.rank,
+        total_ranked=ranking.total,
+        percentile=ranking.percentile
+    )
+
 @router.get("/{attempt_id}", response_model=QuizAttemptDetailResponse)
 async def get_attempt_details(
     attempt_id: int,
@@ -230,6 +403,8 @@ async def get_attempt_details(
 ):
     """
     Get detailed information about a specific quiz attempt including answers.
+    Students see option letters as they were shown in their attempt; teachers and
+    admins see the quiz's own letters.
     """
     attempt = db.query(QuizAttempt).filter(QuizAttempt.id == attempt_id).first()
     if not attempt:
@@ -255,4 +430,15 @@ async def get_attempt_details(
             detail="You can only view attempts for your own quizzes"
         )
     
+    if current_user.role == RoleEnum.STUDENT and quiz.shuffle_options is True:
+        detail = QuizAttemptDetailResponse.model_validate(attempt)
+        shown = shuffle_answers(
+            attempt_seed(quiz.id, attempt.id),
+            get_answer_key(db, quiz.id).choices,
+            {answer.question_id: answer.answer_text for answer in detail.answers}
+        )
+        for answer in detail.answers:
+            answer.answer_text = shown[answer.question_id]
+        return detail
+    
     return attempt
@@ -8,6 +8,8 @@ from app.schemas.schemas import Token, LoginRequest, UserResponse
 from app.core.security import verify_password, create_access_token
 from app.core.config import settings
 from app.core.deps import get_current_active_user
+from app.services.dashboard_counters import dashboard_counters
+from app.services.activity_log import activity_log
 
 router = APIRouter()
 
@@ -36,6 +38,8 @@ async def login(
     # Update last active
     user.last_active = datetime.utcnow()
     db.commit()
+    dashboard_counters.record_user_active(user, user.last_active)
+    activity_log.record("login", user)
     
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -72,6 +76,8 @@ async def login_json(
     # Update last active
     user.last_active = datetime.utcnow()
     db.commit()
+    dashboard_counters.record_user_active(user, user.last_active)
+    activity_log.record("login", user)
     
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
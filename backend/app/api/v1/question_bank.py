@@ -1,9 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status, UploadFile, File
 from sqlalchemy.orm import Session
 from typing import List, Optional
+import csv
+import io
 from app.core.deps import get_current_user, get_db
 from app.models.models import QuestionBank, User, Subject, RoleEnum
 from app.schemas.schemas import QuestionBankCreate, QuestionBankResponse, DifficultyLevel
+from app.services.dashboard_counters import dashboard_counters
+from app.services.question_search import search_questions
+from app.services.question_import import QuestionImport, REQUIRED_COLUMNS, is_valid_utf8
+from app.services.question_pools import question_pools
+from app.services.question_facets import get_question_facets, invalidate_question_facets
+from app.services.near_duplicates import (
+    assign_duplicate_group, duplicate_index, find_near_duplicates, leave_duplicate_group, question_signature,
+    signature_to_bytes
+)
 
 router = APIRouter()
 
@@ -30,17 +41,76 @@ def create_question(
             detail="Subject not found"
         )
     
-    db_question = QuestionBank(**question.dict(), created_by=current_user.id)
+    # Flag near-duplicates of existing questions in the same subject
+    signature = question_signature(question)
+    matches = find_near_duplicates(db, question.subject_id, signature)
+    
+    db_question = QuestionBank(
+        **question.dict(), creator_id=current_user.id, minhash_signature=signature_to_bytes(signature)
+    )
+    assign_duplicate_group(db, db_question, matches)
     db.add(db_question)
     db.commit()
     db.refresh(db_question)
+    dashboard_counters.adjust({"total_question_bank_items": 1})
+    if signature is not None:
+        duplicate_index.add(db_question.id, db_question.subject_id, signature)
+    question_pools.add(db_question.id, db_question.subject_id, db_question.topic, db_question.difficulty)
+    invalidate_question_facets(db_question.subject_id)
     
+    db_question.near_duplicate_ids = [question_id for question_id, _, _ in matches]
     return db_question
 
+@router.post("/bulk-upload")
+def bulk_upload_questions(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Bulk upload questions from a CSV file (Teacher or Admin only).
+    Expected CSV format: subject_id,question_text,question_type,option_a,option_b,option_c,option_d,correct_answer,topic,difficulty,marks
+    
+    The file is parsed row by row and inserted in batches, so large files are handled in
+    constant memory. Returns per-row errors and the rows flagged as near-duplicates; a file
+    that stops being UTF-8 partway through is imported up to that row and reported there.
+    """
+    if current_user.role not in [RoleEnum.ADMIN, RoleEnum.TEACHER]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins and teachers can add questions to the bank"
+        )
+    
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only CSV files are supported"
+        )
+    
+    # Undecodable bytes are kept as surrogates so the import can report the row they are in
+    reader = csv.DictReader(
+        io.TextIOWrapper(file.file, encoding='utf-8-sig', errors='surrogateescape', newline='')
+    )
+    fieldnames = reader.fieldnames or []
+    if not is_valid_utf8(fieldnames):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File must be UTF-8 encoded"
+        )
+    missing_columns = [column for column in REQUIRED_COLUMNS if column not in fieldnames]
+    if missing_columns:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Missing required columns: {', '.join(missing_columns)}"
+        )
+    
+    return QuestionImport(db, current_user.id).run(reader)
+
 @router.get("/", response_model=List[QuestionBankResponse])
 def get_questions(
     subject_id: Optional[int] = None,
-    difficulty_level: Optional[DifficultyLevel] = None,
+    difficulty: Optional[str] = Query(None, pattern="^(easy|medium|hard)$"),
+    difficulty_level: Optional[DifficultyLevel] = None,  # Older name of difficulty
     topic: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
@@ -55,8 +125,10 @@ def get_questions(
     if subject_id:
         query = query.filter(QuestionBank.subject_id == subject_id)
     
-    if difficulty_level:
-        query = query.filter(QuestionBank.difficulty_level == difficulty_level)
+    if difficulty_level and not difficulty:
+        difficulty = difficulty_level.value.lower()
+    if difficulty:
+        query = query.filter(QuestionBank.difficulty == difficulty)
     
     if topic:
         query = query.filter(QuestionBank.topic.ilike(f"%{topic}%"))
@@ -64,6 +136,22 @@ def get_questions(
     questions = query.offset(skip).limit(limit).all()
     return questions
 
+@router.get("/search", response_model=List[QuestionBankResponse])
+def search_question_bank(
+    q: str = Query(..., min_length=1, max_length=200),
+    subject_id: Optional[int] = None,
+    difficulty: Optional[str] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Full-text search over question text, options and topic, best match first.
+    Every word has to match; subject and difficulty filters are applied in the index query.
+    """
+    return search_questions(db, q, subject_id=subject_id, difficulty=difficulty, skip=skip, limit=limit)
+
 @router.get("/{question_id}", response_model=QuestionBankResponse)
 def get_question(
     question_id: int,
@@ -106,18 +194,36 @@ def update_question(
             detail="Only admins and teachers can update questions"
         )
     
-    if current_user.role == RoleEnum.TEACHER and question.created_by != current_user.id:
+    if current_user.role == RoleEnum.TEACHER and question.creator_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Teachers can only update their own questions"
         )
     
+    pooled_as = (question.id, question.subject_id, question.topic, question.difficulty)
+    previous_subject_id = question.subject_id
     for key, value in question_update.dict().items():
         setattr(question, key, value)
+    signature = question_signature(question)
+    question.minhash_signature = signature_to_bytes(signature)
+    
+    # The edited text may no longer match its old group, so it is grouped afresh
+    leave_duplicate_group(db, question)
+    db.flush()
+    matches = find_near_duplicates(db, question.subject_id, signature, exclude_id=question.id)
+    assign_duplicate_group(db, question, matches)
     
     db.commit()
     db.refresh(question)
+    if signature is not None:
+        duplicate_index.add(question.id, question.subject_id, signature)
+    question_pools.remove(*pooled_as)
+    if question.is_active:
+        question_pools.add(question.id, question.subject_id, question.topic, question.difficulty)
+    invalidate_question_facets(previous_subject_id)
+    invalidate_question_facets(question.subject_id)
     
+    question.near_duplicate_ids = [match_id for match_id, _, _ in matches]
     return question
 
 @router.delete("/{question_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -137,14 +243,20 @@ def delete_question(
         )
     
     # Check permissions
-    if current_user.role != RoleEnum.ADMIN and question.created_by != current_user.id:
+    if current_user.role != RoleEnum.ADMIN and question.creator_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You can only delete your own questions"
         )
     
+    pooled_as = (question.id, question.subject_id, question.topic, question.difficulty)
+    leave_duplicate_group(db, question)
     db.delete(question)
     db.commit()
+    dashboard_counters.adjust({"total_question_bank_items": -1})
+    duplicate_index.remove(question_id)
+    question_pools.remove(*pooled_as)
+    invalidate_question_facets(pooled_as[1])
     
     return None
 
@@ -155,7 +267,8 @@ def get_subject_question_stats(
     current_user: User = Depends(get_current_user)
 ):
     """
-    Get statistics about questions in a subject's question bank
+    Get statistics about questions in a subject's question bank.
+    Counts cover active questions; inactive_questions reports the rest.
     """
     subject = db.query(Subject).filter(Subject.id == subject_id).first()
     if not subject:
@@ -164,30 +277,29 @@ def get_subject_question_stats(
             detail="Subject not found"
         )
     
-    total_questions = db.query(QuestionBank).filter(QuestionBank.subject_id == subject_id).count()
-    
-    easy_count = db.query(QuestionBank).filter(
-        QuestionBank.subject_id == subject_id,
-        QuestionBank.difficulty_level == DifficultyLevel.EASY
-    ).count()
-    
-    medium_count = db.query(QuestionBank).filter(
-        QuestionBank.subject_id == subject_id,
-        QuestionBank.difficulty_level == DifficultyLevel.MEDIUM
-    ).count()
-    
-    hard_count = db.query(QuestionBank).filter(
-        QuestionBank.subject_id == subject_id,
-        QuestionBank.difficulty_level == DifficultyLevel.HARD
-    ).count()
-    
+    facets = get_question_facets(db, subject_id)
     return {
         "subject_id": subject_id,
         "subject_name": subject.name,
-        "total_questions": total_questions,
-        "by_difficulty": {
-            "easy": easy_count,
-            "medium": medium_count,
-            "hard": hard_count
-        }
+        "total_questions": facets["total_questions"],
+        "inactive_questions": facets["inactive_questions"],
+        "by_difficulty": facets["by_difficulty"]
     }
+
+@router.get("/subjects/{subject_id}/facets")
+def get_subject_question_facets(
+    subject_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Counts of a subject's active bank questions by difficulty, topic, question type and
+    creator, for filtering in the question picker. Served from a per-subject cache.
+    """
+    if not db.query(Subject.id).filter(Subject.id == subject_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Subject not found"
+        )
+    
+    return get_question_facets(db, subject_id)
@@ -1,12 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy import and_, or_
+from typing import Dict, List, Optional
 from datetime import datetime, timedelta
+import base64
+import json
+import numpy as np
 from app.db.database import get_db
-from app.models.models import User, Quiz, Question, QuestionBank, RoleEnum, QuizAttempt
-from app.schemas.schemas import QuizCreate, QuizResponse, QuizDetailResponse, QuizUpdate, QuizAvailability
+from app.models.models import User, Quiz, Question, QuestionBank, RoleEnum, QuizAttempt, QuizStats, Subject
+from app.schemas.schemas import (
+    QuizCreate, QuizResponse, QuizDetailResponse, QuizUpdate, QuizAvailability,
+    ItemAnalysisResponse, ItemStatisticsResponse, LeaderboardEntry, QuizBlueprint, QuestionFromBank
+)
 from app.core.deps import get_current_active_user, require_role
-from app.services.quiz_service import check_quiz_availability
+from app.services.quiz_service import (
+    check_quiz_availability, load_bank_questions, add_quiz_questions, sample_blueprint, seen_bank_question_ids
+)
+from app.services.answer_keys import invalidate_answer_key
+from app.services.attempt_sweeper import schedule_attempt
+from app.services.quiz_payload_cache import get_quiz_payload, invalidate_quiz_payload, schedule_quiz_prewarm
+from app.services.quiz_stats import rebuild_quiz_stats
+from app.services.dashboard_counters import dashboard_counters, quiz_counts
+from app.services.item_analysis import item_flags, run_item_analysis
+from app.services.results_export import csv_chunks, iter_result_rows, xlsx_chunks
+from app.services.leaderboard import leaderboards
+from app.services.activity_log import activity_log
+from app.services.shuffle import attempt_seed
 
 router = APIRouter()
 
@@ -27,11 +47,22 @@ async def create_quiz(
             detail="Only teachers and admins can create quizzes"
         )
     
-    # Calculate total marks from manual questions
-    total_marks = sum(q.marks for q in quiz_data.questions)
+    # Fetch every referenced bank question in one query
+    bank_items = load_bank_questions(db, (q.question_bank_id for q in quiz_data.questions_from_bank))
+    missing = [q.question_bank_id for q in quiz_data.questions_from_bank if q.question_bank_id not in bank_items]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Question bank item {missing[0]} not found"
+        )
     
-    # Add marks from question bank questions
-    total_marks += len(quiz_data.questions_from_bank) * quiz_data.marks_per_correct
+    return _create_quiz(db, quiz_data, bank_items, current_user)
+
+def _create_quiz(db: Session, quiz_data: QuizCreate, bank_items: Dict[int, QuestionBank], current_user: User) -> Quiz:
+    """Insert a quiz with its questions and stats row in one transaction, then notify caches."""
+    # Total marks: every question is worth marks_per_correct x its marks (see services/grading.py)
+    question_marks = sum(q.marks for q in quiz_data.questions) + sum(q.marks for q in quiz_data.questions_from_bank)
+    total_marks = question_marks * quiz_data.marks_per_correct
     
     # Create quiz
     db_quiz = Quiz(
@@ -46,67 +77,107 @@ async def create_quiz(
         grace_period_minutes=quiz_data.grace_period_minutes,
         marks_per_correct=quiz_data.marks_per_correct,
         marks_per_incorrect=quiz_data.marks_per_incorrect,
+        shuffle_questions=quiz_data.shuffle_questions,
+        shuffle_options=quiz_data.shuffle_options,
         total_marks=total_marks
     )
     
     db.add(db_quiz)
+    db.flush()
+    db.add(QuizStats(quiz_id=db_quiz.id))
+    
+    # Insert all questions in bulk within the same transaction
+    add_quiz_questions(db, db_quiz.id, quiz_data.questions, quiz_data.questions_from_bank, bank_items)
+    
     db.commit()
     db.refresh(db_quiz)
+    schedule_quiz_prewarm(db_quiz)
+    dashboard_counters.adjust(quiz_counts(db_quiz))
+    activity_log.record("quiz_created", current_user, f"Created quiz: {db_quiz.title}", quiz_id=db_quiz.id)
     
-    # Create questions from manual input
-    for question_data in quiz_data.questions:
-        db_question = Question(
-            quiz_id=db_quiz.id,
-            question_bank_id=question_data.question_bank_id,
-            question_text=question_data.question_text,
-            question_type=question_data.question_type,
-            option_a=question_data.option_a,
-            option_b=question_data.option_b,
-            option_c=question_data.option_c,
-            option_d=question_data.option_d,
-            correct_answer=question_data.correct_answer,
-            marks=question_data.marks,
-            order=question_data.order
+    return db_quiz
+
+@router.post("/generate", response_model=QuizResponse, dependencies=[Depends(require_role([RoleEnum.ADMIN, RoleEnum.TEACHER]))])
+async def generate_quiz(
+    blueprint: QuizBlueprint,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Create a quiz from a blueprint: how many easy, medium and hard questions to draw
+    from the subject's question bank per topic. Questions are sampled from in-memory
+    pools; with exclude_seen, questions already used for the same department and class
+    year are skipped. With total_marks, marks are spread evenly over the questions.
+    """
+    subject = db.query(Subject).filter(Subject.id == blueprint.subject_id).first()
+    if not subject:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Subject not found"
         )
-        db.add(db_question)
-    
-    # Create questions from question bank
-    for qb_data in quiz_data.questions_from_bank:
-        # Get question from bank
-        qb_question = db.query(QuestionBank).filter(
-            QuestionBank.id == qb_data.question_bank_id
-        ).first()
-        
-        if not qb_question:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Question bank item {qb_data.question_bank_id} not found"
-            )
-        
-        # Copy question from bank to quiz
-        db_question = Question(
-            quiz_id=db_quiz.id,
-            question_text=qb_question.question_text,
-            question_type=qb_question.question_type,
-            option_a=qb_question.option_a,
-            option_b=qb_question.option_b,
-            option_c=qb_question.option_c,
-            option_d=qb_question.option_d,
-            correct_answer=qb_question.correct_answer,
-            marks=qb_data.marks,
-            order=qb_data.order
+    
+    exclude = seen_bank_question_ids(
+        db, blueprint.subject_id, blueprint.department, blueprint.class_year
+    ) if blueprint.exclude_seen else np.empty(0, dtype=np.int64)
+    
+    # Questions deleted by another process may still be pooled here; skip them and redraw
+    for _ in range(3):
+        try:
+            picked = sample_blueprint(blueprint, exclude)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        bank_items = load_bank_questions(db, picked)
+        stale = [question_id for question_id in picked if question_id not in bank_items]
+        if not stale:
+            break
+        exclude = np.concatenate([exclude, np.array(stale, dtype=np.int64)])
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="The question bank changed while generating the quiz; please retry"
         )
-        db.add(db_question)
     
-    db.commit()
-    db.refresh(db_quiz)
+    if not picked:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Blueprint does not select any questions"
+        )
     
-    return db_quiz
+    if blueprint.total_marks is not None:
+        marks = [blueprint.total_marks / blueprint.marks_per_correct / len(picked)] * len(picked)
+    else:
+        marks = [bank_items[question_id].marks or 1.0 for question_id in picked]
+    
+    quiz_data = QuizCreate(
+        **blueprint.model_dump(exclude={"sections", "total_marks", "exclude_seen", "seed"}),
+        questions_from_bank=[
+            QuestionFromBank(question_bank_id=question_id, marks=question_marks, order=order)
+            for order, (question_id, question_marks) in enumerate(zip(picked, marks))
+        ]
+    )
+    return _create_quiz(db, quiz_data, bank_items, current_user)
+
+def encode_quiz_cursor(quiz: Quiz) -> str:
+    """Opaque keyset cursor for the (created_at, id) position of a quiz."""
+    raw = f"{quiz.created_at.isoformat()}|{quiz.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_quiz_cursor(cursor: str):
+    try:
+        created_at, quiz_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(quiz_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
 
 @router.get("/", response_model=List[QuizResponse])
 async def get_all_quizzes(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     is_active: bool = None,
     subject_id: int = None,
     department: str = None,
@@ -115,10 +186,13 @@ async def get_all_quizzes(
     current_user: User = Depends(get_current_active_user)
 ):
     """
-    Get all quizzes with filtering options.
+    Get all quizzes with filtering options, newest first.
     Students see only active quizzes for their department/class.
     Teachers see their own quizzes.
     Admins see all quizzes.
+    
+    Pagination is keyset-based: pass the X-Next-Cursor response header back as
+    `cursor` to get the next page (`skip` is only honoured without a cursor).
     """
     query = db.query(Quiz)
     
@@ -148,20 +222,22 @@ async def get_all_quizzes(
         query = query.filter(Quiz.creator_id == current_user.id)
     # Admins see all quizzes (no additional filter)
     
-    # Additional filters
-    if is_active is not None:
-        query = query.filter(Quiz.is_active == is_active)
-    
-    if subject_id:
-        query = query.filter(Quiz.subject_id == subject_id)
-    
-    if department:
-        query = query.filter(Quiz.department == department)
-    
-    if class_year:
-        query = query.filter(Quiz.class_year == class_year)
-    
-    quizzes = query.order_by(Quiz.created_at.desc()).offset(skip).limit(limit).all()
+    # Seek past the last quiz of the previous page
+    if cursor:
+        cursor_created_at, cursor_id = decode_quiz_cursor(cursor)
+        query = query.filter(or_(
+            Quiz.created_at < cursor_created_at,
+            and_(Quiz.created_at == cursor_created_at, Quiz.id < cursor_id)
+        ))
+    query = query.order_by(Quiz.created_at.desc(), Quiz.id.desc())
+    if skip and not cursor:
+        query = query.offset(skip)
+    
+    # Fetch one extra row to know whether there is a next page
+    quizzes = query.limit(limit + 1).all()
+    if len(quizzes) > limit:
+        quizzes = quizzes[:limit]
+        response.headers["X-Next-Cursor"] = encode_quiz_cursor(quizzes[-1])
     return quizzes
 
 @router.get("/{quiz_id}/availability", response_model=QuizAvailability)
@@ -198,13 +274,46 @@ async def check_quiz_timing(
 @router.get("/{quiz_id}", response_model=QuizDetailResponse)
 async def get_quiz(
     quiz_id: int,
+    request: Request,
     include_answers: bool = False,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     Get detailed information about a specific quiz.
+    Students get a pre-serialized view without correct answers, validated with ETag.
+    For quizzes that shuffle, questions are only included once the student has started an
+    attempt, and are then in that attempt's order; answers are submitted as shown there.
     """
+    if current_user.role == RoleEnum.STUDENT:
+        payload = get_quiz_payload(db, quiz_id)
+        if payload is None:
+            if not db.query(Quiz.id).filter(Quiz.id == quiz_id).first():
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Quiz not found"
+                )
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Quiz not available"
+            )
+        
+        body, etag = payload.body, payload.etag
+        if payload.shuffled:
+            attempt = db.query(QuizAttempt.id).filter(
+                QuizAttempt.quiz_id == quiz_id,
+                QuizAttempt.student_id == current_user.id
+            ).first()
+            if attempt:
+                body, etag = payload.for_attempt(attempt_seed(quiz_id, attempt.id))
+            else:
+                body, etag = payload.without_questions()
+        
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+    
     quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
     if not quiz:
         raise HTTPException(
@@ -247,11 +356,40 @@ async def update_quiz(
         )
     
     update_data = quiz_data.dict(exclude_unset=True)
+    
+    # Open attempts answer from a shuffled view; changing the shuffle would remap their letters
+    shuffle_changes = [
+        field for field in ("shuffle_questions", "shuffle_options")
+        if field in update_data and update_data[field] != getattr(quiz, field)
+    ]
+    if shuffle_changes and db.query(QuizAttempt.id).filter(
+        QuizAttempt.quiz_id == quiz_id,
+        QuizAttempt.is_completed == False
+    ).first():
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Shuffle settings cannot be changed while attempts are in progress"
+        )
+    
+    counts_before = quiz_counts(quiz)
     for field, value in update_data.items():
         setattr(quiz, field, value)
     
     db.commit()
     db.refresh(quiz)
+    dashboard_counters.replace(counts_before, quiz_counts(quiz))
+    invalidate_answer_key(quiz_id)
+    invalidate_quiz_payload(quiz_id)
+    schedule_quiz_prewarm(quiz)
+    
+    # A new duration moves the deadline of every open attempt
+    if "duration_minutes" in update_data:
+        open_attempts = db.query(QuizAttempt).filter(
+            QuizAttempt.quiz_id == quiz_id,
+            QuizAttempt.is_completed == False
+        ).all()
+        for attempt in open_attempts:
+            schedule_attempt(attempt, quiz)
     
     return quiz
 
@@ -278,8 +416,13 @@ async def delete_quiz(
             detail="Not enough permissions"
         )
     
+    counts = quiz_counts(quiz)
     db.delete(quiz)
     db.commit()
+    leaderboards.drop(quiz_id)
+    dashboard_counters.adjust(counts, sign=-1)
+    invalidate_answer_key(quiz_id)
+    invalidate_quiz_payload(quiz_id)
     
     return {"message": "Quiz deleted successfully"}
 
@@ -288,57 +431,39 @@ async def delete_quiz(
 async def get_quiz_statistics(
     quiz_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_role(["admin", "teacher"]))
+    current_user: User = Depends(require_role([RoleEnum.ADMIN, RoleEnum.TEACHER]))
 ):
     """
-    Get detailed statistics for a quiz (Teacher/Admin only)
+    Get detailed statistics for a quiz (Teacher/Admin only).
+    Served from the quiz_stats rollup maintained on attempt start and submit.
     """
-    from app.models.models import QuizAttempt
-    from sqlalchemy import func
-    
-    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
-    if not quiz:
+    row = db.query(Quiz, QuizStats).outerjoin(
+        QuizStats, QuizStats.quiz_id == Quiz.id
+    ).filter(Quiz.id == quiz_id).first()
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Quiz not found"
         )
+    quiz, stats = row
     
     # Check permissions
-    if current_user.role == "teacher" and quiz.creator_id != current_user.id:
+    if current_user.role == RoleEnum.TEACHER and quiz.creator_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to view this quiz's statistics"
         )
     
-    total_attempts = db.query(QuizAttempt).filter(
-        QuizAttempt.quiz_id == quiz_id
-    ).count()
+    # Quizzes created before the rollup existed are backfilled on first read
+    if stats is None:
+        rebuild_quiz_stats(db, [quiz_id])
+        db.commit()
+        stats = db.query(QuizStats).filter(QuizStats.quiz_id == quiz_id).first()
     
-    completed_attempts = db.query(QuizAttempt).filter(
-        QuizAttempt.quiz_id == quiz_id,
-        QuizAttempt.is_completed == True
-    ).count()
-    
-    average_score = db.query(func.avg(QuizAttempt.score)).filter(
-        QuizAttempt.quiz_id == quiz_id,
-        QuizAttempt.is_completed == True
-    ).scalar() or 0
-    
-    average_percentage = db.query(func.avg(QuizAttempt.percentage)).filter(
-        QuizAttempt.quiz_id == quiz_id,
-        QuizAttempt.is_completed == True
-    ).scalar() or 0
-    
-    highest_score = db.query(func.max(QuizAttempt.score)).filter(
-        QuizAttempt.quiz_id == quiz_id,
-        QuizAttempt.is_completed == True
-    ).scalar() or 0
-    
-    lowest_score = db.query(func.min(QuizAttempt.score)).filter(
-        QuizAttempt.quiz_id == quiz_id,
-        QuizAttempt.is_completed == True,
-        QuizAttempt.score > 0
-    ).scalar() or 0
+    total_attempts = stats.total_attempts
+    completed_attempts = stats.completed_attempts
+    average_score = stats.score_sum / completed_attempts if completed_attempts else 0
+    average_percentage = stats.percentage_sum / completed_attempts if completed_attempts else 0
     
     return {
         "quiz_id": quiz_id,
@@ -349,12 +474,160 @@ async def get_quiz_statistics(
         "in_progress": total_attempts - completed_attempts,
         "average_score": round(average_score, 2),
         "average_percentage": round(average_percentage, 2),
-        "highest_score": highest_score,
-        "lowest_score": lowest_score,
+        "highest_score": stats.highest_score or 0,
+        "lowest_score": stats.lowest_score or 0,
         "pass_rate": round((completed_attempts / total_attempts * 100), 2) if total_attempts > 0 else 0
     }
 
 
+def _get_staff_quiz(db: Session, quiz_id: int, current_user: User) -> Quiz:
+    """Load a quiz for its creator or an admin."""
+    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
+    if not quiz:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Quiz not found"
+        )
+    
+    if current_user.role == RoleEnum.TEACHER and quiz.creator_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this quiz"
+        )
+    return quiz
+
+def _item_analysis_response(db: Session, quiz_id: int) -> ItemAnalysisResponse:
+    questions = db.query(Question).filter(
+        Question.quiz_id == quiz_id
+    ).order_by(Question.order, Question.id).all()
+    
+    analyzed = [question for question in questions if question.analyzed_at is not None]
+    return ItemAnalysisResponse(
+        quiz_id=quiz_id,
+        attempts_analyzed=max((question.response_count or 0 for question in analyzed), default=0),
+        analyzed_at=max((question.analyzed_at for question in analyzed), default=None),
+        items=[
+            ItemStatisticsResponse(
+                question_id=question.id,
+                question_bank_id=question.question_bank_id,
+                order=question.order,
+                question_text=question.question_text,
+                p_value=question.p_value,
+                discrimination=question.discrimination,
+                response_count=question.response_count,
+                distractor_frequencies=json.loads(question.distractor_frequencies or "{}"),
+                flags=item_flags(question.p_value, question.discrimination)
+            )
+            for question in questions
+        ]
+    )
+
+@router.get("/{quiz_id}/item-analysis", response_model=ItemAnalysisResponse)
+def get_item_analysis(
+    quiz_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role([RoleEnum.ADMIN, RoleEnum.TEACHER]))
+):
+    """
+    Get the stored item analysis of a quiz: per-question difficulty (p-value),
+    discrimination and distractor frequencies (Teacher/Admin only).
+    """
+    _get_staff_quiz(db, quiz_id, current_user)
+    return _item_analysis_response(db, quiz_id)
+
+@router.post("/{quiz_id}/item-analysis", response_model=ItemAnalysisResponse)
+def analyze_quiz_items(
+    quiz_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role([RoleEnum.ADMIN, RoleEnum.TEACHER]))
+):
+    """
+    Run item analysis over the quiz's completed attempts and store the results on its
+    questions and their question bank entries (Teacher/Admin only).
+    """
+    _get_staff_quiz(db, quiz_id, current_user)
+    run_item_analysis(db, quiz_id)
+    db.commit()
+    return _item_analysis_response(db, quiz_id)
+
+@router.get("/{quiz_id}/results.csv")
+def export_results_csv(
+    quiz_id: int,
+    include_answers: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role([RoleEnum.ADMIN, RoleEnum.TEACHER]))
+):
+    """
+    Stream every attempt of a quiz with student details as CSV (Teacher/Admin only).
+    With include_answers=true, one column per question holds the submitted answer.
+    """
+    _get_staff_quiz(db, quiz_id, current_user)
+    return StreamingResponse(
+        csv_chunks(iter_result_rows(quiz_id, include_answers)),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename=quiz_{quiz_id}_results.csv"}
+    )
+
+@router.get("/{quiz_id}/results.xlsx")
+def export_results_xlsx(
+    quiz_id: int,
+    include_answers: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role([RoleEnum.ADMIN, RoleEnum.TEACHER]))
+):
+    """
+    Stream every attempt of a quiz with student details as an Excel workbook (Teacher/Admin only).
+    """
+    _get_staff_quiz(db, quiz_id, current_user)
+    try:
+        import openpyxl  # noqa: F401
+    except ImportError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Excel export requires openpyxl. Please use CSV format."
+        )
+    return StreamingResponse(
+        xlsx_chunks(iter_result_rows(quiz_id, include_answers)),
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={"Content-Disposition": f"attachment; filename=quiz_{quiz_id}_results.xlsx"}
+    )
+
+@router.get("/{quiz_id}/leaderboard", response_model=List[LeaderboardEntry])
+def get_quiz_leaderboard(
+    quiz_id: int,
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_role([RoleEnum.ADMIN, RoleEnum.TEACHER]))
+):
+    """
+    Get the top-scoring attempts of a quiz (quiz creator or Admin only).
+    Students get their own rank from /attempts/{attempt_id}/rank.
+    """
+    _get_staff_quiz(db, quiz_id, current_user)
+    
+    top = leaderboards.top(quiz_id, limit)
+    if not top:
+        return []
+    
+    students = {
+        row.attempt_id: row for row in db.query(
+            QuizAttempt.id.label("attempt_id"), User.id.label("student_id"), User.first_name, User.last_name
+        ).join(User, User.id == QuizAttempt.student_id).filter(
+            QuizAttempt.id.in_([entry.attempt_id for entry in top])
+        ).all()
+    }
+    return [
+        LeaderboardEntry(
+            rank=entry.rank,
+            attempt_id=entry.attempt_id,
+            student_id=students[entry.attempt_id].student_id,
+            student_name=f"{students[entry.attempt_id].first_name} {students[entry.attempt_id].last_name}",
+            score=entry.score
+        )
+        for entry in top
+        if entry.attempt_id in students
+    ]
+
 @router.get("/{quiz_id}/attempts")
 async def get_quiz_attempts(
     quiz_id: int,
@@ -1,17 +1,74 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import csv
+import io
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
-from datetime import datetime
+from sqlalchemy import case, func
+from typing import List, Optional
 from app.core.deps import get_current_user, get_db
-from app.models.models import User, Quiz, QuizAttempt, Subject, QuestionBank, RoleEnum, Question
+from app.db.database import SessionLocal
+from app.services.dashboard_counters import dashboard_counters
+from app.models.models import User, Quiz, QuizAttempt, RoleEnum, Question
 from app.schemas.schemas import TeacherStats, StudentStats, DashboardStats
 
 router = APIRouter()
 
+def _teacher_stats_query(db: Session):
+    """
+    One query for teacher statistics: per-creator aggregates of quizzes, questions and
+    attempts are grouped in subqueries and left-joined onto the teachers.
+    """
+    quiz_agg = db.query(
+        Quiz.creator_id.label("teacher_id"),
+        func.count(Quiz.id).label("total_quizzes"),
+        func.max(Quiz.created_at).label("last_quiz_created")
+    ).group_by(Quiz.creator_id).subquery()
+    
+    question_agg = db.query(
+        Quiz.creator_id.label("teacher_id"),
+        func.count(Question.id).label("total_questions")
+    ).join(Question, Question.quiz_id == Quiz.id).group_by(Quiz.creator_id).subquery()
+    
+    attempt_agg = db.query(
+        Quiz.creator_id.label("teacher_id"),
+        func.count(func.distinct(QuizAttempt.student_id)).label("total_students"),
+        func.avg(case((QuizAttempt.is_completed == True, QuizAttempt.percentage))).label("average_score")
+    ).join(QuizAttempt, QuizAttempt.quiz_id == Quiz.id).group_by(Quiz.creator_id).subquery()
+    
+    return db.query(
+        User,
+        func.coalesce(quiz_agg.c.total_quizzes, 0),
+        func.coalesce(question_agg.c.total_questions, 0),
+        func.coalesce(attempt_agg.c.total_students, 0),
+        attempt_agg.c.average_score,
+        quiz_agg.c.last_quiz_created
+    ).outerjoin(
+        quiz_agg, quiz_agg.c.teacher_id == User.id
+    ).outerjoin(
+        question_agg, question_agg.c.teacher_id == User.id
+    ).outerjoin(
+        attempt_agg, attempt_agg.c.teacher_id == User.id
+    ).filter(User.role == RoleEnum.TEACHER)
+
+def _teacher_stats_from_row(row) -> TeacherStats:
+    teacher, total_quizzes, total_questions, total_students, avg_score, last_quiz_created = row
+    return TeacherStats(
+        teacher_id=teacher.id,
+        teacher_name=f"{teacher.first_name} {teacher.last_name}",
+        email=teacher.email,
+        department=teacher.department,
+        total_quizzes_created=total_quizzes,
+        total_questions_created=total_questions,
+        total_students_attempted=total_students,
+        average_quiz_score=round(avg_score, 2) if avg_score else None,
+        last_quiz_created=last_quiz_created
+    )
+
 @router.get("/teachers", response_model=List[TeacherStats])
 def get_all_teachers_stats(
     department: str = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -24,53 +81,13 @@ def get_all_teachers_stats(
             detail="Only admins can view all teacher statistics"
         )
     
-    query = db.query(User).filter(User.role == RoleEnum.TEACHER)
+    query = _teacher_stats_query(db)
     
     if department:
         query = query.filter(User.department == department)
     
-    teachers = query.all()
-    
-    stats_list = []
-    for teacher in teachers:
-        # Get quiz statistics
-        quizzes = db.query(Quiz).filter(Quiz.creator_id == teacher.id).all()
-        total_quizzes = len(quizzes)
-        
-        # Count total questions created
-        total_questions = db.query(Question).join(Quiz).filter(
-            Quiz.creator_id == teacher.id
-        ).count()
-        
-        # Count unique students who attempted quizzes
-        total_students = db.query(QuizAttempt.student_id).join(Quiz).filter(
-            Quiz.creator_id == teacher.id
-        ).distinct().count()
-        
-        # Calculate average score across all quizzes
-        avg_score_result = db.query(func.avg(QuizAttempt.percentage)).join(Quiz).filter(
-            Quiz.creator_id == teacher.id,
-            QuizAttempt.is_completed == True
-        ).scalar()
-        
-        # Get last quiz created date
-        last_quiz = db.query(Quiz).filter(
-            Quiz.creator_id == teacher.id
-        ).order_by(Quiz.created_at.desc()).first()
-        
-        stats_list.append(TeacherStats(
-            teacher_id=teacher.id,
-            teacher_name=f"{teacher.first_name} {teacher.last_name}",
-            email=teacher.email,
-            department=teacher.department,
-            total_quizzes_created=total_quizzes,
-            total_questions_created=total_questions,
-            total_students_attempted=total_students,
-            average_quiz_score=round(avg_score_result, 2) if avg_score_result else None,
-            last_quiz_created=last_quiz.created_at if last_quiz else None
-        ))
-    
-    return stats_list
+    rows = query.order_by(User.id).offset(skip).limit(limit).all()
+    return [_teacher_stats_from_row(row) for row in rows]
 
 @router.get("/teachers/{teacher_id}", response_model=TeacherStats)
 def get_teacher_stats(
@@ -94,119 +111,156 @@ def get_teacher_stats(
             detail="Teachers can only view their own statistics"
         )
     
-    teacher = db.query(User).filter(
-        User.id == teacher_id,
-        User.role == RoleEnum.TEACHER
-    ).first()
+    row = _teacher_stats_query(db).filter(User.id == teacher_id).first()
     
-    if not teacher:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Teacher not found"
         )
     
-    # Get quiz statistics
-    total_quizzes = db.query(Quiz).filter(Quiz.creator_id == teacher_id).count()
-    
-    # Count total questions created
-    total_questions = db.query(Question).join(Quiz).filter(
-        Quiz.creator_id == teacher_id
-    ).count()
-    
-    # Count unique students who attempted quizzes
-    total_students = db.query(QuizAttempt.student_id).join(Quiz).filter(
-        Quiz.creator_id == teacher_id
-    ).distinct().count()
-    
-    # Calculate average score
-    avg_score_result = db.query(func.avg(QuizAttempt.percentage)).join(Quiz).filter(
-        Quiz.creator_id == teacher_id,
-        QuizAttempt.is_completed == True
-    ).scalar()
-    
-    # Get last quiz created date
-    last_quiz = db.query(Quiz).filter(
-        Quiz.creator_id == teacher_id
-    ).order_by(Quiz.created_at.desc()).first()
-    
-    return TeacherStats(
-        teacher_id=teacher.id,
-        teacher_name=f"{teacher.first_name} {teacher.last_name}",
-        email=teacher.email,
-        department=teacher.department,
-        total_quizzes_created=total_quizzes,
-        total_questions_created=total_questions,
-        total_students_attempted=total_students,
-        average_quiz_score=round(avg_score_result, 2) if avg_score_result else None,
-        last_quiz_created=last_quiz.created_at if last_quiz else None
+    return _teacher_stats_from_row(row)
+
+def _student_stats_query(db: Session):
+    """
+    One aggregate query for student statistics: students left-joined to their attempts
+    and grouped by student.
+    """
+    completed_score = case((QuizAttempt.is_completed == True, QuizAttempt.score))
+    completed_percentage = case((QuizAttempt.is_completed == True, QuizAttempt.percentage))
+    return db.query(
+        User,
+        func.count(QuizAttempt.id),
+        func.count(case((QuizAttempt.is_completed == True, 1))),
+        func.avg(completed_score),
+        func.avg(completed_percentage),
+        func.max(completed_score),
+        func.min(completed_score),
+        func.max(QuizAttempt.started_at)
+    ).outerjoin(
+        QuizAttempt, QuizAttempt.student_id == User.id
+    ).filter(User.role == RoleEnum.STUDENT).group_by(User.id)
+
+def _student_stats_from_row(row) -> StudentStats:
+    (student, total_attempted, total_completed, avg_score, avg_percentage,
+     highest_score, lowest_score, last_attempted) = row
+    return StudentStats(
+        student_id=student.id,
+        student_name=f"{student.first_name} {student.last_name}",
+        email=student.email,
+        student_code=student.student_id,
+        department=student.department,
+        class_year=student.class_year,
+        total_quizzes_attempted=total_attempted,
+        total_quizzes_completed=total_completed,
+        average_score=round(avg_score, 2) if avg_score else None,
+        average_percentage=round(avg_percentage, 2) if avg_percentage else None,
+        highest_score=round(highest_score, 2) if highest_score else None,
+        lowest_score=round(lowest_score, 2) if lowest_score else None,
+        last_quiz_attempted=last_attempted
     )
 
+def _require_staff(current_user: User) -> None:
+    if current_user.role not in [RoleEnum.ADMIN, RoleEnum.TEACHER]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins and teachers can view student statistics"
+        )
+
+def _filter_students(query, department: Optional[str], class_year: Optional[str]):
+    if department:
+        query = query.filter(User.department == department)
+    if class_year:
+        query = query.filter(User.class_year == class_year)
+    return query
+
 @router.get("/students", response_model=List[StudentStats])
 def get_all_students_stats(
+    response: Response,
     department: str = None,
     class_year: str = None,
+    cursor: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Get statistics for all students (Admin or Teacher only)
-    """
-    if current_user.role not in [RoleEnum.ADMIN, RoleEnum.TEACHER]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only admins and teachers can view student statistics"
-        )
-    
-    query = db.query(User).filter(User.role == RoleEnum.STUDENT)
     
-    if department:
-        query = query.filter(User.department == department)
+    Pagination is keyset-based on student id: pass the X-Next-Cursor response header
+    back as `cursor` to get the next page. Use /students/export for the full roster.
+    """
+    _require_staff(current_user)
     
-    if class_year:
-        query = query.filter(User.class_year == class_year)
+    query = _filter_students(_student_stats_query(db), department, class_year)
+    if cursor is not None:
+        query = query.filter(User.id > cursor)
     
-    students = query.all()
+    rows = query.order_by(User.id).limit(limit).all()
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = str(rows[-1][0].id)
     
-    stats_list = []
-    for student in students:
-        # Get quiz attempt statistics
-        attempts = db.query(QuizAttempt).filter(QuizAttempt.student_id == student.id).all()
-        completed_attempts = [a for a in attempts if a.is_completed]
-        
-        # Calculate statistics
-        total_attempted = len(attempts)
-        total_completed = len(completed_attempts)
-        
-        scores = [a.score for a in completed_attempts if a.score is not None]
-        percentages = [a.percentage for a in completed_attempts if a.percentage is not None]
-        
-        avg_score = sum(scores) / len(scores) if scores else None
-        avg_percentage = sum(percentages) / len(percentages) if percentages else None
-        highest_score = max(scores) if scores else None
-        lowest_score = min(scores) if scores else None
-        
-        # Get last quiz attempted
-        last_attempt = db.query(QuizAttempt).filter(
-            QuizAttempt.student_id == student.id
-        ).order_by(QuizAttempt.started_at.desc()).first()
-        
-        stats_list.append(StudentStats(
-            student_id=student.id,
-            student_name=f"{student.first_name} {student.last_name}",
-            email=student.email,
-            student_code=student.student_id,
-            department=student.department,
-            class_year=student.class_year,
-            total_quizzes_attempted=total_attempted,
-            total_quizzes_completed=total_completed,
-            average_score=round(avg_score, 2) if avg_score else None,
-            average_percentage=round(avg_percentage, 2) if avg_percentage else None,
-            highest_score=round(highest_score, 2) if highest_score else None,
-            lowest_score=round(lowest_score, 2) if lowest_score else None,
-            last_quiz_attempted=last_attempt.started_at if last_attempt else None
-        ))
+    return [_student_stats_from_row(row) for row in rows]
+
+EXPORT_PAGE_SIZE = 1000
+
+def _iter_student_stats(department: Optional[str], class_year: Optional[str]):
+    """
+    Yield every matching student's statistics, one keyset page at a time.
+    Uses its own session since streaming outlives the request's dependencies.
+    """
+    db = SessionLocal()
+    try:
+        cursor = 0
+        while True:
+            rows = _filter_students(_student_stats_query(db), department, class_year).filter(
+                User.id > cursor
+            ).order_by(User.id).limit(EXPORT_PAGE_SIZE).all()
+            for row in rows:
+                yield _student_stats_from_row(row)
+            if len(rows) < EXPORT_PAGE_SIZE:
+                break
+            cursor = rows[-1][0].id
+            db.expunge_all()
+    finally:
+        db.close()
+
+def _ndjson_lines(department: Optional[str], class_year: Optional[str]):
+    for stats in _iter_student_stats(department, class_year):
+        yield stats.model_dump_json() + "\n"
+
+def _csv_lines(department: Optional[str], class_year: Optional[str]):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(list(StudentStats.model_fields))
+    for stats in _iter_student_stats(department, class_year):
+        writer.writerow(["" if value is None else value for value in stats.model_dump().values()])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    # Header only, when there are no students
+    if buffer.tell():
+        yield buffer.getvalue()
+
+@router.get("/students/export")
+def export_students_stats(
+    department: str = None,
+    class_year: str = None,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Stream statistics for every student as NDJSON or CSV (Admin or Teacher only)
+    """
+    _require_staff(current_user)
     
-    return stats_list
+    if format == "csv":
+        return StreamingResponse(
+            _csv_lines(department, class_year),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=student_stats.csv"}
+        )
+    return StreamingResponse(_ndjson_lines(department, class_year), media_type="application/x-ndjson")
 
 @router.get("/students/{student_id}", response_model=StudentStats)
 def get_student_stats(
@@ -224,61 +278,25 @@ def get_student_stats(
             detail="Students can only view their own statistics"
         )
     
-    student = db.query(User).filter(
-        User.id == student_id,
-        User.role == RoleEnum.STUDENT
-    ).first()
+    row = _student_stats_query(db).filter(User.id == student_id).first()
     
-    if not student:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Student not found"
         )
     
-    # Get quiz attempt statistics
-    attempts = db.query(QuizAttempt).filter(QuizAttempt.student_id == student_id).all()
-    completed_attempts = [a for a in attempts if a.is_completed]
-    
-    # Calculate statistics
-    total_attempted = len(attempts)
-    total_completed = len(completed_attempts)
-    
-    scores = [a.score for a in completed_attempts if a.score is not None]
-    percentages = [a.percentage for a in completed_attempts if a.percentage is not None]
-    
-    avg_score = sum(scores) / len(scores) if scores else None
-    avg_percentage = sum(percentages) / len(percentages) if percentages else None
-    highest_score = max(scores) if scores else None
-    lowest_score = min(scores) if scores else None
-    
-    # Get last quiz attempted
-    last_attempt = db.query(QuizAttempt).filter(
-        QuizAttempt.student_id == student_id
-    ).order_by(QuizAttempt.started_at.desc()).first()
-    
-    return StudentStats(
-        student_id=student.id,
-        student_name=f"{student.first_name} {student.last_name}",
-        email=student.email,
-        student_code=student.student_id,
-        department=student.department,
-        class_year=student.class_year,
-        total_quizzes_attempted=total_attempted,
-        total_quizzes_completed=total_completed,
-        average_score=round(avg_score, 2) if avg_score else None,
-        average_percentage=round(avg_percentage, 2) if avg_percentage else None,
-        highest_score=round(highest_score, 2) if highest_score else None,
-        lowest_score=round(lowest_score, 2) if lowest_score else None,
-        last_quiz_attempted=last_attempt.started_at if last_attempt else None
-    )
+    return _student_stats_from_row(row)
 
 @router.get("/dashboard", response_model=DashboardStats)
 def get_dashboard_stats(
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Get overall dashboard statistics (Admin only)
+    
+    Served from the in-memory counters; stale_seconds is the time since they were last
+    recounted from the database.
     """
     if current_user.role != RoleEnum.ADMIN:
         raise HTTPException(
@@ -286,38 +304,9 @@ def get_dashboard_stats(
             detail="Only admins can view dashboard statistics"
         )
     
-    total_quizzes = db.query(Quiz).count()
-    total_students = db.query(User).filter(User.role == RoleEnum.STUDENT).count()
-    active_students = db.query(User).filter(
-        User.role == RoleEnum.STUDENT,
-        User.is_active == True
-    ).count()
-    total_teachers = db.query(User).filter(User.role == RoleEnum.TEACHER).count()
-    
-    # Teachers active today (logged in today)
-    today = datetime.utcnow().date()
-    active_teachers_today = db.query(User).filter(
-        User.role == RoleEnum.TEACHER,
-        func.date(User.last_active) == today
-    ).count()
+    snapshot = dashboard_counters.snapshot()
+    if snapshot["reconciled_at"] is None:
+        dashboard_counters.reconcile()
+        snapshot = dashboard_counters.snapshot()
     
-    # Assessments from yesterday
-    from datetime import timedelta
-    yesterday = datetime.utcnow().date() - timedelta(days=1)
-    yesterday_assessments = db.query(QuizAttempt).filter(
-        func.date(QuizAttempt.started_at) == yesterday
-    ).count()
-    
-    total_subjects = db.query(Subject).count()
-    total_question_bank_items = db.query(QuestionBank).count()
-    
-    return DashboardStats(
-        total_quizzes=total_quizzes,
-        active_students=active_students,
-        total_students=total_students,
-        total_teachers=total_teachers,
-        active_teachers_today=active_teachers_today,
-        yesterday_assessments=yesterday_assessments,
-        total_subjects=total_subjects,
-        total_question_bank_items=total_question_bank_items
-    )
+    return DashboardStats(**snapshot)
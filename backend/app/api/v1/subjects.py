@@ -4,6 +4,7 @@ from typing import List
 from app.core.deps import get_current_user, get_db
 from app.models.models import Subject, User, RoleEnum
 from app.schemas.schemas import SubjectCreate, SubjectResponse
+from app.services.dashboard_counters import dashboard_counters
 
 router = APIRouter()
 
@@ -33,6 +34,7 @@ def create_subject(
     db_subject = Subject(**subject.dict())
     db.add(db_subject)
     db.commit()
+    dashboard_counters.adjust({"total_subjects": 1})
     db.refresh(db_subject)
     
     return db_subject
@@ -129,5 +131,6 @@ def delete_subject(
     
     db.delete(subject)
     db.commit()
+    dashboard_counters.adjust({"total_subjects": -1})
     
     return None
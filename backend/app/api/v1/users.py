@@ -8,6 +8,7 @@ from app.models.models import User, RoleEnum
 from app.schemas.schemas import UserCreate, UserResponse, UserUpdate, UserActivityResponse
 from app.core.security import get_password_hash
 from app.core.deps import get_current_active_user, require_role
+from app.services.dashboard_counters import dashboard_counters, user_counts
 
 router = APIRouter()
 
@@ -51,6 +52,7 @@ async def create_user(
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    dashboard_counters.adjust(user_counts(db_user))
     
     return db_user
 
@@ -86,6 +88,7 @@ async def bulk_upload_users(
             )
         
         created_users = []
+        new_users = []
         errors = []
         
         for row_num, row in enumerate(csv_reader, start=2):  # start=2 because row 1 is header
@@ -158,6 +161,7 @@ async def bulk_upload_users(
                 )
                 
                 db.add(new_user)
+                new_users.append(new_user)
                 created_users.append({
                     "email": email,
                     "name": f"{new_user.first_name} {new_user.last_name}",
@@ -173,6 +177,8 @@ async def bulk_upload_users(
         # Commit all users at once
         if created_users:
             db.commit()
+            for new_user in new_users:
+                dashboard_counters.adjust(user_counts(new_user))
         
         return {
             "success": True,
@@ -246,12 +252,14 @@ async def update_user(
             detail="User not found"
         )
     
+    counts_before = user_counts(user)
     update_data = user_data.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(user, field, value)
     
     db.commit()
     db.refresh(user)
+    dashboard_counters.replace(counts_before, user_counts(user))
     
     return user
 
@@ -268,8 +276,10 @@ async def delete_user(
             detail="User not found"
         )
     
+    counts = user_counts(user)
     db.delete(user)
     db.commit()
+    dashboard_counters.adjust(counts, sign=-1)
     
     return {"message": "User deleted successfully"}
 
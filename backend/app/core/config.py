@@ -10,6 +10,38 @@ class Settings(BaseSettings):
     ADMIN_EMAIL: str
     ADMIN_PASSWORD: str
     
+    # Asynchronous submission pipeline
+    SUBMISSION_QUEUE_PATH: str = "submission_queue.db"
+    SUBMISSION_WORKERS: int = 2
+    SUBMISSION_BATCH_SIZE: int = 200
+    SUBMISSION_BATCH_WAIT_SECONDS: float = 0.5
+    
+    # Answer autosave write-behind interval
+    AUTOSAVE_FLUSH_SECONDS: float = 5.0
+    
+    # Build student quiz payloads this long before scheduled_start_time
+    QUIZ_PREWARM_LEAD_SECONDS: int = 120
+    
+    # Attempt-start admission control (0 = derive from the DB connection pool)
+    ADMISSION_CAPACITY: int = 0
+    ADMISSION_RATE_PER_SECOND: float = 0
+    ADMISSION_TICKET_TTL_SECONDS: float = 30
+    
+    # Dashboard counters are recounted from the DB this often
+    DASHBOARD_RECONCILE_SECONDS: float = 300
+    
+    # Analytics aggregates are cached this long
+    ANALYTICS_CACHE_SECONDS: float = 60
+    
+    # Question bank facets are cached this long (bank writes invalidate them sooner)
+    QUESTION_FACETS_CACHE_SECONDS: float = 600
+    
+    # Activity events are written to the DB in batches this often
+    ACTIVITY_FLUSH_SECONDS: float = 2.0
+    
+    # Newest activity events kept in memory for the recent-activity feed
+    ACTIVITY_RECENT_SIZE: int = 500
+    
     @property
     def cors_origins_list(self) -> List[str]:
         return [origin.strip() for origin in self.CORS_ORIGINS.split(",")]
@@ -4,10 +4,21 @@ from app.core.config import settings
 from app.db.database import engine, Base, SessionLocal
 from app.models.models import User, RoleEnum
 from app.core.security import get_password_hash
-from app.api.v1 import auth, users, quizzes, attempts, subjects, question_bank, stats
+from app.api.v1 import auth, users, quizzes, attempts, subjects, question_bank, stats, analytics
+from app.services.submission_queue import submission_queue
+from app.services.attempt_sweeper import attempt_sweeper, start_attempt_sweeper
+from app.services.autosave import autosave_buffer
+from app.services.quiz_payload_cache import quiz_prewarmer, start_quiz_prewarmer
+from app.services.dashboard_counters import dashboard_counters
+from app.services.leaderboard import leaderboards
+from app.services.activity_log import activity_log
+from app.services.question_search import ensure_search_index
+from app.services.near_duplicates import duplicate_index
+from app.services.question_pools import question_pools
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
+ensure_search_index(engine)
 
 # Initialize admin user
 def init_admin():
@@ -49,8 +60,32 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Response headers the frontend reads (pagination cursor, payload ETag, queue back-off)
+    expose_headers=["X-Next-Cursor", "ETag", "Retry-After"],
 )
 
+# Background workers
+@app.on_event("startup")
+def start_background_workers():
+    leaderboards.rebuild()
+    duplicate_index.rebuild()
+    question_pools.rebuild()
+    submission_queue.start()
+    start_attempt_sweeper()
+    autosave_buffer.start()
+    start_quiz_prewarmer()
+    dashboard_counters.start()
+    activity_log.start()
+
+@app.on_event("shutdown")
+def stop_background_workers():
+    submission_queue.stop()
+    attempt_sweeper.stop()
+    autosave_buffer.stop()
+    quiz_prewarmer.stop()
+    dashboard_counters.stop()
+    activity_log.stop()
+
 # Include routers
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["Authentication"])
 app.include_router(users.router, prefix="/api/v1/users", tags=["Users"])
@@ -61,6 +96,7 @@ app.include_router(attempts.router, prefix="/api/v1/attempts", tags=["Quiz Attem
 app.include_router(subjects.router, prefix="/api/v1/subjects", tags=["Subjects"])
 app.include_router(question_bank.router, prefix="/api/v1/question-bank", tags=["Question Bank"])
 app.include_router(stats.router, prefix="/api/v1/stats", tags=["Statistics"])
+app.include_router(analytics.router, prefix="/api/v1/analytics", tags=["Analytics"])
 
 @app.get("/")
 async def root():
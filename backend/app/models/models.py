@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, Text, Enum as SQLEnum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, Text, Index, LargeBinary, Enum as SQLEnum
+from sqlalchemy.orm import deferred, relationship
 from datetime import datetime
 from app.db.database import Base
 import enum
@@ -51,6 +51,11 @@ class Subject(Base):
 
 class Quiz(Base):
     __tablename__ = "quizzes"
+    __table_args__ = (
+        # Quiz listing: student filter and teacher filter, both ordered by newest first
+        Index("ix_quizzes_student_listing", "is_active", "department", "class_year", "created_at"),
+        Index("ix_quizzes_creator_created", "creator_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False)
@@ -69,6 +74,10 @@ class Quiz(Base):
     marks_per_correct = Column(Float, default=1.0)  # + marks for correct answer
     marks_per_incorrect = Column(Float, default=0.0)  # - marks for incorrect answer (negative marking)
     
+    # Per-attempt shuffling (NULL on quizzes created before it existed means off)
+    shuffle_questions = Column(Boolean, default=True)
+    shuffle_options = Column(Boolean, default=True)  # Single-answer choice questions only
+    
     total_marks = Column(Float, default=0)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -79,6 +88,7 @@ class Quiz(Base):
     subject = relationship("Subject", back_populates="quizzes")
     questions = relationship("Question", back_populates="quiz", cascade="all, delete-orphan")
     attempts = relationship("QuizAttempt", back_populates="quiz")
+    stats = relationship("QuizStats", uselist=False, cascade="all, delete-orphan")
 
 class QuestionBank(Base):
     __tablename__ = "question_bank"
@@ -106,6 +116,16 @@ class QuestionBank(Base):
     # Metadata
     times_used = Column(Integer, default=0)  # How many times used in quizzes
     is_active = Column(Boolean, default=True)
+    
+    # Item analysis, pooled over the quizzes this question was used in
+    p_value = Column(Float, nullable=True)  # Share of students answering correctly
+    discrimination = Column(Float, nullable=True)  # Point-biserial vs. rest score
+    response_count = Column(Integer, nullable=True)
+    analyzed_at = Column(DateTime, nullable=True)
+    
+    # Near-duplicate detection (see app.services.near_duplicates)
+    minhash_signature = Column(LargeBinary, nullable=True)
+    duplicate_group_id = Column(Integer, nullable=True, index=True)  # Root question id of the group
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -130,12 +150,25 @@ class Question(Base):
     marks = Column(Float, default=1)
     order = Column(Integer, default=0)  # Question order in quiz
     
+    # Item analysis (see services/item_analysis.py)
+    p_value = Column(Float, nullable=True)  # Share of students answering correctly
+    discrimination = Column(Float, nullable=True)  # Point-biserial vs. rest score
+    response_count = Column(Integer, nullable=True)
+    distractor_frequencies = Column(Text, nullable=True)  # JSON: option -> share of students
+    analyzed_at = Column(DateTime, nullable=True)
+    
     # Relationships
     quiz = relationship("Quiz", back_populates="questions")
     question_bank = relationship("QuestionBank", back_populates="quiz_questions")
 
 class QuizAttempt(Base):
     __tablename__ = "quiz_attempts"
+    __table_args__ = (
+        # One attempt per student per quiz
+        Index("ux_quiz_attempts_quiz_student", "quiz_id", "student_id", unique=True),
+        # Per-student statistics
+        Index("ix_quiz_attempts_student", "student_id", "is_completed"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     quiz_id = Column(Integer, ForeignKey("quizzes.id"), nullable=False)
@@ -152,6 +185,9 @@ class QuizAttempt(Base):
     is_completed = Column(Boolean, default=False)
     time_taken_minutes = Column(Integer, nullable=True)
     
+    # Graded responses packed one byte per question (see services/item_analysis.py)
+    response_codes = deferred(Column(LargeBinary, nullable=True))
+    
     # Relationships
     quiz = relationship("Quiz", back_populates="attempts")
     student = relationship("User", back_populates="quiz_attempts")
@@ -170,3 +206,36 @@ class Answer(Base):
     
     # Relationships
     attempt = relationship("QuizAttempt", back_populates="answers")
+
+# Per-quiz attempt statistics, maintained incrementally on attempt start and submit.
+# Rebuild from quiz_attempts with rebuild_quiz_stats.py.
+class QuizStats(Base):
+    __tablename__ = "quiz_stats"
+    
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), primary_key=True)
+    total_attempts = Column(Integer, nullable=False, default=0)
+    completed_attempts = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0)
+    percentage_sum = Column(Float, nullable=False, default=0)
+    highest_score = Column(Float, nullable=True)
+    lowest_score = Column(Float, nullable=True)  # Lowest score above zero
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# Append-only log of user activity (logins, quiz creation, attempt starts and submits).
+# Written in batches by app.services.activity_log; user and quiz details are copied
+# into each row so the feed never joins back to users or quizzes.
+class ActivityEvent(Base):
+    __tablename__ = "activity_events"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    # login, quiz_created, attempt_started, attempt_submitted, attempt_auto_submitted (sweeper),
+    # attempt_graded (submission queue)
+    action = Column(String(50), nullable=False)
+    user_id = Column(Integer, nullable=True)
+    user_name = Column(String(200), nullable=True)
+    user_role = Column(String(20), nullable=True)
+    quiz_id = Column(Integer, nullable=True)
+    attempt_id = Column(Integer, nullable=True)
+    details = Column(String(500), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 from enum import Enum
 
@@ -172,6 +172,11 @@ class QuestionBankResponse(QuestionBankBase):
     creator_id: int
     times_used: int
     is_active: bool
+    p_value: Optional[float] = None
+    discrimination: Optional[float] = None
+    response_count: Optional[int] = None
+    duplicate_group_id: Optional[int] = None
+    near_duplicate_ids: List[int] = []  # Set when the question was just created or edited
     created_at: datetime
     updated_at: datetime
     
@@ -229,9 +234,35 @@ class QuizCreate(BaseModel):
     grace_period_minutes: int = 5
     marks_per_correct: float = 1.0
     marks_per_incorrect: float = 0.0  # For negative marking
+    shuffle_questions: bool = True  # Question order differs per attempt
+    shuffle_options: bool = True  # Option order of single-answer questions differs per attempt
     questions: List[QuestionCreate] = []
     questions_from_bank: List[QuestionFromBank] = []
 
+class BlueprintSection(BaseModel):
+    topic: Optional[str] = None  # Any topic of the subject when omitted
+    easy: int = Field(default=0, ge=0)
+    medium: int = Field(default=0, ge=0)
+    hard: int = Field(default=0, ge=0)
+
+class QuizBlueprint(BaseModel):
+    title: str
+    description: Optional[str] = None
+    subject_id: int
+    department: Optional[str] = None
+    class_year: Optional[str] = None
+    scheduled_start_time: Optional[datetime] = None
+    duration_minutes: int = 30
+    grace_period_minutes: int = 5
+    marks_per_correct: float = Field(default=1.0, gt=0)
+    marks_per_incorrect: float = 0.0
+    shuffle_questions: bool = True
+    shuffle_options: bool = True
+    sections: List[BlueprintSection] = Field(..., min_length=1)
+    total_marks: Optional[float] = Field(default=None, gt=0)  # Spread evenly; bank marks when omitted
+    exclude_seen: bool = False  # Skip questions already used for this department and class year
+    seed: Optional[int] = None  # Same seed and bank give the same questions
+
 class QuizUpdate(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
@@ -240,6 +271,8 @@ class QuizUpdate(BaseModel):
     grace_period_minutes: Optional[int] = None
     marks_per_correct: Optional[float] = None
     marks_per_incorrect: Optional[float] = None
+    shuffle_questions: Optional[bool] = None
+    shuffle_options: Optional[bool] = None
     is_active: Optional[bool] = None
 
 class QuizResponse(BaseModel):
@@ -255,6 +288,8 @@ class QuizResponse(BaseModel):
     grace_period_minutes: int
     marks_per_correct: float
     marks_per_incorrect: float
+    shuffle_questions: Optional[bool] = None
+    shuffle_options: Optional[bool] = None
     total_marks: float
     is_active: bool
     created_at: datetime
@@ -270,6 +305,29 @@ class QuizDetailResponse(QuizResponse):
     class Config:
         from_attributes = True
 
+# Student-facing quiz view (correct answers are never included)
+class StudentQuestionResponse(BaseModel):
+    id: int
+    quiz_id: int
+    question_text: str
+    question_type: str
+    option_a: Optional[str]
+    option_b: Optional[str]
+    option_c: Optional[str]
+    option_d: Optional[str]
+    marks: float
+    order: int
+    
+    class Config:
+        from_attributes = True
+
+class StudentQuizDetailResponse(QuizResponse):
+    questions: List[StudentQuestionResponse]
+    subject: Optional[SubjectResponse] = None
+    
+    class Config:
+        from_attributes = True
+
 # Quiz Attempt Schemas
 class AnswerSubmit(BaseModel):
     question_id: int
@@ -278,9 +336,23 @@ class AnswerSubmit(BaseModel):
 class QuizAttemptStart(BaseModel):
     quiz_id: int
 
+class AttemptStartQueued(BaseModel):
+    queued: bool = True
+    ticket: str  # send back in the X-Queue-Ticket header when retrying
+    position: int
+    retry_after_seconds: int
+
 class QuizAttemptSubmit(BaseModel):
     answers: List[AnswerSubmit]
 
+class AnswerAutosave(BaseModel):
+    answers: List[AnswerSubmit]
+
+class AutosaveResponse(BaseModel):
+    attempt_id: int
+    accepted: int
+    pending: int  # answers buffered for this attempt, not yet written to the database
+
 class AnswerResponse(BaseModel):
     id: int
     question_id: int
@@ -313,6 +385,37 @@ class QuizAttemptDetailResponse(QuizAttemptResponse):
     class Config:
         from_attributes = True
 
+class SubmissionReceipt(BaseModel):
+    receipt_id: int
+    attempt_id: int
+    status: str
+    received_at: datetime
+
+class SubmissionStatus(BaseModel):
+    attempt_id: int
+    status: str  # 'in_progress', 'queued', 'processing', 'completed', 'failed'
+    receipt_id: Optional[int] = None
+    error: Optional[str] = None
+    score: Optional[float] = None
+    total_marks: Optional[float] = None
+    percentage: Optional[float] = None
+    submitted_at: Optional[datetime] = None
+
+class AttemptRankResponse(BaseModel):
+    attempt_id: int
+    quiz_id: int
+    score: float
+    rank: int  # tied scores share a rank
+    total_ranked: int
+    percentile: float  # share of attempts scoring at or below this one
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    attempt_id: int
+    student_id: int
+    student_name: str
+    score: float
+
 # Stats Schemas
 class TeacherStats(BaseModel):
     teacher_id: int
@@ -344,17 +447,41 @@ class DashboardStats(BaseModel):
     total_quizzes: int
     active_quizzes: int
     total_students: int
+    active_students: int
     total_teachers: int
     active_teachers_today: int
     yesterday_assessments: int
     total_subjects: int
     total_question_bank_items: int
+    reconciled_at: Optional[datetime] = None  # last full recount from the DB
+    updated_at: Optional[datetime] = None  # last event applied since then
+    stale_seconds: Optional[float] = None
+
+class ItemStatisticsResponse(BaseModel):
+    question_id: int
+    question_bank_id: Optional[int]
+    order: int
+    question_text: str
+    p_value: Optional[float]  # share of students answering correctly
+    discrimination: Optional[float]  # point-biserial vs. rest score
+    response_count: Optional[int]
+    distractor_frequencies: Dict[str, float]
+    flags: List[str]  # too_easy, too_hard, low_discrimination
+
+class ItemAnalysisResponse(BaseModel):
+    quiz_id: int
+    attempts_analyzed: int
+    analyzed_at: Optional[datetime]
+    items: List[ItemStatisticsResponse]
 
 class ActivityItem(BaseModel):
     id: int
+    user_id: Optional[int] = None
     user_name: str
     user_role: str
     action: str
+    quiz_id: Optional[int] = None
+    attempt_id: Optional[int] = None
     timestamp: datetime
     details: Optional[str] = None
 
@@ -0,0 +1,141 @@
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Deque, List, Optional
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.models import ActivityEvent, User
+
+logger = logging.getLogger(__name__)
+
+def activity_item(event: ActivityEvent) -> dict:
+    """ActivityItem fields of a stored event."""
+    return {
+        "id": event.id,
+        "user_id": event.user_id,
+        "user_name": event.user_name,
+        "user_role": event.user_role,
+        "action": event.action,
+        "quiz_id": event.quiz_id,
+        "attempt_id": event.attempt_id,
+        "timestamp": event.created_at,
+        "details": event.details
+    }
+
+class ActivityLog:
+    """
+    Batched writer for the append-only activity_events table, with the newest events
+    mirrored in a ring buffer.
+
+    Endpoints call record() after committing; events are held in memory and inserted by
+    a background thread every flush_seconds in one transaction. Once written (and given
+    their ids) they are appended to the ring buffer, so the recent-activity feed is a
+    slice of memory. Anything older than the buffer is paged from the table by id.
+    """
+
+    def __init__(self, flush_seconds: float, recent_size: int):
+        self.flush_seconds = flush_seconds
+        self.recent_size = recent_size
+        self._pending: List[dict] = []
+        # Newest last
+        self._recent: Deque[dict] = deque(maxlen=recent_size)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, action: str, user: User, details: Optional[str] = None,
+               quiz_id: Optional[int] = None, attempt_id: Optional[int] = None) -> None:
+        """Queue an event; user name and role are copied from the user at this point."""
+        event = {
+            "action": action,
+            "user_id": user.id,
+            "user_name": f"{user.first_name} {user.last_name}",
+            "user_role": user.role.value.lower(),
+            "quiz_id": quiz_id,
+            "attempt_id": attempt_id,
+            "details": details[:500] if details else None,
+            "created_at": datetime.utcnow()
+        }
+        with self._lock:
+            self._pending.append(event)
+
+    def recent(self, limit: int) -> List[dict]:
+        """Newest written events first, at most recent_size of them."""
+        with self._lock:
+            count = min(limit, len(self._recent))
+            return [self._recent[-i] for i in range(1, count + 1)]
+
+    def flush(self) -> int:
+        """Insert all pending events; returns the number written."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+
+            db = SessionLocal()
+            try:
+                events = [ActivityEvent(**event) for event in batch]
+                db.add_all(events)
+                db.flush()
+                items = [activity_item(event) for event in events]
+                db.commit()
+            except Exception:
+                db.rollback()
+                # Put the batch back ahead of events recorded in the meantime
+                with self._lock:
+                    self._pending[:0] = batch
+                raise
+            finally:
+                db.close()
+
+            with self._lock:
+                self._recent.extend(items)
+            return len(items)
+
+    def load_recent(self) -> None:
+        """Fill the ring buffer with the newest events in the table."""
+        db = SessionLocal()
+        try:
+            events = db.query(ActivityEvent).order_by(
+                ActivityEvent.id.desc()
+            ).limit(self.recent_size).all()
+            items = [activity_item(event) for event in reversed(events)]
+        finally:
+            db.close()
+        with self._lock:
+            self._recent.clear()
+            self._recent.extend(items)
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Activity log flush failed")
+
+    def start(self) -> None:
+        try:
+            self.load_recent()
+        except Exception:
+            logger.exception("Loading recent activity failed")
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="activity-log", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Final activity log flush failed")
+
+activity_log = ActivityLog(
+    flush_seconds=settings.ACTIVITY_FLUSH_SECONDS,
+    recent_size=settings.ACTIVITY_RECENT_SIZE
+)
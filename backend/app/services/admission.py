@@ -0,0 +1,153 @@
+import bisect
+import itertools
+import math
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Dict, Optional
+from app.core.config import settings
+from app.db.database import engine
+
+class AdmissionDecision:
+    """
+    Outcome of an admission request: either admitted, or queued with a ticket.
+    """
+    __slots__ = ("admitted", "ticket", "position", "retry_after")
+
+    def __init__(self, admitted: bool, ticket: Optional[str] = None,
+                 position: int = 0, retry_after: int = 0):
+        self.admitted = admitted
+        self.ticket = ticket
+        self.position = position
+        self.retry_after = retry_after
+
+class _Ticket:
+    __slots__ = ("sequence", "issued_at", "last_seen")
+
+    def __init__(self, sequence: int, now: float):
+        self.sequence = sequence
+        self.issued_at = now
+        self.last_seen = now
+
+class AdmissionController:
+    """
+    Token-bucket admission control with a FIFO waiting line.
+
+    Requests take a token when one is available and nobody is waiting. Otherwise they get a
+    ticket, a queue position and a retry-after hint; a ticket is admitted only once every
+    ticket issued before it has been admitted or abandoned, so retries are served in FIFO
+    order. Tickets not retried within ticket_ttl seconds are dropped from the line, so the
+    retry-after hint never exceeds half of ticket_ttl; deep queues are polled a few times.
+    """
+
+    def __init__(self, capacity: int, rate: float, ticket_ttl: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.ticket_ttl = ticket_ttl
+        self._tokens = float(capacity)
+        self._refilled_at = time.monotonic()
+        self._sequence = itertools.count()
+        self._tickets: Dict[str, _Ticket] = {}
+        self._waiting = []  # sorted sequences of live tickets
+        self._by_sequence: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        # Metrics
+        self._admitted = 0
+        self._queued = 0
+        self._abandoned = 0
+        self._wait_times = deque(maxlen=1000)
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _remove(self, ticket_id: str) -> _Ticket:
+        ticket = self._tickets.pop(ticket_id)
+        index = bisect.bisect_left(self._waiting, ticket.sequence)
+        del self._waiting[index]
+        del self._by_sequence[ticket.sequence]
+        return ticket
+
+    def _expire(self, now: float) -> None:
+        # Abandoned tickets at the head block everyone behind them; drop them
+        while self._waiting:
+            ticket_id = self._by_sequence[self._waiting[0]]
+            if now - self._tickets[ticket_id].last_seen <= self.ticket_ttl:
+                break
+            self._remove(ticket_id)
+            self._abandoned += 1
+
+    def _queued_decision(self, ticket_id: str, position: int) -> AdmissionDecision:
+        # Time until enough tokens have accumulated for everyone ahead of this ticket,
+        # capped so the ticket is retried (and kept alive) before it expires
+        needed = position + 1 - self._tokens
+        retry_after = max(1, math.ceil(needed / self.rate)) if self.rate > 0 else 1
+        retry_after = min(retry_after, max(1, int(self.ticket_ttl / 2)))
+        return AdmissionDecision(False, ticket_id, position + 1, retry_after)
+
+    def admit(self, ticket_id: Optional[str] = None) -> AdmissionDecision:
+        """
+        Try to admit a request, optionally presenting a ticket from an earlier attempt.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._refill(now)
+            self._expire(now)
+
+            ticket = self._tickets.get(ticket_id) if ticket_id else None
+            if ticket is None:
+                if not self._waiting and self._tokens >= 1:
+                    self._tokens -= 1
+                    self._admitted += 1
+                    self._wait_times.append(0.0)
+                    return AdmissionDecision(True)
+
+                ticket_id = uuid.uuid4().hex
+                ticket = _Ticket(next(self._sequence), now)
+                self._tickets[ticket_id] = ticket
+                self._waiting.append(ticket.sequence)
+                self._by_sequence[ticket.sequence] = ticket_id
+                self._queued += 1
+                return self._queued_decision(ticket_id, len(self._waiting) - 1)
+
+            ticket.last_seen = now
+            position = bisect.bisect_left(self._waiting, ticket.sequence)
+            if position < int(self._tokens):
+                self._remove(ticket_id)
+                self._tokens -= 1
+                self._admitted += 1
+                self._wait_times.append(now - ticket.issued_at)
+                return AdmissionDecision(True)
+            return self._queued_decision(ticket_id, position)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            self._refill(time.monotonic())
+            waits = sorted(self._wait_times)
+        return {
+            "capacity": self.capacity,
+            "rate_per_second": self.rate,
+            "available_tokens": round(self._tokens, 2),
+            "queue_depth": len(self._waiting),
+            "admitted_total": self._admitted,
+            "queued_total": self._queued,
+            "abandoned_total": self._abandoned,
+            "average_wait_seconds": round(sum(waits) / len(waits), 3) if waits else 0.0,
+            "p95_wait_seconds": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0.0,
+            "max_wait_seconds": round(waits[-1], 3) if waits else 0.0
+        }
+
+def _pool_capacity() -> int:
+    """Number of DB connections the pool can hand out at once."""
+    pool = engine.pool
+    size = pool.size() if hasattr(pool, "size") else 5
+    overflow = max(getattr(pool, "_max_overflow", 0), 0)
+    return max(1, size + overflow)
+
+_capacity = settings.ADMISSION_CAPACITY or _pool_capacity()
+attempt_start_admission = AdmissionController(
+    capacity=_capacity,
+    rate=settings.ADMISSION_RATE_PER_SECOND or _capacity * 10.0,
+    ticket_ttl=settings.ADMISSION_TICKET_TTL_SECONDS
+)
@@ -0,0 +1,105 @@
+import threading
+import numpy as np
+from typing import Dict, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.models.models import Question
+from app.services.shuffle import shuffled_choices
+
+def normalize_answer(answer: Optional[str]) -> str:
+    """
+    Normalize an answer for comparison (case and surrounding whitespace are ignored).
+    """
+    return (answer or "").strip().lower()
+
+class AnswerKeyEntry:
+    """
+    Grading information for a single question of a quiz.
+    """
+    __slots__ = ("question_id", "correct_answer", "marks", "question_type", "choices")
+
+    def __init__(self, question_id: int, correct_answer: str, marks: float, question_type: str,
+                 choices: Tuple[str, ...] = ()):
+        self.question_id = question_id
+        self.correct_answer = correct_answer
+        self.marks = marks
+        self.question_type = question_type
+        # Option letters shuffled per attempt (see services/shuffle.py)
+        self.choices = choices
+
+class AnswerKey:
+    """
+    Compiled answer key of a quiz: question_id -> normalized correct answer, marks and type.
+    """
+
+    def __init__(self, quiz_id: int, entries: Dict[int, AnswerKeyEntry]):
+        self.quiz_id = quiz_id
+        self.entries = entries
+        # Column order of the answer/key vectors used by the grading engine
+        self.question_ids = sorted(entries)
+        self.index = {question_id: i for i, question_id in enumerate(self.question_ids)}
+        self.correct_vector = np.array(
+            [entries[question_id].correct_answer for question_id in self.question_ids], dtype=np.str_
+        )
+        self.marks_vector = np.array(
+            [entries[question_id].marks for question_id in self.question_ids], dtype=np.float64
+        )
+        self.choices = {question_id: entry.choices for question_id, entry in entries.items() if entry.choices}
+
+    def get(self, question_id: int) -> Optional[AnswerKeyEntry]:
+        return self.entries.get(question_id)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+# In-process cache of compiled keys, keyed by quiz id
+_answer_keys: Dict[int, AnswerKey] = {}
+# Bumped on every invalidation so a key compiled concurrently with an update is not cached
+_generations: Dict[int, int] = {}
+_lock = threading.Lock()
+
+def compile_answer_key(db: Session, quiz_id: int) -> AnswerKey:
+    """
+    Build the answer key of a quiz with a single query over its questions.
+    """
+    rows = db.query(
+        Question.id, Question.correct_answer, Question.marks, Question.question_type,
+        Question.option_a, Question.option_b, Question.option_c, Question.option_d
+    ).filter(Question.quiz_id == quiz_id).all()
+
+    entries = {
+        row.id: AnswerKeyEntry(
+            question_id=row.id,
+            correct_answer=normalize_answer(row.correct_answer),
+            marks=row.marks if row.marks is not None else 1.0,
+            question_type=row.question_type,
+            choices=shuffled_choices(row.question_type, (row.option_a, row.option_b, row.option_c, row.option_d))
+        )
+        for row in rows
+    }
+    return AnswerKey(quiz_id, entries)
+
+def get_answer_key(db: Session, quiz_id: int) -> AnswerKey:
+    """
+    Return the cached answer key of a quiz, compiling it on first use.
+    """
+    key = _answer_keys.get(quiz_id)
+    if key is not None:
+        return key
+
+    with _lock:
+        generation = _generations.get(quiz_id, 0)
+
+    key = compile_answer_key(db, quiz_id)
+
+    with _lock:
+        if _generations.get(quiz_id, 0) == generation:
+            _answer_keys[quiz_id] = key
+    return key
+
+def invalidate_answer_key(quiz_id: int) -> None:
+    """
+    Drop the cached answer key of a quiz. Call after the quiz or its questions change.
+    """
+    with _lock:
+        _generations[quiz_id] = _generations.get(quiz_id, 0) + 1
+        _answer_keys.pop(quiz_id, None)
@@ -0,0 +1,126 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+from sqlalchemy import insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.models import Quiz, QuizAttempt, Answer
+from app.services.answer_keys import get_answer_key
+from app.services.autosave import autosave_buffer
+from app.services.grading import BatchGradeResult, grade_submissions
+from app.services.item_analysis import encode_responses
+from app.services.quiz_stats import record_attempt_started, record_attempts_completed
+
+def finalize_attempts(
+    db: Session,
+    quiz: Quiz,
+    attempts: List[QuizAttempt],
+    submissions: List[Dict[int, str]],
+    submitted_at: Optional[Sequence[datetime]] = None
+) -> BatchGradeResult:
+    """
+    Grade attempts of one quiz in a single batch and stage the results on the session.
+
+    Answers already saved for an attempt (in the answers table or still in the autosave
+    buffer) are graded together with the submitted ones; a submitted answer replaces the
+    saved answer to the same question. Saved Answer
+    rows are updated in place and new ones added; each attempt is marked completed.
+    The caller owns the transaction (nothing is committed here).
+
+    Args:
+        attempts: Attempts to finalize, all belonging to quiz
+        submissions: question_id -> answer text, one mapping per attempt (same order)
+        submitted_at: Submission time of each attempt (same order, defaults to now)
+    """
+    if submitted_at is None:
+        now = datetime.utcnow()
+        submitted_at = [now] * len(attempts)
+    answer_key = get_answer_key(db, quiz.id)
+
+    # Merge previously saved answers (one query for the whole batch). The autosave buffer
+    # is claimed first: an in-flight flush lands before the DB read, later flushes skip
+    # these attempts
+    buffered = autosave_buffer.claim(attempt.id for attempt in attempts)
+    saved_rows: Dict[int, Dict[int, Answer]] = {attempt.id: {} for attempt in attempts}
+    if attempts:
+        for answer in db.query(Answer).filter(Answer.attempt_id.in_(list(saved_rows))).all():
+            saved_rows[answer.attempt_id][answer.question_id] = answer
+    submissions = [
+        {
+            **{question_id: row.answer_text for question_id, row in saved_rows[attempt.id].items()},
+            **buffered.get(attempt.id, {}),
+            **submission
+        }
+        for attempt, submission in zip(attempts, submissions)
+    ]
+
+    batch = grade_submissions(
+        answer_key, submissions, quiz.marks_per_correct, quiz.marks_per_incorrect
+    )
+
+    answer_rows = []
+    response_codes = encode_responses(batch.answers, batch.correct)
+    for row, (attempt, submission, submitted) in enumerate(zip(attempts, submissions, submitted_at)):
+        for question_id, answer_text in submission.items():
+            column = answer_key.index.get(question_id)
+            if column is None:
+                continue
+            answer = saved_rows[attempt.id].get(question_id)
+            if answer is None:
+                answer = Answer(attempt_id=attempt.id, question_id=question_id)
+                answer_rows.append(answer)
+            answer.answer_text = answer_text
+            answer.is_correct = bool(batch.correct[row, column])
+            answer.marks_awarded = float(batch.awarded[row, column])
+
+        attempt.score = float(batch.scores[row])
+        attempt.total_marks = batch.max_score
+        attempt.percentage = float(batch.percentages[row])
+        attempt.submitted_at = submitted
+        attempt.is_completed = True
+        attempt.response_codes = response_codes[row]
+        attempt.time_taken_minutes = int((submitted - attempt.started_at).total_seconds() / 60)
+
+    db.add_all(answer_rows)
+    record_attempts_completed(db, quiz.id, batch.scores, batch.percentages)
+    return batch
+
+def insert_attempt_if_absent(db: Session, quiz: Quiz, student_id: int) -> Optional[QuizAttempt]:
+    """
+    Create a student's attempt at a quiz in a single INSERT, relying on the unique
+    (quiz_id, student_id) index instead of a check-then-insert.
+
+    The quiz's statistics rollup is updated in the same transaction.
+    Returns the new attempt (committed), or None if the student already has one.
+    The returned object is built from the inserted values and is not attached to the session.
+    """
+    values = {
+        "quiz_id": quiz.id,
+        "student_id": student_id,
+        "total_marks": quiz.total_marks,
+        "started_at": datetime.utcnow(),
+        "is_completed": False
+    }
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        stmt = sqlite_insert(QuizAttempt).values(**values).on_conflict_do_nothing(
+            index_elements=["quiz_id", "student_id"]
+        )
+    elif dialect == "mysql":
+        stmt = insert(QuizAttempt).values(**values).prefix_with("IGNORE")
+    else:
+        stmt = insert(QuizAttempt).values(**values)
+
+    try:
+        result = db.execute(stmt)
+        if result.rowcount == 0:
+            db.rollback()
+            return None
+        record_attempt_started(db, quiz.id)
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return None
+
+    return QuizAttempt(id=result.inserted_primary_key[0], **values)
@@ -0,0 +1,116 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import List, Set
+from app.db.database import SessionLocal
+from app.models.models import Quiz, QuizAttempt, User
+from app.services.activity_log import activity_log
+from app.services.attempt_service import finalize_attempts
+from app.services.leaderboard import leaderboards
+from app.services.scheduler import DeadlineScheduler
+
+logger = logging.getLogger(__name__)
+
+# Expired attempts with a submission still in the queue are checked again this much later
+QUEUED_SUBMISSION_RECHECK_SECONDS = 5
+
+def attempt_deadline(attempt: QuizAttempt, quiz: Quiz) -> datetime:
+    return attempt.started_at + timedelta(minutes=quiz.duration_minutes)
+
+def _queued_submissions(attempt_ids: List[int]) -> Set[int]:
+    # Imported here because the submission queue imports this module
+    from app.services.submission_queue import submission_queue
+    return submission_queue.pending_attempt_ids(attempt_ids)
+
+def finalize_expired_attempts(attempt_ids: List[int]) -> None:
+    """
+    Auto-submit attempts whose time ran out, grading whatever answers were saved.
+    Attempts already submitted in the meantime are skipped, and attempts whose
+    submission is still waiting in the submission queue are left to the queue
+    workers and checked again shortly.
+    """
+    queued = _queued_submissions(attempt_ids)
+    if queued:
+        recheck_at = datetime.utcnow() + timedelta(seconds=QUEUED_SUBMISSION_RECHECK_SECONDS)
+        for attempt_id in queued:
+            attempt_sweeper.schedule(attempt_id, recheck_at)
+        attempt_ids = [attempt_id for attempt_id in attempt_ids if attempt_id not in queued]
+        if not attempt_ids:
+            return
+
+    db = SessionLocal()
+    try:
+        attempts = db.query(QuizAttempt).filter(
+            QuizAttempt.id.in_(attempt_ids),
+            QuizAttempt.is_completed == False
+        ).all()
+        if not attempts:
+            return
+
+        by_quiz = defaultdict(list)
+        for attempt in attempts:
+            by_quiz[attempt.quiz_id].append(attempt)
+        quizzes = {quiz.id: quiz for quiz in db.query(Quiz).filter(Quiz.id.in_(list(by_quiz))).all()}
+
+        graded = []
+        events = []
+        for quiz_id, quiz_attempts in by_quiz.items():
+            quiz = quizzes.get(quiz_id)
+            if quiz is None:
+                continue
+            batch = finalize_attempts(
+                db,
+                quiz,
+                quiz_attempts,
+                [{} for _ in quiz_attempts],
+                submitted_at=[attempt_deadline(attempt, quiz) for attempt in quiz_attempts]
+            )
+            graded.append((quiz_id, [attempt.id for attempt in quiz_attempts], batch.scores))
+            events.extend(
+                (attempt.student_id, quiz_id, attempt.id,
+                 f"Auto-submitted quiz: {quiz.title} (score {score}/{batch.max_score})")
+                for attempt, score in zip(quiz_attempts, batch.scores)
+            )
+
+        db.commit()
+        for quiz_id, graded_ids, scores in graded:
+            leaderboards.record(quiz_id, zip(graded_ids, scores))
+        students = {
+            user.id: user
+            for user in db.query(User).filter(User.id.in_({event[0] for event in events})).all()
+        }
+        for student_id, quiz_id, attempt_id, details in events:
+            activity_log.record(
+                "attempt_auto_submitted", students[student_id], details, quiz_id=quiz_id, attempt_id=attempt_id
+            )
+        logger.info("Auto-submitted %d expired attempt(s)", len(attempts))
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+attempt_sweeper = DeadlineScheduler("attempt-sweeper", finalize_expired_attempts)
+
+def schedule_attempt(attempt: QuizAttempt, quiz: Quiz) -> None:
+    """Register an open attempt for auto-submit at its deadline."""
+    attempt_sweeper.schedule(attempt.id, attempt_deadline(attempt, quiz))
+
+def start_attempt_sweeper() -> None:
+    """
+    Load every open attempt into the deadline heap (one query) and start the sweeper.
+    Attempts that expired while the server was down are finalized right away.
+    """
+    db = SessionLocal()
+    try:
+        open_attempts = db.query(
+            QuizAttempt.id, QuizAttempt.started_at, Quiz.duration_minutes
+        ).join(Quiz, Quiz.id == QuizAttempt.quiz_id).filter(
+            QuizAttempt.is_completed == False
+        ).all()
+    finally:
+        db.close()
+
+    for attempt_id, started_at, duration_minutes in open_attempts:
+        attempt_sweeper.schedule(attempt_id, started_at + timedelta(minutes=duration_minutes))
+    attempt_sweeper.start()
@@ -0,0 +1,151 @@
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Optional
+from sqlalchemy import insert, update
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.models import Answer, QuizAttempt
+
+logger = logging.getLogger(__name__)
+
+# Answers of an attempt being finalized are held back from flushes this long
+FINALIZE_HOLD_SECONDS = 60
+
+class AutosaveBuffer:
+    """
+    Write-behind buffer for incremental answer autosaves.
+
+    Deltas are coalesced in memory per attempt (the latest answer to a question wins) and
+    flushed to the answers table every few seconds with one bulk insert and one bulk update.
+    Each (attempt, question) pair is written at most once per flush interval no matter how
+    often it is autosaved. Answers of attempts completed in the meantime are dropped.
+
+    Finalizing an attempt claims its buffered answers (see claim); flushes leave a claimed
+    attempt alone, so they never write to an attempt while it is being completed.
+    """
+
+    def __init__(self, flush_seconds: float):
+        self.flush_seconds = flush_seconds
+        self._pending: Dict[int, Dict[int, str]] = {}
+        # attempt_id -> monotonic time until which flushes skip the attempt
+        self._held: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        # Held while a flush is in flight so readers never miss answers on their way to the DB
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, attempt_id: int, answers: Dict[int, str]) -> int:
+        """Buffer answer deltas for an attempt; returns how many answers are pending for it."""
+        with self._lock:
+            pending = self._pending.setdefault(attempt_id, {})
+            pending.update(answers)
+            return len(pending)
+
+    def claim(self, attempt_ids: Iterable[int]) -> Dict[int, Dict[int, str]]:
+        """
+        Return a copy of the buffered answers of attempts about to be finalized and hold
+        them back from flushes for FINALIZE_HOLD_SECONDS.
+
+        Waits for any in-flight flush, so when this is called before saved answers are read
+        from the DB, every autosaved answer is in exactly one of the two. Once the attempt
+        is committed as completed, the next flush after the hold drops its answers; if the
+        finalization rolled back, they are flushed as usual.
+        """
+        attempt_ids = list(attempt_ids)
+        with self._flush_lock, self._lock:
+            hold_until = time.monotonic() + FINALIZE_HOLD_SECONDS
+            for attempt_id in attempt_ids:
+                self._held[attempt_id] = hold_until
+            return {
+                attempt_id: dict(self._pending[attempt_id])
+                for attempt_id in attempt_ids
+                if attempt_id in self._pending
+            }
+
+    def flush(self) -> int:
+        """Write all buffered answers; returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                now = time.monotonic()
+                self._held = {attempt_id: until for attempt_id, until in self._held.items() if until > now}
+                batch = {
+                    attempt_id: answers for attempt_id, answers in self._pending.items()
+                    if attempt_id not in self._held
+                }
+                self._pending = {
+                    attempt_id: answers for attempt_id, answers in self._pending.items()
+                    if attempt_id in self._held
+                }
+            if not batch:
+                return 0
+
+            db = SessionLocal()
+            try:
+                open_ids = {
+                    attempt_id for (attempt_id,) in db.query(QuizAttempt.id).filter(
+                        QuizAttempt.id.in_(list(batch)),
+                        QuizAttempt.is_completed == False
+                    ).all()
+                }
+                existing = {
+                    (attempt_id, question_id): answer_id
+                    for answer_id, attempt_id, question_id in db.query(
+                        Answer.id, Answer.attempt_id, Answer.question_id
+                    ).filter(Answer.attempt_id.in_(list(open_ids))).all()
+                } if open_ids else {}
+
+                inserts, updates = [], []
+                for attempt_id in open_ids:
+                    for question_id, answer_text in batch[attempt_id].items():
+                        answer_id = existing.get((attempt_id, question_id))
+                        if answer_id is None:
+                            inserts.append({
+                                "attempt_id": attempt_id,
+                                "question_id": question_id,
+                                "answer_text": answer_text,
+                                "marks_awarded": 0
+                            })
+                        else:
+                            updates.append({"id": answer_id, "answer_text": answer_text})
+
+                if inserts:
+                    db.execute(insert(Answer), inserts)
+                if updates:
+                    db.execute(update(Answer), updates)
+                db.commit()
+                return len(inserts) + len(updates)
+            except Exception:
+                db.rollback()
+                # Put the batch back without overwriting newer deltas
+                with self._lock:
+                    for attempt_id, answers in batch.items():
+                        self._pending[attempt_id] = {**answers, **self._pending.get(attempt_id, {})}
+                raise
+            finally:
+                db.close()
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Autosave flush failed")
+
+    def start(self) -> None:
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="autosave-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Final autosave flush failed")
+
+autosave_buffer = AutosaveBuffer(flush_seconds=settings.AUTOSAVE_FLUSH_SECONDS)
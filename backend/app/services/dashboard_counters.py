@@ -0,0 +1,168 @@
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional, Set
+from sqlalchemy import func
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.models import Quiz, QuizAttempt, QuestionBank, RoleEnum, Subject, User
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = (
+    "total_quizzes", "active_quizzes", "total_students", "active_students",
+    "total_teachers", "total_subjects", "total_question_bank_items"
+)
+
+def user_counts(user: User) -> Dict[str, int]:
+    """Dashboard counters a user contributes to."""
+    if user.role == RoleEnum.STUDENT:
+        return {"total_students": 1, "active_students": 1 if user.is_active else 0}
+    if user.role == RoleEnum.TEACHER:
+        return {"total_teachers": 1}
+    return {}
+
+def quiz_counts(quiz: Quiz) -> Dict[str, int]:
+    """Dashboard counters a quiz contributes to."""
+    return {"total_quizzes": 1, "active_quizzes": 1 if quiz.is_active else 0}
+
+class DashboardCounters:
+    """
+    In-memory dashboard counters kept current by write paths and reconciled against the DB.
+
+    Endpoints call adjust() after committing a create, update or delete, so reading the
+    dashboard is a copy of a handful of ints rather than eight COUNT(*) queries. A
+    background thread recounts everything every reconcile_seconds to correct any drift
+    (writes from other processes, scripts, or events missed during a recount).
+    """
+
+    def __init__(self, reconcile_seconds: float):
+        self.reconcile_seconds = reconcile_seconds
+        self._counts: Dict[str, int] = dict.fromkeys(COUNTERS, 0)
+        self._attempts_by_day: Dict[date, int] = {}
+        self._active_teachers: Dict[date, Set[int]] = {}
+        self._reconciled_at: Optional[datetime] = None
+        self._updated_at: Optional[datetime] = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def adjust(self, deltas: Dict[str, int], sign: int = 1) -> None:
+        """Apply counter deltas (e.g. from user_counts), negated when sign is -1."""
+        if self._reconciled_at is None:
+            return  # Not loaded yet; the first reconcile counts everything
+        with self._lock:
+            for name, delta in deltas.items():
+                self._counts[name] += sign * delta
+            self._updated_at = datetime.utcnow()
+
+    def replace(self, before: Dict[str, int], after: Dict[str, int]) -> None:
+        """Apply the difference between an object's contributions before and after an update."""
+        deltas = dict.fromkeys(set(before) | set(after), 0)
+        for name, value in after.items():
+            deltas[name] += value
+        for name, value in before.items():
+            deltas[name] -= value
+        self.adjust({name: delta for name, delta in deltas.items() if delta})
+
+    def record_attempt_started(self, when: Optional[datetime] = None) -> None:
+        if self._reconciled_at is None:
+            return
+        day = (when or datetime.utcnow()).date()
+        with self._lock:
+            self._attempts_by_day[day] = self._attempts_by_day.get(day, 0) + 1
+            self._updated_at = datetime.utcnow()
+
+    def record_user_active(self, user: User, when: Optional[datetime] = None) -> None:
+        if self._reconciled_at is None or user.role != RoleEnum.TEACHER:
+            return
+        day = (when or datetime.utcnow()).date()
+        with self._lock:
+            self._active_teachers.setdefault(day, set()).add(user.id)
+            self._updated_at = datetime.utcnow()
+
+    def reconcile(self) -> None:
+        """Recount every counter from the DB and replace the in-memory values."""
+        now = datetime.utcnow()
+        today = now.date()
+        yesterday = today - timedelta(days=1)
+        today_start = datetime.combine(today, datetime.min.time())
+        yesterday_start = today_start - timedelta(days=1)
+
+        db = SessionLocal()
+        try:
+            counts = {
+                "total_quizzes": db.query(func.count(Quiz.id)).scalar(),
+                "active_quizzes": db.query(func.count(Quiz.id)).filter(Quiz.is_active == True).scalar(),
+                "total_students": db.query(func.count(User.id)).filter(User.role == RoleEnum.STUDENT).scalar(),
+                "active_students": db.query(func.count(User.id)).filter(
+                    User.role == RoleEnum.STUDENT, User.is_active == True
+                ).scalar(),
+                "total_teachers": db.query(func.count(User.id)).filter(User.role == RoleEnum.TEACHER).scalar(),
+                "total_subjects": db.query(func.count(Subject.id)).scalar(),
+                "total_question_bank_items": db.query(func.count(QuestionBank.id)).scalar()
+            }
+            # Range predicates rather than func.date() so the comparisons stay sargable
+            attempts_by_day = {
+                yesterday: db.query(func.count(QuizAttempt.id)).filter(
+                    QuizAttempt.started_at >= yesterday_start,
+                    QuizAttempt.started_at < today_start
+                ).scalar(),
+                today: db.query(func.count(QuizAttempt.id)).filter(
+                    QuizAttempt.started_at >= today_start
+                ).scalar()
+            }
+            active_teachers = {today: {
+                user_id for (user_id,) in db.query(User.id).filter(
+                    User.role == RoleEnum.TEACHER,
+                    User.last_active >= today_start
+                ).all()
+            }}
+        finally:
+            db.close()
+
+        with self._lock:
+            self._counts = counts
+            self._attempts_by_day = attempts_by_day
+            self._active_teachers = active_teachers
+            self._reconciled_at = self._updated_at = now
+
+    def snapshot(self) -> dict:
+        """
+        Current counter values plus when they were last reconciled and how stale that is.
+        """
+        now = datetime.utcnow()
+        today = now.date()
+        with self._lock:
+            counts = dict(self._counts)
+            counts["active_teachers_today"] = len(self._active_teachers.get(today, ()))
+            counts["yesterday_assessments"] = self._attempts_by_day.get(today - timedelta(days=1), 0)
+            reconciled_at, updated_at = self._reconciled_at, self._updated_at
+        counts["reconciled_at"] = reconciled_at
+        counts["updated_at"] = updated_at
+        counts["stale_seconds"] = round((now - reconciled_at).total_seconds(), 1) if reconciled_at else None
+        return counts
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.reconcile_seconds):
+            try:
+                self.reconcile()
+            except Exception:
+                logger.exception("Dashboard counter reconciliation failed")
+
+    def start(self) -> None:
+        try:
+            self.reconcile()
+        except Exception:
+            logger.exception("Initial dashboard counter load failed")
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="dashboard-counters", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+dashboard_counters = DashboardCounters(reconcile_seconds=settings.DASHBOARD_RECONCILE_SECONDS)
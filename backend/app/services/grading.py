@@ -0,0 +1,140 @@
+import numpy as np
+from typing import Dict, List, Mapping, Optional, Sequence
+from app.services.answer_keys import AnswerKey
+
+class GradedAnswer:
+    """
+    Grading outcome of a single submitted answer.
+    """
+    __slots__ = ("question_id", "answer_text", "is_correct", "marks_awarded")
+
+    def __init__(self, question_id: int, answer_text: Optional[str], is_correct: bool, marks_awarded: float):
+        self.question_id = question_id
+        self.answer_text = answer_text
+        self.is_correct = is_correct
+        self.marks_awarded = marks_awarded
+
+class GradedSubmission:
+    """
+    Grading outcome of one attempt.
+    """
+
+    def __init__(self, score: float, percentage: float, max_score: float, answers: List[GradedAnswer]):
+        self.score = score
+        self.percentage = percentage
+        self.max_score = max_score
+        self.answers = answers
+
+class BatchGradeResult:
+    """
+    Grading outcome of many attempts of the same quiz.
+
+    Matrices are shaped (attempts, questions) with columns in answer_key.question_ids order;
+    answers holds the normalized answer texts.
+    """
+
+    def __init__(self, scores: np.ndarray, percentages: np.ndarray, max_score: float,
+                 answers: np.ndarray, answered: np.ndarray, correct: np.ndarray, awarded: np.ndarray):
+        self.scores = scores
+        self.percentages = percentages
+        self.max_score = max_score
+        self.answers = answers
+        self.answered = answered
+        self.correct = correct
+        self.awarded = awarded
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+def _answer_matrix(answer_key: AnswerKey, submissions: Sequence[Mapping[int, str]]) -> np.ndarray:
+    """
+    Lay submissions out as a normalized (attempts, questions) string matrix.
+    Answers to questions that are not part of the quiz are dropped; missing answers are empty strings.
+    """
+    width = len(answer_key.question_ids)
+    index = answer_key.index
+    rows = []
+    for submission in submissions:
+        row = [""] * width
+        for question_id, answer_text in submission.items():
+            column = index.get(question_id)
+            if column is not None and answer_text:
+                row[column] = answer_text
+        rows.append(row)
+
+    matrix = np.array(rows, dtype=np.str_).reshape(len(rows), width)
+    return np.char.lower(np.char.strip(matrix))
+
+def grade_submissions(
+    answer_key: AnswerKey,
+    submissions: Sequence[Mapping[int, str]],
+    marks_per_correct: float = 1.0,
+    marks_per_incorrect: float = 0.0
+) -> BatchGradeResult:
+    """
+    Grade many submissions of one quiz in a single vectorized pass.
+
+    Marking scheme, per question:
+    - correct answer: +marks_per_correct x question marks
+    - wrong answer: -marks_per_incorrect x question marks (negative marking)
+    - unanswered (missing or blank): 0
+
+    The maximum score covers every question of the quiz, not only the answered ones.
+    Percentages are clamped at 0.
+    """
+    marks_per_correct = marks_per_correct or 0.0
+    marks_per_incorrect = marks_per_incorrect or 0.0
+
+    matrix = _answer_matrix(answer_key, submissions)
+    answered = matrix != ""
+    correct = answered & (matrix == answer_key.correct_vector)
+
+    positive = answer_key.marks_vector * marks_per_correct
+    negative = answer_key.marks_vector * -marks_per_incorrect
+    awarded = np.where(correct, positive, np.where(answered, negative, 0.0))
+
+    scores = awarded.sum(axis=1)
+    max_score = float(positive.sum())
+    if max_score > 0:
+        percentages = np.round(np.maximum(0.0, scores / max_score * 100), 2)
+    else:
+        percentages = np.zeros(len(scores))
+
+    return BatchGradeResult(scores, percentages, max_score, matrix, answered, correct, awarded)
+
+def grade_submission(
+    answer_key: AnswerKey,
+    answers: Mapping[int, str],
+    marks_per_correct: float = 1.0,
+    marks_per_incorrect: float = 0.0
+) -> GradedSubmission:
+    """
+    Grade one submission (question_id -> answer text). See grade_submissions for the marking scheme.
+    """
+    batch = grade_submissions(answer_key, [answers], marks_per_correct, marks_per_incorrect)
+
+    graded_answers = []
+    for question_id, answer_text in answers.items():
+        column = answer_key.index.get(question_id)
+        if column is None:
+            continue
+        graded_answers.append(GradedAnswer(
+            question_id=question_id,
+            answer_text=answer_text,
+            is_correct=bool(batch.correct[0, column]),
+            marks_awarded=float(batch.awarded[0, column])
+        ))
+
+    return GradedSubmission(
+        score=float(batch.scores[0]),
+        percentage=float(batch.percentages[0]),
+        max_score=batch.max_score,
+        answers=graded_answers
+    )
+
+def submission_from_answers(answers) -> Dict[int, str]:
+    """
+    Turn a list of AnswerSubmit-like objects into a question_id -> answer text mapping.
+    The last answer for a question wins.
+    """
+    return {answer.question_id: answer.answer_text for answer in answers}
@@ -0,0 +1,271 @@
+import json
+import numpy as np
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import case, func, select, update
+from sqlalchemy.orm import Session
+from app.models.models import Answer, Question, QuestionBank, QuizAttempt
+from app.services.answer_keys import AnswerKey, get_answer_key, normalize_answer
+
+# Response categories tallied per question; index 0 of the count matrix is "blank"
+CHOICE_LABELS = ("a", "b", "c", "d", "true", "false", "other")
+CHOICE_CODES = {label: code for code, label in enumerate(CHOICE_LABELS)}
+OTHER = CHOICE_CODES["other"]
+BLANK = -1
+
+# Response codes stored on each completed attempt: one byte per question (answer key
+# column order) holding the choice code + 1 (0 = blank), with CORRECT_FLAG set if correct
+CORRECT_FLAG = 0x80
+
+# Labels reported as distractors for each question type (bank and quiz type names)
+MCQ_LABELS = ("a", "b", "c", "d", "other")
+TYPE_LABELS = {
+    "mcq": MCQ_LABELS,
+    "single_choice": MCQ_LABELS,
+    "multiple_choice": MCQ_LABELS,
+    "true_false": ("true", "false", "other"),
+}
+
+# Answers fetched per round trip when building the response matrices
+LOAD_CHUNK_SIZE = 50000
+
+# Thresholds for flagging items
+TOO_EASY_P = 0.9
+TOO_HARD_P = 0.2
+LOW_DISCRIMINATION = 0.2
+
+class ItemStatistics:
+    """
+    Vectorized item statistics of one quiz, columns in answer_key.question_ids order.
+
+    p_values: proportion of students answering each question correctly
+    discrimination: point-biserial correlation of each item with the rest score
+        (total score without the item), NaN where either side has no variance
+    choice_counts: (questions, len(CHOICE_LABELS) + 1) counts; column 0 is blank
+    """
+
+    def __init__(self, attempts: int, p_values: np.ndarray, discrimination: np.ndarray,
+                 choice_counts: np.ndarray):
+        self.attempts = attempts
+        self.p_values = p_values
+        self.discrimination = discrimination
+        self.choice_counts = choice_counts
+
+def compute_item_statistics(correct: np.ndarray, choices: np.ndarray, marks: np.ndarray) -> ItemStatistics:
+    """
+    Compute item statistics from dense (students, questions) matrices.
+
+    correct: bool matrix of correct responses
+    choices: int matrix of CHOICE_CODES, BLANK where unanswered
+    marks: per-question marks used to weight the total score
+    """
+    students, questions = correct.shape
+    if students == 0:
+        nan = np.full(questions, np.nan)
+        return ItemStatistics(0, nan, nan.copy(), np.zeros((questions, len(CHOICE_LABELS) + 1), dtype=np.int64))
+
+    hits = correct.astype(np.float64)
+    p_values = hits.mean(axis=0)
+
+    item_scores = hits * marks
+    rest = item_scores.sum(axis=1)[:, None] - item_scores
+    hits_centered = hits - p_values
+    rest_centered = rest - rest.mean(axis=0)
+    covariance = (hits_centered * rest_centered).mean(axis=0)
+    spread = np.sqrt((hits_centered ** 2).mean(axis=0) * (rest_centered ** 2).mean(axis=0))
+    discrimination = np.full(questions, np.nan)
+    np.divide(covariance, spread, out=discrimination, where=spread > 0)
+
+    width = len(CHOICE_LABELS) + 1
+    cells = np.arange(questions)[None, :] * width + (choices.astype(np.int64) + 1)
+    choice_counts = np.bincount(cells.ravel(), minlength=questions * width).reshape(questions, width)
+
+    return ItemStatistics(students, p_values, discrimination, choice_counts)
+
+def pack_responses(correct: np.ndarray, choices: np.ndarray) -> np.ndarray:
+    """Response code matrix of (attempts, questions) correct and choice matrices."""
+    return (choices.astype(np.int16) + 1).astype(np.uint8) | (correct.astype(np.uint8) * CORRECT_FLAG)
+
+def encode_responses(answers: np.ndarray, correct: np.ndarray) -> List[bytes]:
+    """
+    Response codes of graded attempts, one bytes value per attempt, from the normalized
+    answer matrix and correct matrix of a grading batch (see grading.BatchGradeResult).
+    """
+    choices = np.full(answers.shape, OTHER, dtype=np.int8)
+    for label, code in CHOICE_CODES.items():
+        choices[answers == label] = code
+    choices[answers == ""] = BLANK
+    return [row.tobytes() for row in pack_responses(correct, choices)]
+
+def load_response_matrices(db: Session, answer_key: AnswerKey) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Load a quiz's completed attempts as dense (students, questions) correct and choice
+    matrices.
+
+    Attempts and their response codes are read in one query, so the matrices describe
+    one consistent set of attempts. Attempts without codes (graded before they were
+    stored) are filled from the answers table. Returns the attempt ids, the two matrices
+    and a mask of the rows that came from the answers table.
+    """
+    question_ids = np.array(answer_key.question_ids, dtype=np.int64)
+    rows = db.query(QuizAttempt.id, QuizAttempt.response_codes).filter(
+        QuizAttempt.quiz_id == answer_key.quiz_id,
+        QuizAttempt.is_completed == True
+    ).order_by(QuizAttempt.id).all()
+    attempt_ids = np.array([attempt_id for attempt_id, _ in rows], dtype=np.int64)
+
+    shape = (len(attempt_ids), len(question_ids))
+    correct = np.zeros(shape, dtype=bool)
+    choices = np.full(shape, BLANK, dtype=np.int8)
+    stored = np.array([codes is not None and len(codes) == len(question_ids) for _, codes in rows], dtype=bool)
+    if not len(attempt_ids) or not len(question_ids):
+        return attempt_ids, correct, choices, ~stored
+
+    if stored.any():
+        packed = np.frombuffer(
+            b"".join(codes for (_, codes), has_codes in zip(rows, stored) if has_codes), dtype=np.uint8
+        ).reshape(-1, len(question_ids))
+        correct[stored] = (packed & CORRECT_FLAG) != 0
+        choices[stored] = (packed & (CORRECT_FLAG - 1)).astype(np.int8) - 1
+    if not stored.all():
+        _load_answer_rows(db, answer_key, attempt_ids, ~stored, correct, choices)
+    return attempt_ids, correct, choices, ~stored
+
+def _load_answer_rows(db: Session, answer_key: AnswerKey, attempt_ids: np.ndarray, wanted: np.ndarray,
+                      correct: np.ndarray, choices: np.ndarray) -> None:
+    """
+    Fill the wanted rows of the matrices from the answers table. Answers are streamed in
+    chunks and placed with vectorized index lookups; answer texts are normalized once per
+    distinct text. Answers of attempts outside the wanted rows (including attempts
+    completed after attempt_ids was read) are masked out.
+    """
+    question_ids = np.array(answer_key.question_ids, dtype=np.int64)
+
+    # Distinct raw answer texts -> id; normalized text and choice code per id
+    text_ids: Dict[Optional[str], int] = {}
+    normalized: List[str] = []
+    codes: List[int] = []
+
+    result = db.connection().execute(
+        select(Answer.attempt_id, Answer.question_id, Answer.answer_text)
+        .join(QuizAttempt, QuizAttempt.id == Answer.attempt_id)
+        .where(QuizAttempt.quiz_id == answer_key.quiz_id, QuizAttempt.is_completed == True)
+    )
+    for chunk in result.partitions(LOAD_CHUNK_SIZE):
+        chunk_attempts, chunk_questions, chunk_texts = zip(*chunk)
+        for text in set(chunk_texts).difference(text_ids):
+            answer = normalize_answer(text)
+            text_ids[text] = len(normalized)
+            normalized.append(answer)
+            codes.append(CHOICE_CODES.get(answer, OTHER) if answer else BLANK)
+
+        chunk_attempts = np.array(chunk_attempts, dtype=np.int64)
+        chunk_questions = np.array(chunk_questions, dtype=np.int64)
+        rows = np.minimum(np.searchsorted(attempt_ids, chunk_attempts), len(attempt_ids) - 1)
+        columns = np.minimum(np.searchsorted(question_ids, chunk_questions), len(question_ids) - 1)
+        texts = np.array([text_ids[text] for text in chunk_texts], dtype=np.int64)
+        # Only answers of the wanted attempts to questions still in the quiz are placed
+        keep = (attempt_ids[rows] == chunk_attempts) & wanted[rows] & (question_ids[columns] == chunk_questions)
+
+        rows, columns, texts = rows[keep], columns[keep], texts[keep]
+        answers = np.array(normalized, dtype=np.str_)[texts]
+        choices[rows, columns] = np.array(codes, dtype=np.int8)[texts]
+        correct[rows, columns] = (answers != "") & (answers == answer_key.correct_vector[columns])
+
+def distractor_frequencies(counts: np.ndarray, question_type: str) -> Dict[str, float]:
+    """Share of students picking each option of a question (plus blanks)."""
+    total = counts.sum()
+    if not total:
+        return {}
+    frequencies = {"blank": round(float(counts[0]) / total, 4)}
+    for label in TYPE_LABELS.get((question_type or "").lower(), ("other",)):
+        frequencies[label] = round(float(counts[CHOICE_CODES[label] + 1]) / total, 4)
+    return frequencies
+
+def item_flags(p_value: Optional[float], discrimination: Optional[float]) -> List[str]:
+    flags = []
+    if p_value is not None and p_value >= TOO_EASY_P:
+        flags.append("too_easy")
+    if p_value is not None and p_value <= TOO_HARD_P:
+        flags.append("too_hard")
+    if discrimination is not None and discrimination < LOW_DISCRIMINATION:
+        flags.append("low_discrimination")
+    return flags
+
+def _optional(value: float) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 4)
+
+def run_item_analysis(db: Session, quiz_id: int) -> int:
+    """
+    Analyze a quiz's completed attempts and store the results on its questions, then
+    refresh the pooled statistics of the bank questions they were drawn from.
+    Caller commits. Returns the number of attempts analyzed.
+    """
+    answer_key = get_answer_key(db, quiz_id)
+    if not len(answer_key):
+        return 0
+
+    attempt_ids, correct, choices, loaded_from_answers = load_response_matrices(db, answer_key)
+    stats = compute_item_statistics(correct, choices, answer_key.marks_vector)
+
+    # Store response codes on attempts that had none, so later runs skip the answers table
+    if loaded_from_answers.any():
+        packed = pack_responses(correct[loaded_from_answers], choices[loaded_from_answers])
+        db.execute(update(QuizAttempt), [
+            {"id": int(attempt_id), "response_codes": codes.tobytes()}
+            for attempt_id, codes in zip(attempt_ids[loaded_from_answers], packed)
+        ])
+
+    now = datetime.utcnow()
+    db.execute(update(Question), [
+        {
+            "id": question_id,
+            "p_value": _optional(stats.p_values[column]),
+            "discrimination": _optional(stats.discrimination[column]),
+            "response_count": stats.attempts,
+            "distractor_frequencies": json.dumps(distractor_frequencies(
+                stats.choice_counts[column], answer_key.entries[question_id].question_type
+            )),
+            "analyzed_at": now
+        }
+        for column, question_id in enumerate(answer_key.question_ids)
+    ])
+
+    bank_ids = [bank_id for (bank_id,) in db.query(Question.question_bank_id).filter(
+        Question.quiz_id == quiz_id, Question.question_bank_id.isnot(None)
+    ).distinct().all()]
+    if bank_ids:
+        refresh_bank_item_statistics(db, bank_ids)
+    return stats.attempts
+
+def refresh_bank_item_statistics(db: Session, bank_ids: List[int]) -> None:
+    """
+    Pool the item statistics of every analyzed quiz question drawn from the given bank
+    questions, weighting each quiz by its number of responses. Caller commits.
+    """
+    weight = Question.response_count
+    pooled = db.query(
+        Question.question_bank_id,
+        func.sum(Question.p_value * weight) / func.sum(weight),
+        func.sum(Question.discrimination * weight) / func.nullif(
+            func.sum(case((Question.discrimination.isnot(None), weight), else_=0)), 0
+        ),
+        func.sum(weight)
+    ).filter(
+        Question.question_bank_id.in_(bank_ids),
+        Question.p_value.isnot(None),
+        weight > 0
+    ).group_by(Question.question_bank_id).all()
+
+    now = datetime.utcnow()
+    if pooled:
+        db.execute(update(QuestionBank), [
+            {
+                "id": bank_id,
+                "p_value": round(p_value, 4) if p_value is not None else None,
+                "discrimination": round(discrimination, 4) if discrimination is not None else None,
+                "response_count": responses,
+                "analyzed_at": now
+            }
+            for bank_id, p_value, discrimination, responses in pooled
+        ])
@@ -0,0 +1,120 @@
+import bisect
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.db.database import SessionLocal
+from app.models.models import QuizAttempt
+
+logger = logging.getLogger(__name__)
+
+class AttemptRank:
+    """
+    Position of one attempt on its quiz's leaderboard.
+    Tied scores share a rank (1, 2, 2, 4); percentile is the share of attempts
+    scoring at or below this one.
+    """
+    __slots__ = ("attempt_id", "score", "rank", "total", "percentile")
+
+    def __init__(self, attempt_id: int, score: float, rank: int, total: int):
+        self.attempt_id = attempt_id
+        self.score = score
+        self.rank = rank
+        self.total = total
+        self.percentile = round((total - rank + 1) / total * 100, 2)
+
+class Leaderboard:
+    """
+    Completed attempts of one quiz kept sorted by score (highest first, then attempt id),
+    so rank lookups are a binary search and top-N is a slice.
+    """
+
+    def __init__(self, scores: Iterable[Tuple[int, float]] = ()):
+        self._scores: Dict[int, float] = dict(scores)
+        # (-score, attempt_id), ascending
+        self._keys: List[Tuple[float, int]] = sorted(
+            (-score, attempt_id) for attempt_id, score in self._scores.items()
+        )
+
+    def add(self, attempt_id: int, score: float) -> None:
+        if attempt_id in self._scores:
+            self.remove(attempt_id)
+        self._scores[attempt_id] = score
+        bisect.insort(self._keys, (-score, attempt_id))
+
+    def remove(self, attempt_id: int) -> None:
+        score = self._scores.pop(attempt_id, None)
+        if score is not None:
+            del self._keys[bisect.bisect_left(self._keys, (-score, attempt_id))]
+
+    def rank(self, attempt_id: int) -> Optional[AttemptRank]:
+        score = self._scores.get(attempt_id)
+        if score is None:
+            return None
+        # Attempts with a strictly higher score come first
+        ahead = bisect.bisect_left(self._keys, (-score,))
+        return AttemptRank(attempt_id, score, ahead + 1, len(self._keys))
+
+    def top(self, limit: int) -> List[AttemptRank]:
+        entries = []
+        for position, (negative_score, attempt_id) in enumerate(self._keys[:limit]):
+            if entries and entries[-1].score == -negative_score:
+                rank = entries[-1].rank
+            else:
+                rank = position + 1
+            entries.append(AttemptRank(attempt_id, -negative_score, rank, len(self._keys)))
+        return entries
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+class LeaderboardIndex:
+    """
+    In-memory leaderboards of every quiz. Loaded from the DB on startup and fed with
+    the scores of attempts as their submissions commit.
+    """
+
+    def __init__(self):
+        self._boards: Dict[int, Leaderboard] = {}
+        self._lock = threading.Lock()
+
+    def record(self, quiz_id: int, scores: Iterable[Tuple[int, float]]) -> None:
+        """Add committed (attempt_id, score) pairs to a quiz's leaderboard."""
+        with self._lock:
+            board = self._boards.setdefault(quiz_id, Leaderboard())
+            for attempt_id, score in scores:
+                board.add(attempt_id, float(score or 0))
+
+    def rank(self, quiz_id: int, attempt_id: int) -> Optional[AttemptRank]:
+        with self._lock:
+            board = self._boards.get(quiz_id)
+            return board.rank(attempt_id) if board else None
+
+    def top(self, quiz_id: int, limit: int) -> List[AttemptRank]:
+        with self._lock:
+            board = self._boards.get(quiz_id)
+            return board.top(limit) if board else []
+
+    def drop(self, quiz_id: int) -> None:
+        with self._lock:
+            self._boards.pop(quiz_id, None)
+
+    def rebuild(self) -> None:
+        """Reload every leaderboard from completed attempts (one query)."""
+        db = SessionLocal()
+        try:
+            rows = db.query(QuizAttempt.quiz_id, QuizAttempt.id, QuizAttempt.score).filter(
+                QuizAttempt.is_completed == True
+            ).all()
+        finally:
+            db.close()
+
+        scores: Dict[int, List[Tuple[int, float]]] = {}
+        for quiz_id, attempt_id, score in rows:
+            scores.setdefault(quiz_id, []).append((attempt_id, float(score or 0)))
+        boards = {quiz_id: Leaderboard(quiz_scores) for quiz_id, quiz_scores in scores.items()}
+
+        with self._lock:
+            self._boards = boards
+        logger.info("Loaded leaderboards for %d quiz(zes), %d attempt(s)", len(boards), len(rows))
+
+leaderboards = LeaderboardIndex()
@@ -0,0 +1,343 @@
+import logging
+import re
+import threading
+import zlib
+import numpy as np
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from app.db.database import SessionLocal
+from app.models.models import QuestionBank
+
+logger = logging.getLogger(__name__)
+
+# MinHash signature: NUM_PERM 32-bit minimums, split into BANDS bands of ROWS rows for LSH.
+# With 16 x 8, pairs at Jaccard 0.8 become candidates ~95% of the time, pairs at 0.5 ~6%.
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+
+# Estimated Jaccard similarity (share of equal signature slots) reported as a near-duplicate
+DUPLICATE_THRESHOLD = 0.8
+
+# Pending inserts folded into the sorted band arrays once there are this many
+MERGE_THRESHOLD = 10000
+
+# Questions loaded per round trip when rebuilding the index or clustering
+LOAD_CHUNK_SIZE = 10000
+
+# Hash coefficients are fixed: signatures are stored, so they must not change between runs
+_rng = np.random.default_rng(7_340_033)
+_A = _rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+_SUBJECT_MIX = np.uint64(0x9E3779B97F4A7C15)
+_FNV_PRIME = np.uint64(0x100000001B3)
+_BAND_SALT = _rng.integers(0, 2 ** 63, BANDS, dtype=np.uint64)
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+def question_signature_text(question_text: Optional[str], *options: Optional[str]) -> str:
+    """Text a question is compared on: stem and options, lowercased, punctuation dropped."""
+    parts = [question_text or ""] + [option or "" for option in options]
+    return " ".join(_TOKEN.findall(" ".join(parts).lower()))
+
+def minhash_signature(text: str) -> Optional[np.ndarray]:
+    """MinHash of the text's character shingles, or None when there is no text."""
+    if not text:
+        return None
+    if len(text) <= SHINGLE_SIZE:
+        shingles = {text}
+    else:
+        shingles = {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter(
+        (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles)
+    )
+    # Multiply-shift hashing; the uint64 products are meant to wrap
+    values = (hashes[:, None] * _A + _B) >> np.uint64(32)
+    return values.min(axis=0).astype(np.uint32)
+
+def question_signature(question) -> Optional[np.ndarray]:
+    """MinHash signature of a QuestionBank row or QuestionBankCreate."""
+    return minhash_signature(question_signature_text(
+        question.question_text, question.option_a, question.option_b, question.option_c, question.option_d
+    ))
+
+def signature_to_bytes(signature: Optional[np.ndarray]) -> Optional[bytes]:
+    return signature.astype("<u4").tobytes() if signature is not None else None
+
+def signature_from_bytes(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype="<u4").astype(np.uint32)
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+def band_keys(subject_ids: np.ndarray, signatures: np.ndarray) -> np.ndarray:
+    """
+    (questions, BANDS) bucket keys: each band's ROWS values folded into one 64-bit key,
+    seeded with the band and the subject so keys of different bands never meet and
+    questions only collide within their subject.
+    """
+    rows = signatures.reshape(len(signatures), BANDS, ROWS).astype(np.uint64)
+    keys = (subject_ids.astype(np.uint64) * _SUBJECT_MIX)[:, None] ^ _BAND_SALT[None, :]
+    for row in range(ROWS):
+        keys = (keys ^ rows[:, :, row]) * _FNV_PRIME
+    return keys
+
+class LSHIndex:
+    """
+    In-memory LSH index of the question bank's MinHash signatures.
+
+    The bucket keys of every band live in one sorted array with the question ids
+    alongside, so a lookup is a single vectorized binary search of BANDS keys. New
+    questions go to a small dict until MERGE_THRESHOLD of them have accumulated, then
+    are merged into the arrays. Deleted questions are filtered out of results until the
+    next rebuild. Candidates are verified against their stored signatures by
+    find_near_duplicates.
+    """
+
+    def __init__(self):
+        self._keys = np.empty(0, dtype=np.uint64)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._pending: Dict[int, List[int]] = {}
+        self._pending_ids: List[int] = []
+        self._pending_keys: List[np.ndarray] = []
+        self._removed: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def load(self, question_ids: np.ndarray, subject_ids: np.ndarray, signatures: np.ndarray) -> None:
+        keys = band_keys(subject_ids, signatures).ravel() if len(question_ids) else np.empty(0, dtype=np.uint64)
+        ids = np.repeat(np.asarray(question_ids, dtype=np.int64), BANDS)
+        order = np.argsort(keys, kind="stable")
+        with self._lock:
+            self._keys, self._ids = keys[order], ids[order]
+            self._pending, self._pending_ids, self._pending_keys = {}, [], []
+            self._removed = set()
+
+    def add(self, question_id: int, subject_id: int, signature: np.ndarray) -> None:
+        keys = band_keys(np.array([subject_id]), signature[None, :])[0]
+        with self._lock:
+            for key in keys.tolist():
+                self._pending.setdefault(key, []).append(question_id)
+            self._pending_ids.append(question_id)
+            self._pending_keys.append(keys)
+            self._removed.discard(question_id)
+            if len(self._pending_ids) >= MERGE_THRESHOLD:
+                self._merge()
+
+    def remove(self, question_id: int) -> None:
+        with self._lock:
+            self._removed.add(question_id)
+
+    def candidates(self, subject_id: int, signature: np.ndarray) -> Set[int]:
+        """Ids sharing at least one band bucket with the signature."""
+        keys = band_keys(np.array([subject_id]), signature[None, :])[0]
+        found: Set[int] = set()
+        with self._lock:
+            starts = self._keys.searchsorted(keys, side="left")
+            ends = self._keys.searchsorted(keys, side="right")
+            for start, end in zip(starts[starts < ends].tolist(), ends[starts < ends].tolist()):
+                found.update(self._ids[start:end].tolist())
+            if self._pending:
+                for key in keys.tolist():
+                    found.update(self._pending.get(key, ()))
+            return found - self._removed
+
+    def _merge(self) -> None:
+        keys = np.concatenate([self._keys, np.concatenate(self._pending_keys)])
+        ids = np.concatenate([self._ids, np.repeat(np.array(self._pending_ids, dtype=np.int64), BANDS)])
+        order = np.argsort(keys, kind="stable")
+        self._keys, self._ids = keys[order], ids[order]
+        self._pending, self._pending_ids, self._pending_keys = {}, [], []
+
+    def __len__(self) -> int:
+        return len(self._ids) // BANDS + len(self._pending_ids)
+
+    def rebuild(self) -> None:
+        """Reload every stored signature from the question bank."""
+        db = SessionLocal()
+        try:
+            question_ids, subject_ids, blobs = [], [], []
+            result = db.connection().execute(
+                select(QuestionBank.id, QuestionBank.subject_id, QuestionBank.minhash_signature)
+                .where(QuestionBank.minhash_signature.isnot(None))
+            )
+            for chunk in result.partitions(LOAD_CHUNK_SIZE):
+                for question_id, subject_id, blob in chunk:
+                    question_ids.append(question_id)
+                    subject_ids.append(subject_id)
+                    blobs.append(blob)
+        finally:
+            db.close()
+
+        signatures = np.frombuffer(b"".join(blobs), dtype="<u4").reshape(len(blobs), NUM_PERM)
+        self.load(np.array(question_ids, dtype=np.int64), np.array(subject_ids, dtype=np.int64), signatures)
+        logger.info("Loaded %d question signature(s) into the duplicate index", len(question_ids))
+
+duplicate_index = LSHIndex()
+
+def find_near_duplicates(
+    db: Session,
+    subject_id: int,
+    signature: Optional[np.ndarray],
+    exclude_id: Optional[int] = None,
+    pending_index: Optional[LSHIndex] = None
+) -> List[Tuple[int, Optional[int], float]]:
+    """
+    Bank questions of the subject whose estimated similarity to the signature reaches
+    DUPLICATE_THRESHOLD, as (question_id, duplicate_group_id, similarity), most similar first.
+    pending_index holds questions of the current, uncommitted transaction that are not in
+    the shared index yet.
+    """
+    if signature is None:
+        return []
+    candidates = duplicate_index.candidates(subject_id, signature)
+    if pending_index is not None:
+        candidates |= pending_index.candidates(subject_id, signature)
+    candidates.discard(exclude_id)
+    if not candidates:
+        return []
+
+    matches = []
+    for question_id, group_id, blob in db.query(
+        QuestionBank.id, QuestionBank.duplicate_group_id, QuestionBank.minhash_signature
+    ).filter(
+        QuestionBank.id.in_(candidates),
+        QuestionBank.subject_id == subject_id,
+        QuestionBank.minhash_signature.isnot(None)
+    ):
+        score = similarity(signature, signature_from_bytes(blob))
+        if score >= DUPLICATE_THRESHOLD:
+            matches.append((question_id, group_id, round(score, 4)))
+    matches.sort(key=lambda match: (-match[2], match[0]))
+    return matches
+
+def assign_duplicate_group(db: Session, question: QuestionBank,
+                           matches: List[Tuple[int, Optional[int], float]]) -> None:
+    """
+    Put a new question in the duplicate group of its matches (the lowest group or
+    question id among them), adding ungrouped matches to that group too. Caller commits.
+    """
+    if not matches:
+        return
+    group_id = min(group_id or question_id for question_id, group_id, _ in matches)
+    question.duplicate_group_id = group_id
+    ungrouped = [question_id for question_id, current, _ in matches if current is None]
+    if ungrouped:
+        db.execute(
+            update(QuestionBank).where(QuestionBank.id.in_(ungrouped)).values(duplicate_group_id=group_id)
+        )
+
+def leave_duplicate_group(db: Session, question: QuestionBank) -> None:
+    """
+    Take a question out of its duplicate group before it is edited or deleted. A group left
+    with one member is dissolved; a group losing its root is re-rooted on its lowest
+    remaining question id. Caller commits.
+    """
+    group_id = question.duplicate_group_id
+    if group_id is None:
+        return
+    question.duplicate_group_id = None
+    remaining = sorted(
+        question_id for question_id, in db.query(QuestionBank.id).filter(
+            QuestionBank.duplicate_group_id == group_id,
+            QuestionBank.id != question.id
+        )
+    )
+    if len(remaining) < 2:
+        new_group_id = None
+    elif group_id == question.id:
+        new_group_id = remaining[0]
+    else:
+        return
+    db.execute(
+        update(QuestionBank).where(QuestionBank.id.in_(remaining)).values(duplicate_group_id=new_group_id)
+    )
+
+def backfill_signatures(db: Session, subject_id: int) -> int:
+    """Compute the missing signatures of a subject's questions. Caller commits."""
+    updated, last_id = 0, 0
+    while True:
+        rows = db.query(
+            QuestionBank.id, QuestionBank.question_text, QuestionBank.option_a,
+            QuestionBank.option_b, QuestionBank.option_c, QuestionBank.option_d
+        ).filter(
+            QuestionBank.subject_id == subject_id,
+            QuestionBank.minhash_signature.is_(None),
+            QuestionBank.id > last_id
+        ).order_by(QuestionBank.id).limit(LOAD_CHUNK_SIZE).all()
+        if not rows:
+            return updated
+        db.execute(update(QuestionBank), [
+            {"id": row[0], "minhash_signature": signature_to_bytes(
+                minhash_signature(question_signature_text(*row[1:]))
+            )}
+            for row in rows
+        ])
+        updated += len(rows)
+        last_id = rows[-1][0]
+
+def cluster_subject(db: Session, subject_id: int) -> Tuple[int, int]:
+    """
+    Group a subject's near-duplicate questions and store each group's lowest question id
+    as duplicate_group_id (NULL for questions without duplicates). Candidate pairs come
+    from shared LSH buckets and are verified against the signatures, so the whole subject
+    is clustered without comparing every pair. Caller commits.
+
+    Returns (questions with a signature, duplicate groups).
+    """
+    backfill_signatures(db, subject_id)
+    rows = db.query(QuestionBank.id, QuestionBank.minhash_signature).filter(
+        QuestionBank.subject_id == subject_id,
+        QuestionBank.minhash_signature.isnot(None)
+    ).order_by(QuestionBank.id).all()
+    db.execute(
+        update(QuestionBank).where(QuestionBank.subject_id == subject_id).values(duplicate_group_id=None)
+    )
+    if not rows:
+        return 0, 0
+
+    question_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    signatures = np.frombuffer(b"".join(row[1] for row in rows), dtype="<u4").reshape(len(rows), NUM_PERM)
+    keys = band_keys(np.full(len(rows), subject_id), signatures)
+
+    parent = list(range(len(rows)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    verified: Set[Tuple[int, int]] = set()
+    for band in range(BANDS):
+        order = np.argsort(keys[:, band], kind="stable")
+        sorted_keys = keys[order, band]
+        # Runs of equal keys are buckets with more than one question; singletons are skipped
+        same = np.concatenate(([False], sorted_keys[1:] == sorted_keys[:-1], [False]))
+        edges = np.flatnonzero(np.diff(same.astype(np.int8)))
+        for start, end in zip(edges[::2], edges[1::2]):
+            members = order[start:end + 1].tolist()
+            for position, i in enumerate(members):
+                for j in members[position + 1:]:
+                    pair = (min(i, j), max(i, j))
+                    if pair in verified or find(i) == find(j):
+                        continue
+                    verified.add(pair)
+                    if similarity(signatures[i], signatures[j]) >= DUPLICATE_THRESHOLD:
+                        # Roots are the lowest index, i.e. the lowest question id
+                        root_i, root_j = find(i), find(j)
+                        parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(len(rows)):
+        groups.setdefault(find(i), []).append(i)
+    updates = [
+        {"id": int(question_ids[member]), "duplicate_group_id": int(question_ids[root])}
+        for root, members in groups.items() if len(members) > 1
+        for member in members
+    ]
+    if updates:
+        db.execute(update(QuestionBank), updates)
+    return len(rows), sum(1 for members in groups.values() if len(members) > 1)
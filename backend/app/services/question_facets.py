@@ -0,0 +1,65 @@
+from collections import Counter
+from typing import Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.models import QuestionBank, User
+from app.services.ttl_cache import TTLCache
+
+DIFFICULTIES = ("easy", "medium", "hard")
+
+# Facets per subject; bank writes invalidate their subject, the TTL covers writes made
+# by other processes and scripts
+facet_cache = TTLCache(ttl=settings.QUESTION_FACETS_CACHE_SECONDS, max_entries=1024)
+
+def compute_question_facets(db: Session, subject_id: int) -> dict:
+    """
+    Question counts of a subject's bank by difficulty, topic, question type and creator.
+
+    Only active questions are counted, since inactive ones cannot be picked for a quiz;
+    inactive_questions reports how many were left out. One GROUP BY over the four
+    columns (and is_active) returns the count of every combination that occurs; the
+    per-facet counts are summed from those rows.
+    """
+    rows = db.query(
+        QuestionBank.is_active, QuestionBank.difficulty, QuestionBank.topic, QuestionBank.question_type,
+        QuestionBank.creator_id, User.first_name, User.last_name, func.count(QuestionBank.id)
+    ).outerjoin(User, User.id == QuestionBank.creator_id).filter(
+        QuestionBank.subject_id == subject_id
+    ).group_by(
+        QuestionBank.is_active, QuestionBank.difficulty, QuestionBank.topic, QuestionBank.question_type,
+        QuestionBank.creator_id, User.first_name, User.last_name
+    ).all()
+
+    total = inactive = 0
+    difficulties = Counter({difficulty: 0 for difficulty in DIFFICULTIES})
+    topics, question_types, creators, creator_names = Counter(), Counter(), Counter(), {}
+    for is_active, difficulty, topic, question_type, creator_id, first_name, last_name, count in rows:
+        if not is_active:
+            inactive += count
+            continue
+        total += count
+        difficulties[(difficulty or "medium").lower()] += count
+        topics[topic or ""] += count
+        question_types[(question_type or "").lower()] += count
+        creators[creator_id] += count
+        creator_names[creator_id] = f"{first_name or ''} {last_name or ''}".strip()
+
+    return {
+        "subject_id": subject_id,
+        "total_questions": total,
+        "inactive_questions": inactive,
+        "by_difficulty": dict(difficulties),
+        "by_topic": [{"topic": topic or None, "count": count} for topic, count in topics.most_common()],
+        "by_question_type": dict(question_types.most_common()),
+        "by_creator": [
+            {"creator_id": creator_id, "name": creator_names[creator_id], "count": count}
+            for creator_id, count in creators.most_common()
+        ]
+    }
+
+def get_question_facets(db: Session, subject_id: int) -> dict:
+    return facet_cache.get_or_compute(subject_id, lambda: compute_question_facets(db, subject_id))
+
+def invalidate_question_facets(subject_id: Optional[int]) -> None:
+    facet_cache.invalidate(subject_id)
@@ -0,0 +1,170 @@
+import logging
+from typing import Dict, Iterable, Iterator, List
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from app.models.models import QuestionBank, Subject
+from app.schemas.schemas import QuestionBankCreate
+from app.services.dashboard_counters import dashboard_counters
+from app.services.question_pools import question_pools
+from app.services.question_facets import invalidate_question_facets
+from app.services.near_duplicates import (
+    LSHIndex, assign_duplicate_group, duplicate_index, find_near_duplicates, question_signature,
+    signature_to_bytes
+)
+
+logger = logging.getLogger(__name__)
+
+# Rows inserted per transaction
+IMPORT_BATCH_SIZE = 2000
+
+# Errors and duplicates listed individually in the report (all of them are counted)
+MAX_REPORTED_ROWS = 1000
+
+# Columns every import file needs; option_a-d, topic, difficulty and marks are optional
+REQUIRED_COLUMNS = ("subject_id", "question_text", "question_type", "correct_answer")
+
+def is_valid_utf8(value) -> bool:
+    """False if a value decoded with errors="surrogateescape" holds undecodable bytes."""
+    if value is None:
+        return True
+    if isinstance(value, list):  # csv.DictReader collects extra fields in a list
+        return all(is_valid_utf8(item) for item in value)
+    try:
+        value.encode('utf-8')
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def _clean_row(row: Dict[str, str]) -> Dict[str, str]:
+    """Strip cells and drop empty ones so schema defaults apply."""
+    cleaned = {}
+    for key, value in row.items():
+        if key is None or value is None:
+            continue
+        value = value.strip()
+        if value:
+            cleaned[key.strip()] = value.lower() if key.strip() in ("question_type", "difficulty") else value
+    return cleaned
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}" for detail in error.errors()
+    )
+
+class QuestionImport:
+    """
+    Imports question bank rows from an iterator of CSV dicts.
+
+    Rows are validated with QuestionBankCreate against a subject id set loaded once,
+    and inserted IMPORT_BATCH_SIZE at a time, one transaction per batch, so memory
+    stays flat however long the file is. Each inserted question is checked for
+    near-duplicates (including earlier rows of the same file) and grouped with them.
+    If the file turns out not to be UTF-8 partway through, the rows read so far are kept
+    and the import stops with an error for the first undecodable row.
+    """
+
+    def __init__(self, db: Session, creator_id: int):
+        self.db = db
+        self.creator_id = creator_id
+        self.subject_ids = {subject_id for (subject_id,) in db.query(Subject.id).all()}
+        self.created_count = 0
+        self.error_count = 0
+        self.duplicate_count = 0
+        self.errors: List[dict] = []
+        self.duplicates: List[dict] = []
+
+    def _error(self, row_num: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ROWS:
+            self.errors.append({"row": row_num, "error": message})
+
+    def _decoded_rows(self, rows: Iterable[Dict[str, str]]) -> Iterator[tuple]:
+        """
+        (row_num, row) pairs; stops at the first row that is not valid UTF-8. Rows are expected
+        to be decoded with errors="surrogateescape", so undecodable bytes show up in that row.
+        """
+        for row_num, row in enumerate(rows, start=2):  # start=2 because row 1 is header
+            if not all(is_valid_utf8(value) for value in row.values()):
+                self._error(row_num, "Row is not valid UTF-8; the rest of the file was not imported")
+                return
+            yield row_num, row
+
+    def run(self, rows: Iterable[Dict[str, str]]) -> dict:
+        batch: List[tuple] = []
+        for row_num, row in self._decoded_rows(rows):
+            try:
+                question = QuestionBankCreate(**_clean_row(row))
+            except ValidationError as e:
+                self._error(row_num, _validation_message(e))
+                continue
+            if question.subject_id not in self.subject_ids:
+                self._error(row_num, f"Subject {question.subject_id} not found")
+                continue
+
+            batch.append((row_num, question))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                self._insert(batch)
+                batch = []
+        if batch:
+            self._insert(batch)
+
+        return {
+            "success": True,
+            "created_count": self.created_count,
+            "error_count": self.error_count,
+            "duplicate_count": self.duplicate_count,
+            "errors": self.errors,
+            "near_duplicates": self.duplicates
+        }
+
+    def _insert(self, batch: List[tuple]) -> None:
+        db = self.db
+        signatures = [question_signature(question) for _, question in batch]
+        objects = [
+            QuestionBank(**question.dict(), creator_id=self.creator_id, minhash_signature=signature_to_bytes(signature))
+            for (_, question), signature in zip(batch, signatures)
+        ]
+        duplicates = []
+        # Rows of this batch are matched through a local index until the batch commits
+        batch_index = LSHIndex()
+        try:
+            db.add_all(objects)
+            db.flush()
+            pooled = [(question.id, question.subject_id, question.topic, question.difficulty) for question in objects]
+            # Rows are indexed as they are checked, so later rows also match earlier rows of the file
+            for (row_num, _), db_question, signature in zip(batch, objects, signatures):
+                if signature is None:
+                    continue
+                matches = find_near_duplicates(
+                    db, db_question.subject_id, signature, exclude_id=db_question.id, pending_index=batch_index
+                )
+                batch_index.add(db_question.id, db_question.subject_id, signature)
+                if matches:
+                    assign_duplicate_group(db, db_question, matches)
+                    db.flush()
+                    duplicates.append({
+                        "row": row_num,
+                        "question_id": db_question.id,
+                        "near_duplicate_ids": [question_id for question_id, _, _ in matches]
+                    })
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.exception("Question import batch failed")
+            for row_num, _ in batch:
+                self._error(row_num, f"Batch insert failed: {e}")
+            return
+        finally:
+            db.expunge_all()
+
+        for (question_id, subject_id, _, _), signature in zip(pooled, signatures):
+            if signature is not None:
+                duplicate_index.add(question_id, subject_id, signature)
+        self.duplicate_count += len(duplicates)
+        self.duplicates.extend(duplicates[:MAX_REPORTED_ROWS - len(self.duplicates)])
+        self.created_count += len(objects)
+        dashboard_counters.adjust({"total_question_bank_items": len(objects)})
+        question_pools.add_many(pooled)
+        for subject_id in {question.subject_id for _, question in batch}:
+            invalidate_question_facets(subject_id)
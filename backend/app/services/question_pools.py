@@ -0,0 +1,115 @@
+import logging
+import threading
+import numpy as np
+from typing import Dict, Iterable, Optional, Set, Tuple
+from sqlalchemy import select
+from app.db.database import SessionLocal
+from app.models.models import QuestionBank
+
+logger = logging.getLogger(__name__)
+
+# Questions loaded per round trip when rebuilding the index
+LOAD_CHUNK_SIZE = 50000
+
+def topic_key(topic: Optional[str]) -> str:
+    return (topic or "").strip().lower()
+
+def difficulty_key(difficulty: Optional[str]) -> str:
+    return (difficulty or "medium").strip().lower()
+
+class QuestionPoolIndex:
+    """
+    Active question bank ids grouped by (subject, topic, difficulty), held in memory so
+    quiz generation samples ids without querying or sorting the bank.
+
+    Pools are sets, kept current by the bank's write paths (which only create active
+    questions); a sorted array snapshot of each pool is built on first use after a
+    change and sampled with numpy.
+    """
+
+    def __init__(self):
+        self._pools: Dict[Tuple[int, str, str], Set[int]] = {}
+        self._arrays: Dict[Tuple[int, str, str], np.ndarray] = {}
+        # (subject, difficulty) -> topics with a pool, for blueprints that take any topic
+        self._topics: Dict[Tuple[int, str], Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, question_id: int, subject_id: int, topic: Optional[str], difficulty: Optional[str]) -> None:
+        key = (subject_id, topic_key(topic), difficulty_key(difficulty))
+        self._pools.setdefault(key, set()).add(question_id)
+        self._topics.setdefault((key[0], key[2]), set()).add(key[1])
+        self._arrays.pop(key, None)
+
+    def add(self, question_id: int, subject_id: int, topic: Optional[str], difficulty: Optional[str]) -> None:
+        with self._lock:
+            self._add(question_id, subject_id, topic, difficulty)
+
+    def add_many(self, entries: Iterable[Tuple[int, int, Optional[str], Optional[str]]]) -> None:
+        """Add (question_id, subject_id, topic, difficulty) entries."""
+        with self._lock:
+            for entry in entries:
+                self._add(*entry)
+
+    def remove(self, question_id: int, subject_id: int, topic: Optional[str], difficulty: Optional[str]) -> None:
+        key = (subject_id, topic_key(topic), difficulty_key(difficulty))
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is not None:
+                pool.discard(question_id)
+                self._arrays.pop(key, None)
+
+    def _array(self, key: Tuple[int, str, str]) -> np.ndarray:
+        array = self._arrays.get(key)
+        if array is None:
+            array = np.array(sorted(self._pools.get(key, ())), dtype=np.int64)
+            self._arrays[key] = array
+        return array
+
+    def pool(self, subject_id: int, difficulty: str, topic: Optional[str] = None) -> np.ndarray:
+        """Ids of a pool; topic None means every topic of the subject."""
+        difficulty = difficulty_key(difficulty)
+        with self._lock:
+            if topic is not None:
+                return self._array((subject_id, topic_key(topic), difficulty))
+            topics = self._topics.get((subject_id, difficulty), ())
+            arrays = [self._array((subject_id, key, difficulty)) for key in sorted(topics)]
+        return np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int64)
+
+    def sample(self, subject_id: int, difficulty: str, topic: Optional[str], count: int,
+               rng: np.random.Generator, exclude: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Up to count distinct ids drawn uniformly from a pool, skipping excluded ids.
+        Fewer are returned when the pool is too small.
+        """
+        ids = self.pool(subject_id, difficulty, topic)
+        if exclude is not None and len(exclude) and len(ids):
+            ids = ids[~np.isin(ids, exclude, assume_unique=True)]
+        if count >= len(ids):
+            return rng.permutation(ids)
+        return rng.choice(ids, size=count, replace=False)
+
+    def rebuild(self) -> None:
+        """Reload every pool from the active questions of the bank."""
+        pools: Dict[Tuple[int, str, str], Set[int]] = {}
+        topics: Dict[Tuple[int, str], Set[str]] = {}
+        db = SessionLocal()
+        try:
+            result = db.connection().execute(
+                select(QuestionBank.id, QuestionBank.subject_id, QuestionBank.topic, QuestionBank.difficulty)
+                .where(QuestionBank.is_active == True)
+            )
+            count = 0
+            for chunk in result.partitions(LOAD_CHUNK_SIZE):
+                for question_id, subject_id, topic, difficulty in chunk:
+                    key = (subject_id, topic_key(topic), difficulty_key(difficulty))
+                    pools.setdefault(key, set()).add(question_id)
+                    topics.setdefault((subject_id, key[2]), set()).add(key[1])
+                count += len(chunk)
+        finally:
+            db.close()
+
+        with self._lock:
+            self._pools, self._topics, self._arrays = pools, topics, {}
+        logger.info("Loaded %d question(s) into %d question pool(s)", count, len(pools))
+
+question_pools = QuestionPoolIndex()
@@ -0,0 +1,143 @@
+import logging
+import re
+from typing import List, Optional
+from sqlalchemy import inspect, or_, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app.models.models import QuestionBank
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TABLE = "question_bank_fts"
+FULLTEXT_INDEX = "ft_question_bank_text"
+
+# Searched columns, with their bm25 weights on SQLite
+TEXT_COLUMNS = ("question_text", "option_a", "option_b", "option_c", "option_d", "topic")
+TEXT_WEIGHTS = (10.0, 2.0, 2.0, 2.0, 2.0, 5.0)
+
+# Filter columns; on SQLite they are indexed as tokens so filters are part of the MATCH
+FILTER_COLUMNS = ("subject_id", "difficulty")
+
+_SQLITE_COLUMNS = ", ".join(TEXT_COLUMNS + FILTER_COLUMNS)
+_SQLITE_NEW = ", ".join(f"new.{column}" for column in TEXT_COLUMNS + FILTER_COLUMNS)
+_SQLITE_OLD = ", ".join(f"old.{column}" for column in TEXT_COLUMNS + FILTER_COLUMNS)
+
+# External-content FTS5 table over question_bank, kept in sync by triggers. The update
+# trigger only fires for indexed columns, not for counters and analysis results; it is
+# recreated on startup so databases with an older definition pick this up
+SQLITE_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    f"{_SQLITE_COLUMNS}, content='question_bank', content_rowid='id', tokenize='porter unicode61')",
+    f"CREATE TRIGGER IF NOT EXISTS question_bank_fts_insert AFTER INSERT ON question_bank BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}(rowid, {_SQLITE_COLUMNS}) VALUES (new.id, {_SQLITE_NEW}); END",
+    f"CREATE TRIGGER IF NOT EXISTS question_bank_fts_delete AFTER DELETE ON question_bank BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {_SQLITE_COLUMNS}) "
+    f"VALUES ('delete', old.id, {_SQLITE_OLD}); END",
+    "DROP TRIGGER IF EXISTS question_bank_fts_update",
+    f"CREATE TRIGGER question_bank_fts_update AFTER UPDATE OF {_SQLITE_COLUMNS} ON question_bank BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {_SQLITE_COLUMNS}) "
+    f"VALUES ('delete', old.id, {_SQLITE_OLD}); "
+    f"INSERT INTO {SEARCH_TABLE}(rowid, {_SQLITE_COLUMNS}) VALUES (new.id, {_SQLITE_NEW}); END",
+)
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+def ensure_search_index(engine: Engine) -> None:
+    """
+    Create the full-text index over the question bank if it does not exist yet.
+
+    SQLite gets an FTS5 table maintained by triggers (built from existing rows the first
+    time); MySQL gets a FULLTEXT index, which InnoDB maintains itself. Other databases
+    fall back to LIKE matching in search_questions.
+    """
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        if dialect == "sqlite":
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": SEARCH_TABLE}
+            ).first()
+            for statement in SQLITE_DDL:
+                conn.execute(text(statement))
+            if not exists:
+                conn.execute(text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')"))
+                logger.info("Built %s", SEARCH_TABLE)
+        elif dialect == "mysql":
+            indexes = inspect(conn).get_indexes("question_bank")
+            if not any(index["name"] == FULLTEXT_INDEX for index in indexes):
+                conn.execute(text(
+                    f"ALTER TABLE question_bank ADD FULLTEXT INDEX {FULLTEXT_INDEX} ({', '.join(TEXT_COLUMNS)})"
+                ))
+                logger.info("Built %s", FULLTEXT_INDEX)
+
+def _fts5_query(terms: List[str], subject_id: Optional[int], difficulty: Optional[str]) -> str:
+    """MATCH expression: every term in some text column, plus the filters as column terms."""
+    words = " ".join(f'"{term}"' for term in terms)
+    expression = f"{{{' '.join(TEXT_COLUMNS)}}} : ({words})"
+    if subject_id is not None:
+        expression += f' AND subject_id : "{subject_id}"'
+    if difficulty:
+        expression += f' AND difficulty : "{difficulty}"'
+    return expression
+
+def search_question_ids(
+    db: Session,
+    query: str,
+    subject_id: Optional[int] = None,
+    difficulty: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 50
+) -> List[int]:
+    """
+    Ids of the bank questions matching a free-text query, best match first.
+    Every word of the query has to appear in the question text, an option or the topic.
+    """
+    terms = [term.replace('"', "") for term in _TOKEN.findall(query)]
+    if not terms:
+        return []
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        weights = ", ".join(str(weight) for weight in TEXT_WEIGHTS + (0.0,) * len(FILTER_COLUMNS))
+        rows = db.execute(text(
+            f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match "
+            f"ORDER BY bm25({SEARCH_TABLE}, {weights}) LIMIT :limit OFFSET :skip"
+        ), {"match": _fts5_query(terms, subject_id, difficulty), "limit": limit, "skip": skip})
+        return [row[0] for row in rows]
+
+    if dialect == "mysql":
+        columns = ", ".join(TEXT_COLUMNS)
+        filters, params = "", {
+            "match": " ".join(f"+{term}" for term in terms), "limit": limit, "skip": skip
+        }
+        if subject_id is not None:
+            filters += " AND subject_id = :subject_id"
+            params["subject_id"] = subject_id
+        if difficulty:
+            filters += " AND difficulty = :difficulty"
+            params["difficulty"] = difficulty
+        rows = db.execute(text(
+            f"SELECT id FROM question_bank "
+            f"WHERE MATCH({columns}) AGAINST (:match IN BOOLEAN MODE){filters} "
+            f"ORDER BY MATCH({columns}) AGAINST (:match IN BOOLEAN MODE) DESC, id "
+            f"LIMIT :limit OFFSET :skip"
+        ), params)
+        return [row[0] for row in rows]
+
+    fallback = db.query(QuestionBank.id)
+    for term in terms:
+        pattern = f"%{term}%"
+        fallback = fallback.filter(or_(*(getattr(QuestionBank, column).ilike(pattern) for column in TEXT_COLUMNS)))
+    if subject_id is not None:
+        fallback = fallback.filter(QuestionBank.subject_id == subject_id)
+    if difficulty:
+        fallback = fallback.filter(QuestionBank.difficulty == difficulty)
+    return [question_id for (question_id,) in fallback.order_by(QuestionBank.id).offset(skip).limit(limit).all()]
+
+def search_questions(db: Session, query: str, **filters) -> List[QuestionBank]:
+    """Matching bank questions, best match first (see search_question_ids)."""
+    ids = search_question_ids(db, query, **filters)
+    if not ids:
+        return []
+    questions = {question.id: question for question in db.query(QuestionBank).filter(QuestionBank.id.in_(ids))}
+    return [questions[question_id] for question_id in ids if question_id in questions]
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session, selectinload
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.models import Quiz
+from app.schemas.schemas import StudentQuizDetailResponse
+from app.services.scheduler import DeadlineScheduler
+from app.services.shuffle import (
+    OPTION_FIELDS, OPTION_LETTERS, option_permutations, question_order, shuffled_choices
+)
+
+logger = logging.getLogger(__name__)
+
+_OPTION_KEYS = tuple(f',"{field}":'.encode("ascii") for field in OPTION_FIELDS)
+_QUESTIONS_KEY = b'"questions":[]'
+
+class QuestionFragment:
+    """
+    One question of a payload, pre-serialized without its options and order so an
+    attempt's shuffled view is assembled by concatenating bytes.
+    """
+    __slots__ = ("question_id", "head", "options", "choices")
+
+    def __init__(self, question_id: int, head: bytes, options: Tuple[bytes, ...], choices: Tuple[int, ...]):
+        self.question_id = question_id
+        self.head = head  # JSON object without the closing brace
+        self.options = options  # JSON values of option_a..option_d
+        self.choices = choices  # Positions of the options shuffled per attempt
+
+class QuizPayload:
+    """
+    Student-safe quiz detail (no correct answers), serialized once and served as bytes.
+
+    Quizzes that shuffle questions or options also keep per-question fragments; the
+    view of an attempt applies its permutation to them (see for_attempt).
+    """
+    __slots__ = ("quiz_id", "body", "etag", "prefix", "suffix", "fragments", "shuffle_questions", "shuffle_options")
+
+    def __init__(self, quiz_id: int, body: bytes):
+        self.quiz_id = quiz_id
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        self.prefix = self.suffix = b""
+        self.fragments: List[QuestionFragment] = []
+        self.shuffle_questions = self.shuffle_options = False
+
+    @property
+    def shuffled(self) -> bool:
+        return self.shuffle_questions or self.shuffle_options
+
+    def without_questions(self) -> Tuple[bytes, str]:
+        """
+        Body and ETag of the quiz without its questions, for students who have not started
+        an attempt at a shuffled quiz (no view exists for them to answer from yet).
+        """
+        return self.prefix + _QUESTIONS_KEY + self.suffix, self.etag[:-1] + '-none"'
+
+    def for_attempt(self, seed: int) -> Tuple[bytes, str]:
+        """
+        Body and ETag of an attempt's view: questions in the attempt's order (with order
+        renumbered to match) and options of choice questions permuted.
+        """
+        fragments = self.fragments
+        if self.shuffle_questions:
+            fragments = [fragments[i] for i in question_order(seed, [f.question_id for f in fragments])]
+
+        permutations = option_permutations(
+            seed, [f.question_id for f in fragments], [len(f.choices) for f in fragments]
+        ) if self.shuffle_options else [()] * len(fragments)
+
+        parts = []
+        for position, (fragment, permutation) in enumerate(zip(fragments, permutations)):
+            options = list(fragment.options)
+            for shown, original in zip(fragment.choices, permutation):
+                options[shown] = fragment.options[fragment.choices[original]]
+            parts.append(b"".join((
+                fragment.head,
+                *(key + value for key, value in zip(_OPTION_KEYS, options)),
+                b',"order":', str(position).encode("ascii"), b"}"
+            )))
+
+        body = b"".join((self.prefix, b'"questions":[', b",".join(parts), b"]", self.suffix))
+        return body, self.etag[:-1] + "-" + format(seed & 0xFFFFFFFF, "08x") + '"'
+
+def _split_payload(payload: QuizPayload, detail: StudentQuizDetailResponse) -> None:
+    """Pre-serialize the parts of a payload that attempt views are assembled from."""
+    empty = detail.model_copy(update={"questions": []}).model_dump_json().encode("utf-8")
+    payload.prefix, payload.suffix = empty.split(_QUESTIONS_KEY, 1)
+    payload.fragments = [
+        QuestionFragment(
+            question.id,
+            question.model_dump_json(exclude={*OPTION_FIELDS, "order"}).encode("utf-8")[:-1],
+            tuple(
+                json.dumps(getattr(question, field), ensure_ascii=False).encode("utf-8")
+                for field in OPTION_FIELDS
+            ),
+            tuple(
+                OPTION_LETTERS.index(letter) for letter in shuffled_choices(
+                    question.question_type, [getattr(question, field) for field in OPTION_FIELDS]
+                )
+            ) if detail.shuffle_options else ()
+        )
+        for question in detail.questions
+    ]
+    payload.shuffle_questions = bool(detail.shuffle_questions)
+    payload.shuffle_options = bool(detail.shuffle_options)
+
+# Serialized payloads of active quizzes, keyed by quiz id
+_payloads: Dict[int, QuizPayload] = {}
+_generations: Dict[int, int] = {}
+_lock = threading.Lock()
+
+def build_quiz_payload(db: Session, quiz_id: int) -> Optional[QuizPayload]:
+    """
+    Load a quiz with its questions and subject and serialize the student view.
+    Returns None if the quiz does not exist.
+    """
+    quiz = db.query(Quiz).options(
+        selectinload(Quiz.questions), selectinload(Quiz.subject)
+    ).filter(Quiz.id == quiz_id).first()
+    if not quiz:
+        return None
+
+    detail = StudentQuizDetailResponse.model_validate(quiz)
+    detail.questions.sort(key=lambda question: (question.order, question.id))
+    payload = QuizPayload(quiz.id, detail.model_dump_json().encode("utf-8"))
+    if quiz.shuffle_questions or quiz.shuffle_options:
+        _split_payload(payload, detail)
+    # Only active quizzes are visible to students; inactive ones are never cached
+    return payload if quiz.is_active else None
+
+def get_quiz_payload(db: Session, quiz_id: int) -> Optional[QuizPayload]:
+    """
+    Return the cached student payload of an active quiz, building it on a miss.
+    Returns None if the quiz does not exist or is not active.
+    """
+    payload = _payloads.get(quiz_id)
+    if payload is not None:
+        return payload
+
+    with _lock:
+        generation = _generations.get(quiz_id, 0)
+
+    payload = build_quiz_payload(db, quiz_id)
+
+    if payload is not None:
+        with _lock:
+            if _generations.get(quiz_id, 0) == generation:
+                _payloads[quiz_id] = payload
+    return payload
+
+def invalidate_quiz_payload(quiz_id: int) -> None:
+    """Drop the cached payload of a quiz. Call after the quiz or its questions change."""
+    with _lock:
+        _generations[quiz_id] = _generations.get(quiz_id, 0) + 1
+        _payloads.pop(quiz_id, None)
+
+def prewarm_quiz_payloads(quiz_ids: List[int]) -> None:
+    """Build and cache payloads ahead of their scheduled start."""
+    db = SessionLocal()
+    try:
+        for quiz_id in quiz_ids:
+            get_quiz_payload(db, quiz_id)
+        logger.info("Pre-warmed %d quiz payload(s)", len(quiz_ids))
+    finally:
+        db.close()
+
+quiz_prewarmer = DeadlineScheduler("quiz-prewarmer", prewarm_quiz_payloads)
+
+def schedule_quiz_prewarm(quiz: Quiz) -> None:
+    """Schedule a scheduled quiz's payload to be built shortly before it opens."""
+    if not quiz.scheduled_start_time or not quiz.is_active:
+        quiz_prewarmer.cancel(quiz.id)
+        return
+    lead = timedelta(seconds=settings.QUIZ_PREWARM_LEAD_SECONDS)
+    quiz_prewarmer.schedule(quiz.id, quiz.scheduled_start_time - lead)
+
+def start_quiz_prewarmer() -> None:
+    """
+    Schedule every active quiz that has not opened yet (or is inside its grace period)
+    and start the prewarmer.
+    """
+    db = SessionLocal()
+    try:
+        # Grace periods are minutes long, so anything scheduled over a day ago is closed
+        upcoming = db.query(Quiz).filter(
+            Quiz.is_active == True,
+            Quiz.scheduled_start_time.isnot(None),
+            Quiz.scheduled_start_time >= datetime.utcnow() - timedelta(days=1)
+        ).all()
+        now = datetime.utcnow()
+        for quiz in upcoming:
+            if quiz.scheduled_start_time + timedelta(minutes=quiz.grace_period_minutes) >= now:
+                schedule_quiz_prewarm(quiz)
+    finally:
+        db.close()
+    quiz_prewarmer.start()
@@ -1,7 +1,12 @@
+from collections import Counter, defaultdict
 from datetime import datetime, timedelta
-from typing import Optional, Tuple
-from app.models.models import Quiz, QuizAttempt
-from app.schemas.schemas import QuizAvailability
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from sqlalchemy import func, insert, update
+from sqlalchemy.orm import Session
+from app.models.models import Quiz, QuizAttempt, Question, QuestionBank
+from app.schemas.schemas import QuizAvailability, QuestionCreate, QuestionFromBank, QuizBlueprint
+from app.services.question_pools import question_pools
 
 def check_quiz_availability(quiz: Quiz, student_id: int, existing_attempt: Optional[QuizAttempt] = None) -> QuizAvailability:
     """
@@ -104,32 +109,111 @@ def check_quiz_availability(quiz: Quiz, student_id: int, existing_attempt: Optio
         quiz_end=None
     )
 
-def calculate_quiz_score(answers: list, quiz: Quiz) -> Tuple[float, float]:
+def load_bank_questions(db: Session, question_bank_ids: Iterable[int]) -> Dict[int, QuestionBank]:
     """
-    Calculate the score for a quiz attempt based on custom marking scheme.
-    
-    Args:
-        answers: List of Answer objects with is_correct field set
-        quiz: Quiz object with marking scheme (marks_per_correct, marks_per_incorrect)
-    
-    Returns:
-        Tuple of (total_score, percentage)
+    Fetch question bank items in one IN query, keyed by id.
     """
-    score = 0.0
-    total_questions = len(answers)
-    
-    for answer in answers:
-        if answer.is_correct:
-            score += quiz.marks_per_correct
-            answer.marks_awarded = quiz.marks_per_correct
-        else:
-            score -= quiz.marks_per_incorrect  # Negative marking
-            answer.marks_awarded = -quiz.marks_per_incorrect
-    
-    # Calculate total possible marks
-    max_possible_score = total_questions * quiz.marks_per_correct
-    
-    # Calculate percentage (ensure it doesn't go below 0)
-    percentage = max(0, (score / max_possible_score) * 100) if max_possible_score > 0 else 0
-    
-    return score, round(percentage, 2)
+    ids = set(question_bank_ids)
+    if not ids:
+        return {}
+    return {item.id: item for item in db.query(QuestionBank).filter(QuestionBank.id.in_(ids)).all()}
+
+def add_quiz_questions(
+    db: Session,
+    quiz_id: int,
+    questions: List[QuestionCreate],
+    questions_from_bank: List[QuestionFromBank],
+    bank_items: Dict[int, QuestionBank]
+) -> int:
+    """
+    Insert a quiz's manual and bank questions with one bulk INSERT and bump
+    QuestionBank.times_used with one UPDATE per distinct use count (normally one).
+    bank_items must contain every referenced bank question (see load_bank_questions).
+    Nothing is committed here.
+
+    Returns the number of questions inserted.
+    """
+    rows = [
+        {
+            "quiz_id": quiz_id,
+            "question_text": question.question_text,
+            "question_type": question.question_type.value,
+            "option_a": question.option_a,
+            "option_b": question.option_b,
+            "option_c": question.option_c,
+            "option_d": question.option_d,
+            "correct_answer": question.correct_answer,
+            "marks": question.marks,
+            "order": question.order
+        }
+        for question in questions
+    ]
+
+    # Copy questions from bank to quiz
+    for selection in questions_from_bank:
+        item = bank_items[selection.question_bank_id]
+        rows.append({
+            "quiz_id": quiz_id,
+            "question_bank_id": item.id,
+            "question_text": item.question_text,
+            "question_type": item.question_type,
+            "option_a": item.option_a,
+            "option_b": item.option_b,
+            "option_c": item.option_c,
+            "option_d": item.option_d,
+            "correct_answer": item.correct_answer,
+            "marks": selection.marks,
+            "order": selection.order
+        })
+
+    if rows:
+        db.execute(insert(Question), rows)
+
+    # Track bank usage: group ids by how many times they were picked
+    ids_by_count = defaultdict(list)
+    for question_bank_id, count in Counter(selection.question_bank_id for selection in questions_from_bank).items():
+        ids_by_count[count].append(question_bank_id)
+    for count, ids in ids_by_count.items():
+        db.execute(
+            update(QuestionBank)
+            .where(QuestionBank.id.in_(ids))
+            .values(times_used=func.coalesce(QuestionBank.times_used, 0) + count)
+        )
+
+    return len(rows)
+
+
+def seen_bank_question_ids(db: Session, subject_id: int, department: Optional[str], class_year: Optional[str]) -> np.ndarray:
+    """Bank questions already used in the subject's quizzes for a department and class year."""
+    return np.array([question_bank_id for (question_bank_id,) in db.query(Question.question_bank_id).join(
+        Quiz, Quiz.id == Question.quiz_id
+    ).filter(
+        Quiz.subject_id == subject_id,
+        Quiz.department == department,
+        Quiz.class_year == class_year,
+        Question.question_bank_id.isnot(None)
+    ).distinct().all()], dtype=np.int64)
+
+def sample_blueprint(blueprint: QuizBlueprint, exclude: Optional[np.ndarray] = None) -> List[int]:
+    """
+    Draw bank question ids for every (topic, difficulty) count of a blueprint from the
+    in-memory question pools, without repeats and skipping excluded ids.
+    Raises ValueError naming the first pool that is too small.
+    """
+    rng = np.random.default_rng(blueprint.seed)
+    picked: List[int] = []
+    exclude = exclude if exclude is not None else np.empty(0, dtype=np.int64)
+    for section in blueprint.sections:
+        for difficulty in ("easy", "medium", "hard"):
+            count = getattr(section, difficulty)
+            if not count:
+                continue
+            taken = np.concatenate([exclude, np.array(picked, dtype=np.int64)]) if picked else exclude
+            ids = question_pools.sample(blueprint.subject_id, difficulty, section.topic, count, rng, taken)
+            if len(ids) < count:
+                topic = f"topic '{section.topic}'" if section.topic is not None else "any topic"
+                raise ValueError(
+                    f"Not enough {difficulty} questions for {topic}: need {count}, {len(ids)} available"
+                )
+            picked.extend(ids.tolist())
+    return picked
@@ -0,0 +1,99 @@
+from datetime import datetime
+from typing import Iterable, Optional
+from sqlalchemy import case, func, update
+from sqlalchemy.orm import Session
+from app.models.models import Quiz, QuizAttempt, QuizStats
+
+def record_attempt_started(db: Session, quiz_id: int) -> None:
+    """
+    Count a new attempt in the quiz's rollup row (one UPDATE, caller commits).
+    """
+    db.execute(
+        update(QuizStats)
+        .where(QuizStats.quiz_id == quiz_id)
+        .values(total_attempts=QuizStats.total_attempts + 1, updated_at=datetime.utcnow())
+    )
+
+def record_attempts_completed(db: Session, quiz_id: int, scores: Iterable[float],
+                              percentages: Iterable[float]) -> None:
+    """
+    Fold newly completed attempts into the quiz's rollup row with one atomic UPDATE
+    (counts and running sums are incremented, min/max compared in SQL). Caller commits.
+    """
+    scores = [float(score) for score in scores]
+    percentages = [float(percentage) for percentage in percentages]
+    if not scores:
+        return
+
+    batch_max = max(scores)
+    positive = [score for score in scores if score > 0]
+    values = {
+        "completed_attempts": QuizStats.completed_attempts + len(scores),
+        "score_sum": QuizStats.score_sum + sum(scores),
+        "percentage_sum": QuizStats.percentage_sum + sum(percentages),
+        "highest_score": case(
+            (QuizStats.highest_score.is_(None), batch_max),
+            (QuizStats.highest_score < batch_max, batch_max),
+            else_=QuizStats.highest_score
+        ),
+        "updated_at": datetime.utcnow()
+    }
+    if positive:
+        batch_min = min(positive)
+        values["lowest_score"] = case(
+            (QuizStats.lowest_score.is_(None), batch_min),
+            (QuizStats.lowest_score > batch_min, batch_min),
+            else_=QuizStats.lowest_score
+        )
+
+    db.execute(update(QuizStats).where(QuizStats.quiz_id == quiz_id).values(**values))
+
+def rebuild_quiz_stats(db: Session, quiz_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Recompute rollup rows from quiz_attempts with one grouped query and replace them.
+    Rebuilds every quiz when quiz_ids is None. Caller commits.
+
+    Returns the number of rows written.
+    """
+    quiz_query = db.query(Quiz.id)
+    attempts_query = db.query(
+        QuizAttempt.quiz_id,
+        func.count(QuizAttempt.id),
+        func.count(case((QuizAttempt.is_completed == True, 1))),
+        func.sum(case((QuizAttempt.is_completed == True, QuizAttempt.score), else_=0)),
+        func.sum(case((QuizAttempt.is_completed == True, QuizAttempt.percentage), else_=0)),
+        func.max(case((QuizAttempt.is_completed == True, QuizAttempt.score))),
+        func.min(case(((QuizAttempt.is_completed == True) & (QuizAttempt.score > 0), QuizAttempt.score)))
+    ).group_by(QuizAttempt.quiz_id)
+
+    if quiz_ids is not None:
+        quiz_ids = list(quiz_ids)
+        quiz_query = quiz_query.filter(Quiz.id.in_(quiz_ids))
+        attempts_query = attempts_query.filter(QuizAttempt.quiz_id.in_(quiz_ids))
+
+    aggregates = {row[0]: row[1:] for row in attempts_query.all()}
+    existing_ids = [quiz_id for (quiz_id,) in quiz_query.all()]
+
+    stats_query = db.query(QuizStats)
+    if quiz_ids is not None:
+        stats_query = stats_query.filter(QuizStats.quiz_id.in_(quiz_ids))
+    stats_query.delete(synchronize_session=False)
+
+    now = datetime.utcnow()
+    rows = []
+    for quiz_id in existing_ids:
+        total, completed, score_sum, percentage_sum, highest, lowest = aggregates.get(
+            quiz_id, (0, 0, 0, 0, None, None)
+        )
+        rows.append(QuizStats(
+            quiz_id=quiz_id,
+            total_attempts=total,
+            completed_attempts=completed,
+            score_sum=score_sum or 0,
+            percentage_sum=percentage_sum or 0,
+            highest_score=highest,
+            lowest_score=lowest,
+            updated_at=now
+        ))
+    db.add_all(rows)
+    return len(rows)
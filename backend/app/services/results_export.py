@@ -0,0 +1,115 @@
+import csv
+import io
+import tempfile
+from typing import Iterator, List
+from sqlalchemy import select
+from app.db.database import SessionLocal
+from app.models.models import Answer, Question, QuizAttempt, User
+
+# Attempts fetched per round trip; answers are loaded per batch of this size too
+EXPORT_BATCH_SIZE = 1000
+
+RESULT_COLUMNS = [
+    "attempt_id", "student_id", "student_name", "email", "started_at", "submitted_at",
+    "time_taken_minutes", "score", "total_marks", "percentage", "status"
+]
+
+def _question_columns(quiz_id: int):
+    db = SessionLocal()
+    try:
+        question_ids = [question_id for (question_id,) in db.query(Question.id).filter(
+            Question.quiz_id == quiz_id
+        ).order_by(Question.order, Question.id).all()]
+    finally:
+        db.close()
+    headers = [f"Q{number}" for number in range(1, len(question_ids) + 1)]
+    return question_ids, headers
+
+def iter_result_rows(quiz_id: int, include_answers: bool = False) -> Iterator[List]:
+    """
+    Yield the header and then one row per attempt of a quiz, joined with the student.
+
+    Attempts are streamed with yield_per, so memory stays flat however many attempts
+    there are. With include_answers, one column per question (in quiz order) holds the
+    student's answer; answers are fetched per batch of attempts on a second session,
+    since a streaming cursor keeps its connection busy.
+    """
+    question_ids, question_headers = _question_columns(quiz_id) if include_answers else ([], [])
+    columns = {question_id: i for i, question_id in enumerate(question_ids)}
+    yield RESULT_COLUMNS + question_headers
+
+    db = SessionLocal()
+    answers_db = SessionLocal() if include_answers else None
+    try:
+        result = db.execute(
+            select(
+                QuizAttempt.id, User.student_id, User.first_name, User.last_name, User.email,
+                QuizAttempt.started_at, QuizAttempt.submitted_at, QuizAttempt.time_taken_minutes,
+                QuizAttempt.score, QuizAttempt.total_marks, QuizAttempt.percentage,
+                QuizAttempt.is_completed
+            )
+            .join(User, User.id == QuizAttempt.student_id)
+            .where(QuizAttempt.quiz_id == quiz_id)
+            .order_by(QuizAttempt.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        for batch in result.partitions():
+            answers = {}
+            if include_answers:
+                for attempt_id, question_id, answer_text in answers_db.execute(
+                    select(Answer.attempt_id, Answer.question_id, Answer.answer_text)
+                    .where(Answer.attempt_id.in_([row[0] for row in batch]))
+                ):
+                    answers[(attempt_id, question_id)] = answer_text
+
+            for (attempt_id, student_code, first_name, last_name, email, started_at, submitted_at,
+                 time_taken, score, total_marks, percentage, is_completed) in batch:
+                row = [
+                    attempt_id, student_code, f"{first_name} {last_name}", email, started_at,
+                    submitted_at, time_taken, score, total_marks, percentage,
+                    "completed" if is_completed else "in_progress"
+                ]
+                if include_answers:
+                    cells = [None] * len(question_ids)
+                    for question_id, column in columns.items():
+                        cells[column] = answers.get((attempt_id, question_id))
+                    row.extend(cells)
+                yield row
+    finally:
+        db.close()
+        if answers_db is not None:
+            answers_db.close()
+
+def csv_chunks(rows: Iterator[List]) -> Iterator[str]:
+    """Encode rows as CSV, yielding one chunk per row."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(["" if value is None else value for value in row])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+
+def xlsx_chunks(rows: Iterator[List], chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """
+    Write rows into a write-only XLSX workbook and yield the file in chunks.
+
+    XLSX is a zip archive that cannot be emitted row by row; the write-only workbook
+    keeps memory flat and the file is spooled to disk once it grows past a few MB.
+    Requires openpyxl.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title="Results")
+    for row in rows:
+        sheet.append(row)
+
+    with tempfile.SpooledTemporaryFile(max_size=4 * 1024 * 1024) as spool:
+        workbook.save(spool)
+        spool.seek(0)
+        while True:
+            chunk = spool.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
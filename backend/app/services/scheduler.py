@@ -0,0 +1,115 @@
+import heapq
+import itertools
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class DeadlineScheduler:
+    """
+    Runs a callback for keys whose deadline has passed.
+
+    Deadlines live in a min-heap; a single thread sleeps until the earliest one instead of
+    polling. Keys that fall due together are handed to the callback as one batch, so thousands
+    of simultaneous deadlines cost one wake-up. Rescheduling or cancelling a key is O(log n):
+    stale heap entries are skipped when they surface.
+
+    If the callback raises, the batch is scheduled again after retry_seconds, doubling
+    with each consecutive failure up to max_retry_seconds.
+    """
+
+    def __init__(self, name: str, callback: Callable[[List[Hashable]], None], max_batch: int = 500,
+                 retry_seconds: float = 5, max_retry_seconds: float = 300):
+        self.name = name
+        self.callback = callback
+        self.max_batch = max_batch
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self._heap: list = []
+        self._deadlines: Dict[Hashable, datetime] = {}
+        self._failures: Dict[Hashable, int] = {}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def schedule(self, key: Hashable, deadline: datetime) -> None:
+        """Schedule (or reschedule) key to fire at deadline (naive UTC)."""
+        with self._condition:
+            self._deadlines[key] = deadline
+            heapq.heappush(self._heap, (deadline, next(self._sequence), key))
+            if self._heap[0][2] == key:
+                self._condition.notify()
+
+    def cancel(self, key: Hashable) -> None:
+        with self._condition:
+            self._deadlines.pop(key, None)
+            self._failures.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def _pop_due(self) -> Optional[List[Hashable]]:
+        """Wait for the next batch of due keys; returns None when stopping."""
+        with self._condition:
+            while not self._stopping:
+                now = datetime.utcnow()
+                due = []
+                while self._heap and self._heap[0][0] <= now and len(due) < self.max_batch:
+                    deadline, _, key = heapq.heappop(self._heap)
+                    if self._deadlines.get(key) == deadline:
+                        del self._deadlines[key]
+                        due.append(key)
+                if due:
+                    return due
+
+                timeout = (self._heap[0][0] - now).total_seconds() if self._heap else None
+                self._condition.wait(timeout=timeout)
+            return None
+
+    def _retry(self, keys: List[Hashable]) -> None:
+        """Schedule a failed batch again with backoff, unless a key was rescheduled meanwhile."""
+        now = datetime.utcnow()
+        with self._condition:
+            for key in keys:
+                if key in self._deadlines:
+                    continue
+                failures = self._failures.get(key, 0) + 1
+                self._failures[key] = failures
+                delay = min(self.retry_seconds * 2 ** (failures - 1), self.max_retry_seconds)
+                deadline = now + timedelta(seconds=delay)
+                self._deadlines[key] = deadline
+                heapq.heappush(self._heap, (deadline, next(self._sequence), key))
+            self._condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            due = self._pop_due()
+            if due is None:
+                return
+            try:
+                self.callback(due)
+            except Exception:
+                logger.exception("%s callback failed for %d key(s), retrying", self.name, len(due))
+                self._retry(due)
+            else:
+                if self._failures:
+                    with self._condition:
+                        for key in due:
+                            self._failures.pop(key, None)
+
+    def start(self) -> None:
+        with self._condition:
+            self._stopping = False
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -0,0 +1,82 @@
+import hashlib
+import itertools
+import numpy as np
+from typing import Dict, List, Mapping, Sequence, Tuple
+
+OPTION_LETTERS = ("a", "b", "c", "d")
+OPTION_FIELDS = ("option_a", "option_b", "option_c", "option_d")
+
+# Single-answer choice questions get their options shuffled; multi-answer and
+# true/false questions keep their order
+SHUFFLED_OPTION_TYPES = {"mcq", "single_choice"}
+
+# Every ordering of k options, indexed by a per-question hash
+_PERMUTATIONS = {k: list(itertools.permutations(range(k))) for k in range(len(OPTION_LETTERS) + 1)}
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_QUESTION_SALT = np.uint64(0x5851F42D4C957F2D)
+_OPTION_SALT = np.uint64(0x14057B7EF767814F)
+
+def attempt_seed(quiz_id: int, attempt_id: int) -> int:
+    """Shuffle seed of an attempt; stable across processes and restarts."""
+    digest = hashlib.blake2b(f"{quiz_id}:{attempt_id}".encode("ascii"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+def _mix(seed: int, values: np.ndarray, salt: np.uint64) -> np.ndarray:
+    """splitmix64 of (seed, value) pairs; uint64 arithmetic is meant to wrap."""
+    x = np.uint64(seed) ^ salt ^ (values.astype(np.uint64) * _GOLDEN)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def shuffled_choices(question_type: str, options: Sequence) -> Tuple[str, ...]:
+    """Letters of the options that are shuffled for a question (none for other types)."""
+    if (question_type or "").lower() not in SHUFFLED_OPTION_TYPES:
+        return ()
+    return tuple(letter for letter, option in zip(OPTION_LETTERS, options) if option is not None)
+
+def question_order(seed: int, question_ids: Sequence[int]) -> List[int]:
+    """Positions of question_ids in the attempt's display order."""
+    keys = _mix(seed, np.asarray(question_ids, dtype=np.int64), _QUESTION_SALT)
+    return np.argsort(keys, kind="stable").tolist()
+
+def option_permutations(seed: int, question_ids: Sequence[int], counts: Sequence[int]) -> List[Tuple[int, ...]]:
+    """
+    Option permutation of each question: permutation[i] is the original position of the
+    option shown at position i. Depends only on the seed and the question id, so it does
+    not change when other questions are added or removed.
+    """
+    keys = _mix(seed, np.asarray(question_ids, dtype=np.int64), _OPTION_SALT).tolist()
+    return [
+        _PERMUTATIONS[count][key % len(_PERMUTATIONS[count])]
+        for key, count in zip(keys, counts)
+    ]
+
+def _map_letters(seed: int, choices: Mapping[int, Tuple[str, ...]], answers: Dict[int, str],
+                 to_original: bool) -> Dict[int, str]:
+    question_ids = [question_id for question_id in answers if len(choices.get(question_id, ())) > 1]
+    if not question_ids:
+        return answers
+
+    permutations = option_permutations(seed, question_ids, [len(choices[question_id]) for question_id in question_ids])
+    mapped = dict(answers)
+    for question_id, permutation in zip(question_ids, permutations):
+        answer = (answers[question_id] or "").strip()
+        letters = choices[question_id]
+        if answer.lower() in letters:
+            position = letters.index(answer.lower())
+            letter = letters[permutation[position] if to_original else permutation.index(position)]
+            mapped[question_id] = letter.upper() if answer.isupper() else letter
+    return mapped
+
+def unshuffle_answers(seed: int, choices: Mapping[int, Tuple[str, ...]], answers: Dict[int, str]) -> Dict[int, str]:
+    """
+    Map answers given as displayed option letters back to the original letters.
+    choices holds the shuffled letters per question id (see shuffled_choices); other
+    answers, including option texts, pass through unchanged.
+    """
+    return _map_letters(seed, choices, answers, to_original=True)
+
+def shuffle_answers(seed: int, choices: Mapping[int, Tuple[str, ...]], answers: Dict[int, str]) -> Dict[int, str]:
+    """Inverse of unshuffle_answers: original option letters to the letters displayed."""
+    return _map_letters(seed, choices, answers, to_original=False)
@@ -0,0 +1,324 @@
+import json
+import logging
+import sqlite3
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.models import Quiz, QuizAttempt, User
+from app.services.activity_log import activity_log
+from app.services.attempt_service import finalize_attempts
+from app.services.leaderboard import leaderboards
+from app.services.attempt_sweeper import attempt_sweeper
+
+logger = logging.getLogger(__name__)
+
+# Receipt states
+QUEUED = "queued"
+PROCESSING = "processing"
+COMPLETED = "completed"
+FAILED = "failed"
+
+class SubmissionQueue:
+    """
+    Durable queue of raw quiz submissions.
+
+    Submissions are appended to a local SQLite journal (WAL mode) and acknowledged
+    immediately; a pool of worker threads grades them and commits results to the
+    main database in batches. Rows left in 'processing' by a crash are re-queued
+    when the workers start again.
+    """
+
+    def __init__(self, path: str, workers: int, batch_size: int, batch_wait_seconds: float):
+        self.path = path
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait_seconds = batch_wait_seconds
+        self._threads: List[threading.Thread] = []
+        self._claim_lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _ensure_schema(self) -> None:
+        if self._initialized:
+            return
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS submissions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    attempt_id INTEGER NOT NULL UNIQUE,
+                    quiz_id INTEGER NOT NULL,
+                    student_id INTEGER NOT NULL,
+                    payload TEXT NOT NULL,
+                    status VARCHAR(20) NOT NULL,
+                    error TEXT,
+                    received_at DATETIME NOT NULL,
+                    processed_at DATETIME
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_submissions_status ON submissions (status, id)")
+        finally:
+            conn.close()
+        self._initialized = True
+
+    def enqueue(self, attempt_id: int, quiz_id: int, student_id: int,
+                answers: Dict[int, str], received_at: datetime) -> dict:
+        """
+        Persist a submission and return its receipt. Re-submitting a queued or processed
+        attempt returns the existing receipt; a failed submission is replaced and re-queued.
+        """
+        self._ensure_schema()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO submissions "
+                "(attempt_id, quiz_id, student_id, payload, status, received_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (attempt_id) DO UPDATE SET "
+                "payload = excluded.payload, status = excluded.status, error = NULL, "
+                "received_at = excluded.received_at, processed_at = NULL "
+                "WHERE submissions.status = ?",
+                (attempt_id, quiz_id, student_id, json.dumps(answers), QUEUED, received_at.isoformat(), FAILED)
+            )
+            receipt = self._receipt(conn, attempt_id)
+        finally:
+            conn.close()
+
+        with self._wakeup:
+            self._wakeup.notify()
+        return receipt
+
+    def get_receipt(self, attempt_id: int) -> Optional[dict]:
+        self._ensure_schema()
+        conn = self._connect()
+        try:
+            return self._receipt(conn, attempt_id)
+        finally:
+            conn.close()
+
+    def _receipt(self, conn: sqlite3.Connection, attempt_id: int) -> Optional[dict]:
+        row = conn.execute(
+            "SELECT id, attempt_id, status, error, received_at, processed_at "
+            "FROM submissions WHERE attempt_id = ?",
+            (attempt_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "receipt_id": row["id"],
+            "attempt_id": row["attempt_id"],
+            "status": row["status"],
+            "error": row["error"],
+            "received_at": datetime.fromisoformat(row["received_at"]),
+            "processed_at": datetime.fromisoformat(row["processed_at"]) if row["processed_at"] else None
+        }
+
+    def depth(self) -> int:
+        self._ensure_schema()
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "SELECT COUNT(*) FROM submissions WHERE status IN (?, ?)", (QUEUED, PROCESSING)
+            ).fetchone()[0]
+        finally:
+            conn.close()
+
+    def pending_attempt_ids(self, attempt_ids: Iterable[int]) -> Set[int]:
+        """The given attempts that have a submission queued or being processed."""
+        attempt_ids = list(attempt_ids)
+        if not attempt_ids:
+            return set()
+        self._ensure_schema()
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT attempt_id FROM submissions WHERE status IN (?, ?) "
+                f"AND attempt_id IN ({', '.join('?' * len(attempt_ids))})",
+                (QUEUED, PROCESSING, *attempt_ids)
+            ).fetchall()
+            return {row[0] for row in rows}
+        finally:
+            conn.close()
+
+    def _claim_batch(self) -> List[sqlite3.Row]:
+        with self._claim_lock:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                rows = conn.execute(
+                    "SELECT id, attempt_id, quiz_id, payload, received_at FROM submissions "
+                    "WHERE status = ? ORDER BY id LIMIT ?",
+                    (QUEUED, self.batch_size)
+                ).fetchall()
+                if rows:
+                    conn.executemany(
+                        "UPDATE submissions SET status = ? WHERE id = ?",
+                        [(PROCESSING, row["id"]) for row in rows]
+                    )
+                conn.execute("COMMIT")
+                return rows
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+
+    def _mark(self, results: List[tuple]) -> None:
+        """Record (status, error, receipt_id) outcomes of a processed batch."""
+        processed_at = datetime.utcnow().isoformat()
+        conn = self._connect()
+        try:
+            conn.executemany(
+                "UPDATE submissions SET status = ?, error = ?, processed_at = ? WHERE id = ?",
+                [(status, error, processed_at, receipt_id) for status, error, receipt_id in results]
+            )
+        finally:
+            conn.close()
+
+    def process_batch(self, rows: List[sqlite3.Row]) -> None:
+        """
+        Grade a claimed batch and commit all of its attempts in one transaction.
+        Receipts are marked as soon as the commit succeeds; the follow-up work after it
+        cannot send an already graded batch back for retry.
+        """
+        db = SessionLocal()
+        try:
+            try:
+                attempt_ids = [row["attempt_id"] for row in rows]
+                attempts = {
+                    attempt.id: attempt
+                    for attempt in db.query(QuizAttempt).filter(QuizAttempt.id.in_(attempt_ids)).all()
+                }
+                quiz_ids = {row["quiz_id"] for row in rows}
+                quizzes = {quiz.id: quiz for quiz in db.query(Quiz).filter(Quiz.id.in_(quiz_ids)).all()}
+
+                results = []
+                by_quiz = defaultdict(list)
+                for row in rows:
+                    attempt = attempts.get(row["attempt_id"])
+                    if attempt is None or row["quiz_id"] not in quizzes:
+                        results.append((FAILED, "Attempt not found", row["id"]))
+                    elif attempt.is_completed:
+                        results.append((FAILED, "Quiz already submitted", row["id"]))
+                    else:
+                        by_quiz[row["quiz_id"]].append(row)
+
+                graded = []
+                events = []
+                for quiz_id, quiz_rows in by_quiz.items():
+                    batch = finalize_attempts(
+                        db,
+                        quizzes[quiz_id],
+                        [attempts[row["attempt_id"]] for row in quiz_rows],
+                        [
+                            {int(question_id): text for question_id, text in json.loads(row["payload"]).items()}
+                            for row in quiz_rows
+                        ],
+                        submitted_at=[datetime.fromisoformat(row["received_at"]) for row in quiz_rows]
+                    )
+                    results.extend((COMPLETED, None, row["id"]) for row in quiz_rows)
+                    graded.append((quiz_id, [row["attempt_id"] for row in quiz_rows], batch.scores))
+                    events.extend(
+                        (attempts[row["attempt_id"]].student_id, quiz_id, row["attempt_id"],
+                         f"Graded quiz: {quizzes[quiz_id].title} (score {score}/{batch.max_score})")
+                        for row, score in zip(quiz_rows, batch.scores)
+                    )
+
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                if len(rows) > 1:
+                    # Isolate the failing submission so the rest of the batch still commits
+                    logger.warning("Submission batch failed, retrying one by one: %s", e)
+                    db.close()
+                    for row in rows:
+                        self.process_batch([row])
+                    return
+                logger.exception("Failed to process submission %s", rows[0]["id"])
+                self._mark([(FAILED, str(e), row["id"]) for row in rows])
+                return
+
+            self._mark(results)
+            self._after_commit(db, rows, graded, events)
+        finally:
+            db.close()
+
+    def _after_commit(self, db: Session, rows: List[sqlite3.Row], graded: List[tuple], events: List[tuple]) -> None:
+        """
+        Cancel deadlines and update leaderboards and the activity log for a committed batch.
+        Failures are only logged: the grades are already saved and the receipts marked.
+        """
+        try:
+            for row in rows:
+                attempt_sweeper.cancel(row["attempt_id"])
+            for quiz_id, attempt_ids, scores in graded:
+                leaderboards.record(quiz_id, zip(attempt_ids, scores))
+            students = {
+                user.id: user
+                for user in db.query(User).filter(User.id.in_({event[0] for event in events})).all()
+            }
+            for student_id, quiz_id, attempt_id, details in events:
+                activity_log.record(
+                    "attempt_graded", students[student_id], details, quiz_id=quiz_id, attempt_id=attempt_id
+                )
+        except Exception:
+            logger.exception("Follow-up work failed for graded submissions %s", [row["id"] for row in rows])
+
+    def _worker(self) -> None:
+        while True:
+            with self._wakeup:
+                if self._stopping:
+                    return
+                self._wakeup.wait(timeout=self.batch_wait_seconds)
+                if self._stopping:
+                    return
+            try:
+                rows = self._claim_batch()
+                while rows:
+                    self.process_batch(rows)
+                    rows = self._claim_batch()
+            except Exception:
+                logger.exception("Submission worker error")
+
+    def start(self) -> None:
+        """
+        Re-queue interrupted work and start the worker pool.
+        """
+        self._ensure_schema()
+        conn = self._connect()
+        try:
+            conn.execute("UPDATE submissions SET status = ? WHERE status = ?", (QUEUED, PROCESSING))
+        finally:
+            conn.close()
+
+        self._stopping = False
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"submission-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+submission_queue = SubmissionQueue(
+    path=settings.SUBMISSION_QUEUE_PATH,
+    workers=settings.SUBMISSION_WORKERS,
+    batch_size=settings.SUBMISSION_BATCH_SIZE,
+    batch_wait_seconds=settings.SUBMISSION_BATCH_WAIT_SECONDS
+)
@@ -0,0 +1,64 @@
+"""
+Grading Engine Benchmark for MacQuiz
+Measures grading throughput (attempts/second) on a synthetic exam.
+
+Usage: python benchmark_grading.py [questions] [attempts]
+"""
+
+import random
+import sys
+import time
+
+from app.services.answer_keys import AnswerKey, AnswerKeyEntry
+from app.services.grading import grade_submission, grade_submissions
+
+OPTIONS = ["A", "B", "C", "D"]
+
+def build_answer_key(num_questions):
+    """Build a synthetic MCQ answer key"""
+    entries = {
+        question_id: AnswerKeyEntry(
+            question_id=question_id,
+            correct_answer=random.choice(OPTIONS).lower(),
+            marks=random.choice([1.0, 2.0]),
+            question_type="mcq"
+        )
+        for question_id in range(1, num_questions + 1)
+    }
+    return AnswerKey(quiz_id=1, entries=entries)
+
+def build_submissions(answer_key, num_attempts):
+    """Build synthetic submissions with ~10% unanswered questions"""
+    return [
+        {
+            question_id: random.choice(OPTIONS)
+            for question_id in answer_key.question_ids
+            if random.random() > 0.1
+        }
+        for _ in range(num_attempts)
+    ]
+
+def run_benchmark(num_questions=100, num_attempts=2000):
+    """Time single-attempt and batched grading"""
+    random.seed(42)
+    answer_key = build_answer_key(num_questions)
+    submissions = build_submissions(answer_key, num_attempts)
+
+    print(f"\n📊 Grading {num_attempts} attempts x {num_questions} questions")
+
+    start = time.perf_counter()
+    for submission in submissions:
+        grade_submission(answer_key, submission, 1.0, 0.25)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Per-attempt grading: {num_attempts / elapsed:,.0f} attempts/second")
+
+    start = time.perf_counter()
+    result = grade_submissions(answer_key, submissions, 1.0, 0.25)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Batch grading:       {num_attempts / elapsed:,.0f} attempts/second")
+    print(f"   Mean score: {result.scores.mean():.2f} / {result.max_score:.2f}")
+
+if __name__ == "__main__":
+    questions = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    attempts = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    run_benchmark(questions, attempts)
@@ -0,0 +1,37 @@
+"""
+Near-Duplicate Clustering Job for MacQuiz
+Computes missing MinHash signatures and groups near-duplicate questions of the
+question bank per subject, storing each group's lowest question id as duplicate_group_id.
+Restart the API afterwards so its duplicate index picks up backfilled signatures.
+
+Usage: python cluster_question_bank.py [subject_id ...]   (default: every subject)
+"""
+
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from app.db.database import SessionLocal
+from app.models.models import QuestionBank
+from app.services.near_duplicates import cluster_subject
+
+def main(argv):
+    db = SessionLocal()
+    try:
+        subject_ids = [int(arg) for arg in argv] or [
+            subject_id for (subject_id,) in db.query(QuestionBank.subject_id).distinct().all()
+        ]
+        for subject_id in subject_ids:
+            questions, groups = cluster_subject(db, subject_id)
+            db.commit()
+            print(f"✅ Subject {subject_id}: {groups} duplicate group(s) among {questions} question(s)")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
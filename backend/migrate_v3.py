@@ -0,0 +1,111 @@
+"""
+Database Migration Script for MacQuiz v3
+Adds the indexes, constraints and columns introduced for exam-scale load.
+New tables are created by the application on startup (Base.metadata.create_all);
+this script upgrades tables that already exist. Safe to run more than once.
+
+Usage: python migrate_v3.py
+"""
+
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from sqlalchemy import inspect, text
+from app.db.database import engine, Base
+from app.models import models  # noqa: F401  (registers the tables on Base.metadata)
+from app.services.question_search import ensure_search_index
+
+def index_exists(conn, table, name):
+    return any(index["name"] == name for index in inspect(conn).get_indexes(table))
+
+def column_exists(conn, table, name):
+    return any(column["name"] == name for column in inspect(conn).get_columns(table))
+
+def create_model_index(conn, table, name):
+    """Create an index declared on a model, if missing"""
+    if index_exists(conn, table, name):
+        print(f"⚠️  {name} already exists")
+        return
+    index = next(index for index in Base.metadata.tables[table].indexes if index.name == name)
+    index.create(conn)
+    print(f"✅ Created index {name}")
+
+def add_model_column(conn, table, name):
+    """Add a column declared on a model, if missing"""
+    if column_exists(conn, table, name):
+        print(f"⚠️  {table}.{name} already exists")
+        return
+    column = Base.metadata.tables[table].columns[name]
+    column_type = column.type.compile(dialect=conn.dialect)
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}"))
+    print(f"✅ Added {name} to {table}")
+
+def deduplicate_quiz_attempts(conn):
+    """Keep one attempt per (quiz, student): the completed one, else the earliest"""
+    duplicates = conn.execute(text("""
+        SELECT quiz_id, student_id FROM quiz_attempts
+        GROUP BY quiz_id, student_id HAVING COUNT(*) > 1
+    """)).fetchall()
+    removed = 0
+    for quiz_id, student_id in duplicates:
+        attempt_ids = [row[0] for row in conn.execute(text("""
+            SELECT id FROM quiz_attempts
+            WHERE quiz_id = :quiz_id AND student_id = :student_id
+            ORDER BY is_completed DESC, id ASC
+        """), {"quiz_id": quiz_id, "student_id": student_id})]
+        for attempt_id in attempt_ids[1:]:
+            conn.execute(text("DELETE FROM answers WHERE attempt_id = :id"), {"id": attempt_id})
+            conn.execute(text("DELETE FROM quiz_attempts WHERE id = :id"), {"id": attempt_id})
+            removed += 1
+    print(f"✅ Removed {removed} duplicate attempt(s)")
+
+def migrate_database():
+    """Apply database migrations"""
+    print("\n🔄 Starting v3 database migration...")
+
+    # Create tables that do not exist yet (existing tables are left untouched)
+    Base.metadata.create_all(bind=engine)
+
+    with engine.begin() as conn:
+        # One attempt per student per quiz
+        deduplicate_quiz_attempts(conn)
+        create_model_index(conn, "quiz_attempts", "ux_quiz_attempts_quiz_student")
+
+        # Keyset-paginated quiz listing
+        create_model_index(conn, "quizzes", "ix_quizzes_student_listing")
+        create_model_index(conn, "quizzes", "ix_quizzes_creator_created")
+
+        # Per-student statistics
+        create_model_index(conn, "quiz_attempts", "ix_quiz_attempts_student")
+
+        # Item analysis results
+        for column in ("p_value", "discrimination", "response_count", "distractor_frequencies", "analyzed_at"):
+            add_model_column(conn, "questions", column)
+        for column in ("p_value", "discrimination", "response_count", "analyzed_at"):
+            add_model_column(conn, "question_bank", column)
+
+        # Packed graded responses for item analysis (filled in on the first analysis run)
+        add_model_column(conn, "quiz_attempts", "response_codes")
+
+        # Near-duplicate detection (signatures are computed by cluster_question_bank.py)
+        for column in ("minhash_signature", "duplicate_group_id"):
+            add_model_column(conn, "question_bank", column)
+        create_model_index(conn, "question_bank", "ix_question_bank_duplicate_group_id")
+
+        # Per-attempt shuffling (existing quizzes keep NULL, i.e. unshuffled)
+        for column in ("shuffle_questions", "shuffle_options"):
+            add_model_column(conn, "quizzes", column)
+
+    # Full-text search over the question bank (FTS5 table on SQLite, FULLTEXT index on MySQL)
+    ensure_search_index(engine)
+
+    print("\n✅ Migration completed successfully!")
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("MacQuiz Database Migration v3")
+    print("=" * 60)
+    migrate_database()
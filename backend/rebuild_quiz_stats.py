@@ -0,0 +1,35 @@
+"""
+Quiz Statistics Rebuild for MacQuiz
+Recomputes the quiz_stats rollup from quiz_attempts. Run after bulk data fixes,
+or once after upgrading so existing quizzes get their rollup rows.
+
+Usage: python rebuild_quiz_stats.py [quiz_id ...]
+"""
+
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from app.db.database import SessionLocal, engine, Base
+from app.models import models  # noqa: F401  (registers the tables on Base.metadata)
+from app.services.quiz_stats import rebuild_quiz_stats
+
+def main(argv):
+    quiz_ids = [int(arg) for arg in argv] or None
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        written = rebuild_quiz_stats(db, quiz_ids)
+        db.commit()
+        print(f"✅ Rebuilt statistics for {written} quiz(zes)")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
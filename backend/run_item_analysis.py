@@ -0,0 +1,38 @@
+"""
+Item Analysis Job for MacQuiz
+Computes per-question difficulty, discrimination and distractor frequencies and
+stores them on the quiz questions and their question bank entries.
+
+Usage: python run_item_analysis.py [quiz_id ...]   (default: every quiz with completed attempts)
+"""
+
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from app.db.database import SessionLocal
+from app.models.models import QuizAttempt
+from app.services.item_analysis import run_item_analysis
+
+def main(argv):
+    db = SessionLocal()
+    try:
+        quiz_ids = [int(arg) for arg in argv] or [
+            quiz_id for (quiz_id,) in db.query(QuizAttempt.quiz_id).filter(
+                QuizAttempt.is_completed == True
+            ).distinct().all()
+        ]
+        for quiz_id in quiz_ids:
+            attempts = run_item_analysis(db, quiz_id)
+            db.commit()
+            print(f"✅ Quiz {quiz_id}: analyzed {attempts} attempt(s)")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
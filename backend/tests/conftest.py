@@ -0,0 +1,83 @@
+import os
+import sys
+import tempfile
+
+# Settings are read when the app is imported, so point it at a throwaway database first
+_tmp = tempfile.mkdtemp(prefix="macquiz-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(_tmp, 'test.db')}",
+    "SUBMISSION_QUEUE_PATH": os.path.join(_tmp, "submission_queue.db"),
+    "SECRET_KEY": "test-secret",
+    "CORS_ORIGINS": "http://localhost",
+    "ADMIN_EMAIL": "admin@example.com",
+    "ADMIN_PASSWORD": "admin-password",
+})
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import itertools
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.security import get_password_hash
+from app.db.database import SessionLocal
+from app.models.models import RoleEnum, User
+
+_emails = itertools.count()
+_password_hash = get_password_hash("password")
+
+@pytest.fixture(scope="session")
+def client():
+    return TestClient(app)
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+def auth_headers(client, email, password):
+    response = client.post("/api/v1/auth/login-json", json={"username": email, "password": password})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def create_quiz(client, headers, question_count, department):
+    """Unshuffled quiz for department/1st Year with single-choice questions answered 'A'."""
+    response = client.post("/api/v1/quizzes/", json={
+        "title": "Quiz",
+        "department": department,
+        "class_year": "1st Year",
+        "shuffle_questions": False,
+        "shuffle_options": False,
+        "questions": [
+            {
+                "question_text": f"Q{i}", "question_type": "SINGLE_CHOICE", "option_a": "a", "option_b": "b",
+                "option_c": "c", "option_d": "d", "correct_answer": "A", "order": i
+            }
+            for i in range(question_count)
+        ]
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+@pytest.fixture(scope="session")
+def admin_headers(client):
+    return auth_headers(client, "admin@example.com", "admin-password")
+
+@pytest.fixture
+def make_user(db):
+    """Create a user with password 'password'; returns the committed User."""
+    def make(role=RoleEnum.STUDENT, **fields):
+        user = User(
+            email=f"user{next(_emails)}@example.com",
+            hashed_password=_password_hash,
+            first_name="Test",
+            last_name=role.value.title(),
+            role=role,
+            **fields
+        )
+        db.add(user)
+        db.commit()
+        return user
+    return make
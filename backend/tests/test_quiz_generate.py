@@ -0,0 +1,36 @@
+import pytest
+from app.models.models import RoleEnum, Subject
+from conftest import auth_headers
+
+@pytest.fixture
+def teacher_headers(client, make_user):
+    teacher = make_user(RoleEnum.TEACHER, department="Generate")
+    return auth_headers(client, teacher.email, "password")
+
+@pytest.fixture
+def bank_subject(client, db, make_user, teacher_headers):
+    """A subject with four easy questions added through the API, so they are pooled."""
+    teacher = make_user(RoleEnum.TEACHER, department="Generate")
+    subject = Subject(name=f"Generate {teacher.id}", code=f"GEN{teacher.id}", creator_id=teacher.id)
+    db.add(subject)
+    db.commit()
+    for i in range(4):
+        response = client.post("/api/v1/question-bank/", json={
+            "subject_id": subject.id, "question_text": f"Generated question number {i} about basics",
+            "question_type": "mcq", "option_a": "a", "option_b": "b", "option_c": "c", "option_d": "d",
+            "correct_answer": "A", "topic": "basics", "difficulty": "easy"
+        }, headers=teacher_headers)
+        assert response.status_code == 201, response.text
+    return subject.id
+
+@pytest.mark.parametrize("marks_per_correct", [0, -1])
+def test_non_positive_marks_per_correct_is_rejected(client, teacher_headers, bank_subject, marks_per_correct):
+    response = client.post("/api/v1/quizzes/generate", json={
+        "title": "Generated",
+        "subject_id": bank_subject,
+        "sections": [{"easy": 2}],
+        "total_marks": 10,
+        "marks_per_correct": marks_per_correct
+    }, headers=teacher_headers)
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "marks_per_correct"]
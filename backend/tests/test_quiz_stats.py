@@ -0,0 +1,54 @@
+import pytest
+from app.models.models import QuizStats, RoleEnum
+from app.services.attempt_sweeper import finalize_expired_attempts
+from app.services.quiz_stats import rebuild_quiz_stats
+from conftest import auth_headers, create_quiz
+
+STATS_FIELDS = (
+    "total_attempts", "completed_attempts", "score_sum", "percentage_sum", "highest_score", "lowest_score"
+)
+
+def stats_row(db, quiz_id):
+    db.expire_all()
+    stats = db.query(QuizStats).filter(QuizStats.quiz_id == quiz_id).one()
+    return {field: getattr(stats, field) for field in STATS_FIELDS}
+
+def test_incremental_rollup_matches_rebuild(client, db, make_user):
+    teacher = make_user(RoleEnum.TEACHER, department="Rollup")
+    teacher_headers = auth_headers(client, teacher.email, "password")
+    quiz = create_quiz(client, teacher_headers, 3, department="Rollup")
+    response = client.get(f"/api/v1/quizzes/{quiz['id']}", headers=teacher_headers)
+    question_ids = [question["id"] for question in response.json()["questions"]]
+
+    # Submitted with 3, 1 and 0 correct answers, one auto-submitted, one still in progress
+    attempt_ids = []
+    for correct in (3, 1, 0, None, None):
+        student = make_user(RoleEnum.STUDENT, department="Rollup", class_year="1st Year")
+        headers = auth_headers(client, student.email, "password")
+        response = client.post("/api/v1/attempts/start", json={"quiz_id": quiz["id"]}, headers=headers)
+        assert response.status_code == 200, response.text
+        attempt_ids.append(response.json()["id"])
+        if correct is None:
+            continue
+        answers = [
+            {"question_id": question_id, "answer_text": "A" if i < correct else "B"}
+            for i, question_id in enumerate(question_ids)
+        ]
+        response = client.post(
+            "/api/v1/attempts/submit", params={"attempt_id": attempt_ids[-1]}, json={"answers": answers},
+            headers=headers
+        )
+        assert response.status_code == 200, response.text
+    finalize_expired_attempts([attempt_ids[3]])
+
+    incremental = stats_row(db, quiz["id"])
+    assert incremental["total_attempts"] == 5
+    assert incremental["completed_attempts"] == 4
+    assert incremental["score_sum"] == 4
+    assert incremental["highest_score"] == 3
+    assert incremental["lowest_score"] == 1
+
+    rebuild_quiz_stats(db, [quiz["id"]])
+    db.commit()
+    rebuilt = stats_row(db, quiz["id"])
+    assert rebuilt == pytest.approx(incremental)
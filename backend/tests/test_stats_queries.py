@@ -0,0 +1,64 @@
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import event
+from app.db.database import engine
+from app.models.models import Question, Quiz, QuizAttempt, RoleEnum
+
+@contextmanager
+def count_queries():
+    """Count the SQL statements executed inside the block."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+def add_teachers(db, make_user, count, department):
+    """Teachers with two quizzes each, three questions per quiz and one completed attempt."""
+    student = make_user(RoleEnum.STUDENT, department=department)
+    for _ in range(count):
+        teacher = make_user(RoleEnum.TEACHER, department=department)
+        for _ in range(2):
+            quiz = Quiz(title="Quiz", creator_id=teacher.id, total_marks=3)
+            db.add(quiz)
+            db.flush()
+            db.add_all([
+                Question(quiz_id=quiz.id, question_text=f"Q{i}", question_type="mcq", correct_answer="a", order=i)
+                for i in range(3)
+            ])
+            db.add(QuizAttempt(
+                quiz_id=quiz.id, student_id=student.id, score=2, total_marks=3, percentage=66.67,
+                started_at=datetime.utcnow(), submitted_at=datetime.utcnow(), is_completed=True
+            ))
+    db.commit()
+
+def test_teacher_stats_query_count_is_constant(client, db, make_user, admin_headers):
+    add_teachers(db, make_user, 2, "Small")
+    with count_queries() as few:
+        response = client.get("/api/v1/stats/teachers", params={"department": "Small"}, headers=admin_headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+    add_teachers(db, make_user, 20, "Large")
+    with count_queries() as many:
+        response = client.get("/api/v1/stats/teachers", params={"department": "Large"}, headers=admin_headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 20
+
+    # One statement loads the current user, one loads every teacher's statistics
+    assert len(many) == len(few) <= 2
+
+def test_teacher_stats_aggregates(client, db, make_user, admin_headers):
+    add_teachers(db, make_user, 1, "Aggregates")
+    response = client.get("/api/v1/stats/teachers", params={"department": "Aggregates"}, headers=admin_headers)
+    assert response.status_code == 200
+    [stats] = response.json()
+    assert stats["total_quizzes_created"] == 2
+    assert stats["total_questions_created"] == 6
+    assert stats["total_students_attempted"] == 1
+    assert stats["average_quiz_score"] == 66.67
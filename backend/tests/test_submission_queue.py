@@ -0,0 +1,42 @@
+from app.models.models import RoleEnum
+from app.services import submission_queue as queue_module
+from app.services.submission_queue import submission_queue
+from conftest import auth_headers, create_quiz
+
+def queue_submissions(client, make_user, count):
+    """Attempts submitted through /submit-async with every answer correct; returns their ids."""
+    teacher = make_user(RoleEnum.TEACHER, department="Queue")
+    teacher_headers = auth_headers(client, teacher.email, "password")
+    quiz = create_quiz(client, teacher_headers, 2, department="Queue")
+    questions = client.get(f"/api/v1/quizzes/{quiz['id']}", headers=teacher_headers).json()["questions"]
+
+    submissions = []
+    for _ in range(count):
+        student = make_user(RoleEnum.STUDENT, department="Queue", class_year="1st Year")
+        headers = auth_headers(client, student.email, "password")
+        attempt_id = client.post("/api/v1/attempts/start", json={"quiz_id": quiz["id"]}, headers=headers).json()["id"]
+        response = client.post(
+            "/api/v1/attempts/submit-async", params={"attempt_id": attempt_id},
+            json={"answers": [{"question_id": question["id"], "answer_text": "A"} for question in questions]},
+            headers=headers
+        )
+        assert response.status_code == 202, response.text
+        submissions.append((attempt_id, headers))
+    return submissions
+
+def test_failure_after_commit_keeps_submissions_completed(client, make_user, monkeypatch):
+    submissions = queue_submissions(client, make_user, 2)
+
+    def broken_record(quiz_id, entries):
+        raise RuntimeError("leaderboard unavailable")
+
+    monkeypatch.setattr(queue_module.leaderboards, "record", broken_record)
+    submission_queue.process_batch(submission_queue._claim_batch())
+
+    for attempt_id, headers in submissions:
+        response = client.get(f"/api/v1/attempts/{attempt_id}/status", headers=headers)
+        assert response.status_code == 200, response.text
+        assert response.json()["status"] == "completed"
+        assert response.json()["score"] == 2
+        receipt = submission_queue.get_receipt(attempt_id)
+        assert (receipt["status"], receipt["error"]) == ("completed", None)
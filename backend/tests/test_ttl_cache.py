@@ -0,0 +1,23 @@
+from app.services.ttl_cache import TTLCache
+
+def test_invalidation_during_compute_is_not_overwritten():
+    cache = TTLCache(ttl=600)
+
+    def slow_compute():
+        # A write lands while the old value is being computed
+        cache.invalidate("subject")
+        return "stale"
+
+    assert cache.get_or_compute("subject", slow_compute) == "stale"
+    assert cache.get_or_compute("subject", lambda: "fresh") == "fresh"
+    assert cache.get_or_compute("subject", lambda: "recomputed") == "fresh"
+
+def test_clear_during_compute_is_not_overwritten():
+    cache = TTLCache(ttl=600)
+
+    def slow_compute():
+        cache.clear()
+        return "stale"
+
+    cache.get_or_compute("key", slow_compute)
+    assert cache.get_or_compute("key", lambda: "fresh") == "fresh"